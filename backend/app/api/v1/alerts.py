@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import select, Session
 from sqlalchemy.orm import selectinload
-from app.db.session import get_session
+from app.db.session import get_session, get_read_session
 from app.db.models import Alert, Host
 from app.utils.role_decorator import get_current_user, require_role
 from app.db.models import UserRole
+from app.services.dashboard_cache import dashboard_cache
+from app.services.alert_archive import alert_archive, ARCHIVE_QUERY_LIMIT
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,11 +28,17 @@ class AlertUpdate(BaseModel):
 
 
 @router.get("/")
-def get_alerts(session: Session = Depends(get_session), current_user = Depends(get_current_user)):
+def get_alerts(session: Session = Depends(get_read_session), current_user = Depends(get_current_user)):
     """Get all alerts ordered by timestamp (newest first)"""
-    statement = select(Alert).options(selectinload(Alert.host)).order_by(Alert.timestamp.desc())
+    statement = (
+        select(Alert)
+        .outerjoin(Host, Host.id == Alert.host_id)
+        .where(Host.deleted_at.is_(None))  # alerts of a host being deleted go with it
+        .options(selectinload(Alert.host))
+        .order_by(Alert.timestamp.desc())
+    )
     alerts = session.exec(statement).all()
-    logger.debug(f"User {current_user.username} retrieved {len(alerts)} alerts")
+    logger.debug("User %s retrieved %d alerts", current_user.username, len(alerts))
     
     # Manually construct response with host data
     result = []
@@ -52,6 +61,27 @@ def get_alerts(session: Session = Depends(get_session), current_user = Depends(g
     return result
 
 
+@router.get("/archive")
+def get_archived_alerts(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    host_id: Optional[int] = None,
+    severity: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=ARCHIVE_QUERY_LIMIT),
+    current_user = Depends(get_current_user)
+):
+    """Alerts moved out of the DB by the retention job, newest first (start inclusive, end exclusive)"""
+    alerts = alert_archive.query(start=start, end=end, host_id=host_id, severity=severity, limit=limit)
+    logger.debug("User %s retrieved %d archived alerts", current_user.username, len(alerts))
+    return alerts
+
+
+@router.get("/retention")
+def get_retention(current_user = Depends(require_role(UserRole.ADMIN))):
+    """Retention per severity and archive job status (ADMIN only)"""
+    return alert_archive.stats()
+
+
 @router.post("/", response_model=dict, status_code=201)
 def create_alert(
     alert_data: AlertCreate,
@@ -61,7 +91,7 @@ def create_alert(
     """Create alert manually (ADMIN only)"""
     # Sprawdź czy host istnieje
     host = session.get(Host, alert_data.host_id)
-    if not host:
+    if not host or host.deleted_at is not None:
         raise HTTPException(status_code=404, detail=f"Host {alert_data.host_id} not found")
     
     # Stwórz alert
@@ -74,6 +104,7 @@ def create_alert(
     session.add(alert)
     session.commit()
     session.refresh(alert)
+    dashboard_cache.invalidate_alerts()
     
     logger.info(f"Admin {current_user.username} created alert for host {host.name}")
     
@@ -107,6 +138,7 @@ def update_alert(
     session.add(alert)
     session.commit()
     session.refresh(alert)
+    dashboard_cache.invalidate_alerts()
     
     logger.info(f"Admin {current_user.username} updated alert {alert_id}")
     
@@ -132,6 +164,7 @@ def delete_alert(
     
     session.delete(alert)
     session.commit()
+    dashboard_cache.invalidate_alerts()
     
     logger.warning(f"Admin {current_user.username} deleted alert {alert_id}")
 
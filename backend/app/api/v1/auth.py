@@ -1,18 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from datetime import timedelta
+from typing import Optional
 import logging
 
-from app.db.session import get_session
+from app.db.session import get_session, get_read_session, get_async_session
+from app.db.writer import db_writer
 from app.db.models import User, UserRole
 from app.utils.jwt_utils import (
-    hash_password,
-    verify_password,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from app.utils.role_decorator import require_role, get_current_user
+from app.utils.role_decorator import require_role
+from app.utils.user_cache import user_cache
+from app.utils.password_pool import password_pool, PasswordPoolBusy
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -42,19 +45,32 @@ class UserUpdate(BaseModel):
     role: UserRole = None
 
 
+async def _password_job(job, *args):
+    """Run bcrypt in the password pool; a full pool means 503 instead of a stalled server"""
+    try:
+        return await job(*args)
+    except PasswordPoolBusy as e:
+        logger.warning(f"Password pool overloaded, rejecting request: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service busy, try again later",
+            headers={"Retry-After": "1"}
+        )
+
+
 @router.post("/login", response_model=LoginResponse)
-def login(
+async def login(
     credentials: LoginRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Login user and return JWT access token with role
     """
     # Find user by username
     statement = select(User).where(User.username == credentials.username)
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not await _password_job(password_pool.verify, credentials.password, user.hashed_password):
         logger.warning(f"Failed login attempt for username: {credentials.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -86,16 +102,16 @@ def login(
 
 
 @router.post("/register", response_model=LoginResponse)
-def register(
+async def register(
     data: RegisterRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Register new user - first user becomes ADMIN, rest require ADMIN registration
     """
     # Check if username exists
     statement = select(User).where(User.username == data.username)
-    existing_user = session.exec(statement).first()
+    existing_user = (await session.exec(statement)).first()
     
     if existing_user:
         logger.warning(f"Registration attempt with existing user {data.username}")
@@ -105,13 +121,13 @@ def register(
         )
     
     # Check if this is the first user
-    user_count = len(session.exec(select(User)).all())
+    user_count = (await session.exec(select(func.count(User.id)))).one()
     
     # First user is ADMIN, others default to USER
     role = UserRole.ADMIN if user_count == 0 else UserRole.USER
     
     # Create new user
-    hashed_pwd = hash_password(data.password)
+    hashed_pwd = await _password_job(password_pool.hash, data.password)
     new_user = User(
         username=data.username,
         email=data.email,
@@ -119,9 +135,12 @@ def register(
         role=role
     )
     
-    session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    def save(write_session: Session) -> User:
+        write_session.add(new_user)
+        write_session.flush()
+        return new_user
+
+    new_user = await db_writer.run(save)
     
     # Return token immediately after registration
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -140,40 +159,48 @@ def register(
 
 
 @router.put("/users/{user_id}", response_model=dict)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(UserRole.ADMIN))
 ):
     """
     Update user details (ADMIN only)
     """
-    user = session.get(User, user_id)
-    if not user:
+    if not await session.get(User, user_id):
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
-    
-    # Update fields if provided
-    if user_update.email:
-        user.email = user_update.email
-    if user_update.password:
-        user.hashed_password = hash_password(user_update.password)
-    if user_update.role:
-        user.role = user_update.role
-    
-    session.add(user)
-    session.commit()
-    session.refresh(user)
-    
-    logger.info(f"Admin {current_user.username} updated user {user.username}")
-    
-    return {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "role": user.role,
-        "is_active": user.is_active
-    }
+
+    hashed_pwd = await _password_job(password_pool.hash, user_update.password) if user_update.password else None
+
+    def save(write_session: Session) -> Optional[dict]:
+        user = write_session.get(User, user_id)
+        if not user:
+            return None  # deleted while the password was hashed
+        # Update fields if provided
+        if user_update.email:
+            user.email = user_update.email
+        if hashed_pwd:
+            user.hashed_password = hashed_pwd
+        if user_update.role:
+            user.role = user_update.role
+        write_session.add(user)
+        return {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "role": user.role,
+            "is_active": user.is_active
+        }
+
+    result = await db_writer.run(save)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+    # Role/password changes must apply to already issued tokens right away
+    user_cache.invalidate_user(user_id)
+
+    logger.info(f"Admin {current_user.username} updated user {result['username']}")
+    return result
 
 
 @router.delete("/users/{user_id}", status_code=204)
@@ -194,6 +221,7 @@ def delete_user(
     
     session.delete(user)
     session.commit()
+    user_cache.invalidate_user(user_id)
     
     logger.warning(f"Admin {current_user.username} deleted user {user.username}")
 
@@ -201,7 +229,7 @@ def delete_user(
 
 @router.get("/users")
 def get_users(
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(require_role(UserRole.ADMIN))
 ):
     """
@@ -223,6 +251,14 @@ def get_users(
     ]
 
 
+@router.get("/cache/stats")
+def get_user_cache_stats(current_user: User = Depends(require_role(UserRole.ADMIN))):
+    """
+    Authenticated-user cache size and hit ratio (ADMIN only)
+    """
+    return user_cache.stats()
+
+
 @router.post("/logout")
 def logout():
     """
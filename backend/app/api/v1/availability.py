@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+import logging
+
+from app.db.session import get_read_session
+from app.db.models import Host, HostGroup, User
+from app.utils.role_decorator import get_current_user
+from app.services.availability import host_availability, group_availability, hosts_availability
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+DEFAULT_RANGE_DAYS = 30
+
+
+def _range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+@router.get("/hosts", response_model=list)
+def read_hosts_availability(
+    start: Optional[date] = Query(None, description="First UTC day (default: 30 days ago)"),
+    end: Optional[date] = Query(None, description="Last UTC day, inclusive (default: today)"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Uptime %, outages and MTTR of every host over the range, worst uptime first"""
+    start, end = _range(start, end)
+    summaries = hosts_availability(session, start, end)
+    hosts = session.exec(select(Host).where(Host.deleted_at.is_(None))).all()
+    result = [
+        {"host_id": host.id, "name": host.name, **summaries[host.id]}
+        for host in hosts if host.id in summaries
+    ]
+    result.sort(key=lambda row: (row["uptime_percent"] is None, row["uptime_percent"] or 0))
+    return result
+
+
+@router.get("/hosts/{host_id}", response_model=dict)
+def read_host_availability(
+    host_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Uptime %, outages and MTTR of one host with a per-day breakdown"""
+    host = session.get(Host, host_id)
+    if not host or host.deleted_at is not None:
+        raise HTTPException(status_code=404, detail=f"Host {host_id} not found")
+    start, end = _range(start, end)
+    return {"host_id": host_id, **host_availability(session, host_id, start, end)}
+
+
+@router.get("/hostgroups/{group_id}", response_model=dict)
+def read_hostgroup_availability(
+    group_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Combined uptime %, outages and MTTR of the group's hosts with a per-day breakdown"""
+    group = session.get(HostGroup, group_id)
+    if not group or group.deleted_at is not None:
+        raise HTTPException(status_code=404, detail=f"Host group {group_id} not found")
+    start, end = _range(start, end)
+    return {"group_id": group_id, **group_availability(session, group_id, start, end)}
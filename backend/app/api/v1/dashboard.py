@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Response
+from sqlmodel import Session
+import logging
+
+from app.db.session import get_read_session
+from app.db.models import User
+from app.services.dashboard_cache import dashboard_cache
+from app.utils.role_decorator import get_current_user
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/snapshot")
+def get_snapshot(
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Hosts, group summaries and latest alerts in one response, served from the in-process cache"""
+    return Response(content=dashboard_cache.snapshot(session), media_type="application/json")
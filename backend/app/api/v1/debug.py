@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from datetime import datetime
+import json
+import logging
+import re
+
+from app.db.models import User, UserRole
+from app.utils.role_decorator import require_role
+from app.utils.profiler import profiler, ProfilerBusy, PROFILE_MAX_SECONDS
+from app.services.flight_recorder import flight_recorder, FLIGHT_DUMP_PREFIX
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+DUMP_NAME = re.compile(rf"^{FLIGHT_DUMP_PREFIX}[0-9T]+\.json$")  # no paths - only files the recorder wrote
+
+
+@router.get("/profile")
+def profile(
+    seconds: float = Query(10, ge=1, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+    idle: bool = Query(False, description="Keep samples of threads that are only waiting"),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """
+    Sample the stacks of this worker for N seconds (ADMIN only).
+    Returns collapsed stacks for flamegraph.pl / speedscope.
+    """
+    logger.info(f"Profiling for {seconds}s requested by {current_user.username}")
+    try:
+        stacks = profiler.profile(seconds, interval=interval_ms / 1000, include_idle=idle)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    filename = f"profile-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.folded"
+    return Response(
+        content=stacks,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/flight", response_model=list)
+def read_flight_dumps(current_user: User = Depends(require_role(UserRole.ADMIN))):
+    """Slow ping cycles dumped by the flight recorder, newest first (ADMIN only)"""
+    result = []
+    for path in flight_recorder.dumps():
+        stat = path.stat()
+        result.append({
+            "name": path.name,
+            "size": stat.st_size,
+            "modified": datetime.utcfromtimestamp(stat.st_mtime),
+        })
+    return result
+
+
+@router.get("/flight/{name}", response_model=dict)
+def read_flight_dump(name: str, current_user: User = Depends(require_role(UserRole.ADMIN))):
+    """One flight recorder dump: the slow cycle and the cycles before it (ADMIN only)"""
+    path = flight_recorder.directory / name
+    if not DUMP_NAME.match(name) or not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Flight dump {name} not found")
+    return json.loads(path.read_text())
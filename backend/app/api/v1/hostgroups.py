@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
+from sqlalchemy import case, and_
 from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
 import logging
 
-from app.db.session import get_session
+from app.db.session import get_session, get_read_session
 from app.db.models import HostGroup, Host, User, UserRole
 from app.utils.role_decorator import require_role, get_current_user
+from app.services.dashboard_cache import dashboard_cache
+from app.services.jobs import job_runner
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -14,11 +19,27 @@ router = APIRouter()
 class HostGroupCreate(BaseModel):
     name: str
     description: str = None
+    parent_id: Optional[int] = None  # gateway host every member depends on
 
 
 class HostGroupUpdate(BaseModel):
     name: str = None
     description: str = None
+    parent_id: Optional[int] = None  # explicit null removes the gateway
+
+
+def _name_taken(session: Session, name: str) -> bool:
+    return session.exec(
+        select(HostGroup.id).where(HostGroup.name == name, HostGroup.deleted_at.is_(None))
+    ).first() is not None
+
+
+def _check_gateway(session: Session, parent_id: Optional[int]):
+    if parent_id is None:
+        return
+    host = session.get(Host, parent_id)
+    if not host or host.deleted_at is not None:
+        raise HTTPException(status_code=404, detail=f"Gateway host {parent_id} not found")
 
 
 @router.post("/", response_model=dict, status_code=201)
@@ -28,57 +49,108 @@ def create_hostgroup(
     current_user: User = Depends(require_role(UserRole.ADMIN))
 ):
     """CREATE - Create host group"""
-    existing = session.exec(select(HostGroup).where(HostGroup.name == data.name)).first()
-    if existing:
+    if _name_taken(session, data.name):
         raise HTTPException(status_code=400, detail=f"Host group '{data.name}' already exists")
     
-    group = HostGroup(name=data.name, description=data.description)
+    _check_gateway(session, data.parent_id)
+    group = HostGroup(name=data.name, description=data.description, parent_id=data.parent_id)
     session.add(group)
     session.commit()
     session.refresh(group)
+    dashboard_cache.upsert_group(group)
     
     logger.info(f"Admin {current_user.username} created host group '{group.name}'")
     
-    return {"id": group.id, "name": group.name, "description": group.description, "created_at": group.created_at}
+    return {
+        "id": group.id,
+        "name": group.name,
+        "description": group.description,
+        "parent_id": group.parent_id,
+        "created_at": group.created_at
+    }
 
 
 @router.get("/", response_model=list)
 def read_hostgroups(
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """READ - Get all host groups"""
-    groups = session.exec(select(HostGroup)).all()
+    # Count hosts in SQL instead of loading every group's hosts (N+1)
+    statement = (
+        select(HostGroup, func.count(Host.id))
+        .outerjoin(Host, and_(Host.group_id == HostGroup.id, Host.deleted_at.is_(None)))
+        .where(HostGroup.deleted_at.is_(None))
+        .group_by(HostGroup.id)
+    )
+    rows = session.exec(statement).all()
     
     return [
         {
             "id": g.id,
             "name": g.name,
             "description": g.description,
+            "parent_id": g.parent_id,
             "created_at": g.created_at,
-            "host_count": len(g.hosts)
+            "host_count": host_count
+        }
+        for g, host_count in rows
+    ]
+
+
+@router.get("/summary", response_model=list)
+def read_hostgroups_summary(
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """READ - Per-group UP/DOWN/UNREACHABLE/unknown host counts (single GROUP BY)"""
+    statement = (
+        select(
+            HostGroup.id,
+            HostGroup.name,
+            func.count(Host.id),
+            func.coalesce(func.sum(case((Host.status == "UP", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Host.status == "DOWN", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Host.status == "UNREACHABLE", 1), else_=0)), 0),
+        )
+        .outerjoin(Host, and_(Host.group_id == HostGroup.id, Host.deleted_at.is_(None)))
+        .where(HostGroup.deleted_at.is_(None))
+        .group_by(HostGroup.id)
+    )
+    rows = session.exec(statement).all()
+
+    return [
+        {
+            "id": group_id,
+            "name": name,
+            "host_count": total,
+            "up": up,
+            "down": down,
+            "unreachable": unreachable,
+            "unknown": total - up - down - unreachable
         }
-        for g in groups
+        for group_id, name, total, up, down, unreachable in rows
     ]
 
 
 @router.get("/{group_id}", response_model=dict)
 def read_hostgroup(
     group_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """READ - Get single host group with hosts"""
     group = session.get(HostGroup, group_id)
-    if not group:
+    if not group or group.deleted_at is not None:
         raise HTTPException(status_code=404, detail=f"Host group {group_id} not found")
     
     return {
         "id": group.id,
         "name": group.name,
         "description": group.description,
+        "parent_id": group.parent_id,
         "created_at": group.created_at,
-        "hosts": [{"id": h.id, "name": h.name, "ip": h.ip, "status": h.status} for h in group.hosts]
+        "hosts": [{"id": h.id, "name": h.name, "ip": h.ip, "status": h.status} for h in group.hosts if h.deleted_at is None]
     }
 
 
@@ -91,43 +163,54 @@ def update_hostgroup(
 ):
     """UPDATE - Update host group"""
     group = session.get(HostGroup, group_id)
-    if not group:
+    if not group or group.deleted_at is not None:
         raise HTTPException(status_code=404, detail=f"Host group {group_id} not found")
     
     if data.name and data.name != group.name:
-        existing = session.exec(select(HostGroup).where(HostGroup.name == data.name)).first()
-        if existing:
+        if _name_taken(session, data.name):
             raise HTTPException(status_code=400, detail=f"Host group '{data.name}' already exists")
         group.name = data.name
     
     if data.description:
         group.description = data.description
+
+    if "parent_id" in data.model_fields_set:
+        _check_gateway(session, data.parent_id)
+        group.parent_id = data.parent_id
     
     session.add(group)
     session.commit()
     session.refresh(group)
+    dashboard_cache.upsert_group(group)
     
     logger.info(f"Admin {current_user.username} updated host group '{group.name}'")
     
-    return {"id": group.id, "name": group.name, "description": group.description}
+    return {"id": group.id, "name": group.name, "description": group.description, "parent_id": group.parent_id}
 
 
-@router.delete("/{group_id}", status_code=204)
+@router.delete("/{group_id}", status_code=status.HTTP_202_ACCEPTED)
 def delete_hostgroup(
     group_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(require_role(UserRole.ADMIN))
 ):
-    """DELETE - Delete host group"""
+    """DELETE - Hide the group now; its hosts are unassigned by a background job (GET /jobs/{job_id})"""
     group = session.get(HostGroup, group_id)
-    if not group:
+    if not group or group.deleted_at is not None:
         raise HTTPException(status_code=404, detail=f"Host group {group_id} not found")
     
-    group_name = group.name
-    session.delete(group)
+    name = group.name
+    group.deleted_at = datetime.utcnow()
+    # Free the (unique) name for a new group while the removal job is still running
+    group.name = f"{name} [deleted #{group.id}]"
+    session.add(group)
+    job = job_runner.create(session, "delete_hostgroup", target_id=group_id, created_by=current_user.username)
     session.commit()
+    job_runner.wake()
+    dashboard_cache.remove_group(group_id)
     
-    logger.warning(f"Admin {current_user.username} deleted host group '{group_name}'")
+    logger.warning(f"Admin {current_user.username} deleted host group '{name}' (job {job.id})")
+    return {"job_id": job.id}
 
 
 @router.put("/{group_id}/hosts/{host_id}", response_model=dict)
@@ -139,17 +222,18 @@ def assign_host_to_group(
 ):
     """Assign host to host group (ADMIN only)"""
     group = session.get(HostGroup, group_id)
-    if not group:
+    if not group or group.deleted_at is not None:
         raise HTTPException(status_code=404, detail=f"Host group {group_id} not found")
 
     host = session.get(Host, host_id)
-    if not host:
+    if not host or host.deleted_at is not None:
         raise HTTPException(status_code=404, detail=f"Host {host_id} not found")
 
     host.group_id = group_id
     session.add(host)
     session.commit()
     session.refresh(host)
+    dashboard_cache.upsert_host(host)
 
     logger.info(f"Admin {current_user.username} assigned host {host.id} to group {group.name}")
 
@@ -169,7 +253,7 @@ def unassign_host_from_group(
 ):
     """Remove host from host group (ADMIN only)"""
     host = session.get(Host, host_id)
-    if not host:
+    if not host or host.deleted_at is not None:
         raise HTTPException(status_code=404, detail=f"Host {host_id} not found")
 
     if host.group_id != group_id:
@@ -178,5 +262,6 @@ def unassign_host_from_group(
     host.group_id = None
     session.add(host)
     session.commit()
+    dashboard_cache.upsert_host(host)
 
     logger.info(f"Admin {current_user.username} unassigned host {host.id} from group {group_id}")
@@ -1,34 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from sqlmodel import select, delete, Session, col
+import json
+from sqlmodel import select, Session, col
+from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 
-from app.db.session import get_session
-from app.db.models import Host, Alert, User, UserRole
-from app.utils.role_decorator import require_role
+from app.db.session import get_session, get_read_session
+from app.db.versioning import entity_version
+from app.db.models import Host, HostCheck, HostGroup, User, UserRole
+from app.utils.role_decorator import require_role, get_current_user
+from app.services.dashboard_cache import dashboard_cache
+from app.services.jobs import job_runner
+from app.services.discovery import DISCOVERY_MAX_ADDRESSES, address_count, parse_networks
+from app.services.checks import validate_check
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+class DiscoveryRequest(BaseModel):
+    cidrs: List[str] = Field(..., min_length=1, description="Ranges to sweep, e.g. 10.0.0.0/16")
+    group_id: Optional[int] = Field(None, description="Group the discovered hosts are added to")
+    ports: Optional[List[int]] = Field(None, description="TCP ports tried besides ICMP (default 22, 80, 443)")
+    rate: Optional[int] = Field(None, ge=1, le=5000, description="Addresses per second")
+
+
+class CheckCreate(BaseModel):
+    type: str = Field(..., description="reachable | icmp | tcp | http | dns | command")
+    config: dict = Field(default_factory=dict, description="Type specific, e.g. {\"ports\": [22]} - see app.services.checks")
+    enabled: bool = True
+
+
+def _check_dict(check: HostCheck, redact: bool = False) -> dict:
+    config = json.loads(check.config)
+    if redact and check.type == "command":
+        config.pop("command", None)  # command lines may carry credentials - only admins see them
+    return {
+        "id": check.id,
+        "host_id": check.host_id,
+        "type": check.type,
+        "config": config,
+        "enabled": check.enabled,
+        "created_at": check.created_at,
+    }
+
+
+def _check_parent(session: Session, host_id: Optional[int], parent_id: Optional[int]):
+    """The upstream host must exist and must not depend on the host itself (directly or further up)"""
+    if parent_id is None:
+        return
+    parent = session.get(Host, parent_id)
+    if not parent or parent.deleted_at is not None:
+        raise HTTPException(status_code=404, detail=f"Parent host {parent_id} not found")
+    seen = set()
+    while parent is not None and parent.id not in seen:
+        if parent.id == host_id:
+            raise HTTPException(status_code=400, detail="Parent host would create a dependency loop")
+        seen.add(parent.id)
+        parent = session.get(Host, parent.parent_id) if parent.parent_id is not None else None
+
+
 @router.get("/", response_model=List[Host])
-def read_hosts(session: Session = Depends(get_session)):
-    return session.exec(select(Host)).all()
+def read_hosts(request: Request, response: Response, session: Session = Depends(get_read_session)):
+    # ETag follows the highest host change version - unchanged list answers 304 without loading rows
+    etag = f'"hosts-{entity_version(session, Host)}"'
+    client_tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in client_tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return session.exec(select(Host).where(Host.deleted_at.is_(None))).all()
 
 
 @router.get("/search", response_model=List[Host])
 def search_hosts(
     name: Optional[str] = Query(None, description="Search by host name (contains)"),
     ip: Optional[str] = Query(None, description="Search by IP address (contains)"),
-    status: Optional[str] = Query(None, description="Filter by status (UP/DOWN/unknown)"),
-    session: Session = Depends(get_session)
+    status: Optional[str] = Query(None, description="Filter by status (UP/DOWN/UNREACHABLE/unknown)"),
+    session: Session = Depends(get_read_session)
 ):
     """
     Search hosts by name, IP, or status using LIKE/contains pattern matching.
     All parameters are optional and can be combined.
     """
-    query = select(Host)
+    query = select(Host).where(Host.deleted_at.is_(None))
     
     if name:
         query = query.where(col(Host.name).contains(name))
@@ -49,10 +106,13 @@ def create_host(
     session: Session = Depends(get_session),
     current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.USER))
 ):
+    host.deleted_at = None
+    _check_parent(session, None, host.parent_id)
     try:
         session.add(host)
         session.commit()
         session.refresh(host)
+        dashboard_cache.upsert_host(host)
         logger.info(f"User {current_user.username} created host {host.name}")
         return host
     except SQLAlchemyError as e:
@@ -61,10 +121,48 @@ def create_host(
         raise HTTPException(status_code=500, detail="DB error while creating host")
 
 
+@router.post("/discover", status_code=status.HTTP_202_ACCEPTED)
+def discover_hosts(
+    request: DiscoveryRequest,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Sweep CIDR ranges in the background and add responsive addresses as hosts (GET /jobs/{job_id})"""
+    try:
+        networks = parse_networks(request.cidrs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CIDR range: {e}")
+    total = address_count(networks)
+    if total > DISCOVERY_MAX_ADDRESSES:
+        raise HTTPException(
+            status_code=400, detail=f"{total} addresses requested, at most {DISCOVERY_MAX_ADDRESSES} per job"
+        )
+    if any(not 0 < port < 65536 for port in request.ports or ()):
+        raise HTTPException(status_code=400, detail="Ports must be between 1 and 65535")
+    if request.group_id is not None:
+        group = session.get(HostGroup, request.group_id)
+        if not group or group.deleted_at is not None:
+            raise HTTPException(status_code=404, detail=f"Host group {request.group_id} not found")
+
+    try:
+        job = job_runner.create(
+            session, "discover_hosts", target_id=request.group_id,
+            params=request.model_dump(exclude_none=True), created_by=current_user.username
+        )
+        session.commit()
+        job_runner.wake()
+        logger.info(f"Admin {current_user.username} started discovery of {total} addresses (job {job.id})")
+        return {"job_id": job.id, "addresses": total}
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error(f"DB error while starting discovery: {e}")
+        raise HTTPException(status_code=500, detail="DB error while starting discovery")
+
+
 @router.get("/{host_id}", response_model=Host)
-def read_host(host_id: int, session: Session = Depends(get_session)):
+def read_host(host_id: int, session: Session = Depends(get_read_session)):
     host = session.get(Host, host_id)
-    if not host:
+    if not host or host.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Host not found")
     return host
 
@@ -77,7 +175,7 @@ def update_host(
     current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.USER))
 ):
     host = session.get(Host, host_id)
-    if not host:
+    if not host or host.deleted_at is not None:
         logger.warning(f"User {current_user.username} attempted to update non-existent host {host_id}")
         raise HTTPException(status_code=404, detail="Host not found")
 
@@ -85,11 +183,15 @@ def update_host(
     host.ip = host_data.ip
     if host_data.group_id is not None:
         host.group_id = host_data.group_id
+    if "parent_id" in host_data.model_fields_set:  # explicit null removes the dependency
+        _check_parent(session, host_id, host_data.parent_id)
+        host.parent_id = host_data.parent_id
 
     try:
         session.add(host)
         session.commit()
         session.refresh(host)
+        dashboard_cache.upsert_host(host)
         logger.info(f"User {current_user.username} updated host {host.name}")
         return host
     except SQLAlchemyError as e:
@@ -98,25 +200,92 @@ def update_host(
         raise HTTPException(status_code=500, detail="DB error while updating host")
 
 
-@router.delete("/{host_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{host_id}", status_code=status.HTTP_202_ACCEPTED)
 def delete_host(
     host_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(require_role(UserRole.ADMIN))
 ):
+    """Hide the host now; its alerts and the row are removed by a background job (GET /jobs/{job_id})"""
     host = session.get(Host, host_id)
-    if not host:
+    if not host or host.deleted_at is not None:
         logger.warning(f"Admin {current_user.username} attempted to delete non-existent host {host_id}")
         raise HTTPException(status_code=404, detail="Host not found")
 
     try:
-        # Cascade delete handled by database, but we can be explicit
-        session.exec(delete(Alert).where(Alert.host_id == host_id))
-        session.delete(host)
+        host.deleted_at = datetime.utcnow()
+        session.add(host)
+        job = job_runner.create(session, "delete_host", target_id=host_id, created_by=current_user.username)
         session.commit()
-        logger.info(f"Admin {current_user.username} deleted host {host.name}")
-        return
+        job_runner.wake()
+        dashboard_cache.remove_host(host_id)
+        logger.info(f"Admin {current_user.username} deleted host {host.name} (job {job.id})")
+        return {"job_id": job.id}
     except SQLAlchemyError as e:
         session.rollback()
         logger.error(f"DB error while deleting host: {e}")
         raise HTTPException(status_code=500, detail="DB error while deleting host")
+
+
+# ===== CHECKS =====
+
+@router.get("/{host_id}/checks", response_model=list)
+def read_host_checks(
+    host_id: int,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Service checks of a host; a host without any gets the default reachability check (commands: ADMIN only)"""
+    host = session.get(Host, host_id)
+    if not host or host.deleted_at is not None:
+        raise HTTPException(status_code=404, detail="Host not found")
+    checks = session.exec(select(HostCheck).where(HostCheck.host_id == host_id).order_by(HostCheck.id)).all()
+    return [_check_dict(check, redact=current_user.role != UserRole.ADMIN) for check in checks]
+
+
+@router.post("/{host_id}/checks", response_model=dict, status_code=status.HTTP_201_CREATED)
+def create_host_check(
+    host_id: int,
+    data: CheckCreate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.USER))
+):
+    """Add a service check; the host is UP only while all of its checks pass (command checks: ADMIN only)"""
+    host = session.get(Host, host_id)
+    if not host or host.deleted_at is not None:
+        raise HTTPException(status_code=404, detail="Host not found")
+    if data.type == "command" and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Command checks can only be added by an admin")
+    try:
+        config = validate_check(data.type, data.config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid check: {e}")
+
+    check = HostCheck(host_id=host_id, type=data.type, config=json.dumps(config), enabled=data.enabled)
+    try:
+        session.add(check)
+        session.commit()
+        session.refresh(check)
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error(f"DB error while creating check: {e}")
+        raise HTTPException(status_code=500, detail="DB error while creating check")
+    logger.info(f"User {current_user.username} added a {check.type} check to host {host.name}")
+    return _check_dict(check)
+
+
+@router.delete("/{host_id}/checks/{check_id}", status_code=204)
+def delete_host_check(
+    host_id: int,
+    check_id: int,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.USER))
+):
+    check = session.get(HostCheck, check_id)
+    if not check or check.host_id != host_id:
+        raise HTTPException(status_code=404, detail="Check not found")
+    if check.type == "command" and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Command checks can only be removed by an admin")
+    session.delete(check)
+    session.commit()
+    logger.info(f"User {current_user.username} removed check {check_id} from host {host_id}")
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select
+import logging
+
+from app.db.session import get_read_session
+from app.db.models import Job, User, UserRole
+from app.utils.role_decorator import require_role
+from app.services.jobs import job_dict
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/", response_model=list)
+def read_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Recent background jobs, newest first (ADMIN only)"""
+    jobs = session.exec(select(Job).order_by(Job.id.desc()).limit(limit)).all()
+    return [job_dict(job) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=dict)
+def read_job(
+    job_id: int,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Status and progress of one background job (ADMIN only)"""
+    job = session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_dict(job)
@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from sqlmodel import Session, select
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import logging
+
+from app.db.session import get_session, get_read_session
+from app.db.models import Host, HostGroup, MaintenanceWindow, User, UserRole
+from app.utils.role_decorator import require_role, get_current_user
+from app.services.maintenance import RECURRENCES, maintenance_index, occurrences
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+class MaintenanceCreate(BaseModel):
+    host_id: Optional[int] = Field(None, description="Host in maintenance (or group_id)")
+    group_id: Optional[int] = Field(None, description="Group whose hosts are in maintenance (or host_id)")
+    starts_at: datetime = Field(..., description="Start of the (first) window; without a timezone it is UTC")
+    ends_at: datetime
+    recurrence: Optional[str] = Field(None, description="daily | weekly; omit for a one-off window")
+    until: Optional[datetime] = Field(None, description="Recurring: no occurrence starts after this")
+    reason: Optional[str] = None
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored naive UTC like every other timestamp
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _window_dict(window: MaintenanceWindow, now: datetime) -> dict:
+    current = next(occurrences(window, now, now + timedelta(microseconds=1)), None)
+    return {
+        **window.model_dump(),
+        "active_until": current[1] if current else None,
+    }
+
+
+@router.get("/", response_model=list)
+def read_maintenance_windows(
+    host_id: Optional[int] = Query(None),
+    group_id: Optional[int] = Query(None),
+    active: Optional[bool] = Query(None, description="Only windows in progress (true) or not (false)"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Maintenance windows, one-off ones that are over excluded"""
+    now = datetime.utcnow()
+    query = select(MaintenanceWindow).where(
+        (MaintenanceWindow.recurrence.is_not(None)) | (MaintenanceWindow.ends_at > now)
+    )
+    if host_id is not None:
+        query = query.where(MaintenanceWindow.host_id == host_id)
+    if group_id is not None:
+        query = query.where(MaintenanceWindow.group_id == group_id)
+    windows = [_window_dict(window, now) for window in session.exec(query.order_by(MaintenanceWindow.starts_at)).all()]
+    if active is not None:
+        windows = [window for window in windows if (window["active_until"] is not None) == active]
+    return windows
+
+
+@router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+def create_maintenance_window(
+    data: MaintenanceCreate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.USER))
+):
+    """Schedule maintenance: the hosts are not probed and their MQTT alerts are dropped while it lasts"""
+    if (data.host_id is None) == (data.group_id is None):
+        raise HTTPException(status_code=400, detail="Give either host_id or group_id")
+    starts_at, ends_at, until = _utc(data.starts_at), _utc(data.ends_at), _utc(data.until)
+    if ends_at <= starts_at:
+        raise HTTPException(status_code=400, detail="ends_at must be after starts_at")
+    if data.recurrence is not None:
+        if data.recurrence not in RECURRENCES:
+            raise HTTPException(status_code=400, detail=f"recurrence must be one of: {', '.join(RECURRENCES)}")
+        if ends_at - starts_at > RECURRENCES[data.recurrence]:
+            raise HTTPException(status_code=400, detail="A recurring window must be shorter than its period")
+    elif until is not None:
+        raise HTTPException(status_code=400, detail="until applies to recurring windows only")
+
+    if data.host_id is not None:
+        host = session.get(Host, data.host_id)
+        if not host or host.deleted_at is not None:
+            raise HTTPException(status_code=404, detail=f"Host {data.host_id} not found")
+    else:
+        group = session.get(HostGroup, data.group_id)
+        if not group or group.deleted_at is not None:
+            raise HTTPException(status_code=404, detail=f"Host group {data.group_id} not found")
+
+    window = MaintenanceWindow(
+        host_id=data.host_id,
+        group_id=data.group_id,
+        starts_at=starts_at,
+        ends_at=ends_at,
+        recurrence=data.recurrence,
+        until=until,
+        reason=data.reason,
+        created_by=current_user.username
+    )
+    try:
+        session.add(window)
+        session.commit()
+        session.refresh(window)
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error(f"DB error while creating maintenance window: {e}")
+        raise HTTPException(status_code=500, detail="DB error while creating maintenance window")
+    maintenance_index.invalidate()
+
+    target = f"host {data.host_id}" if data.host_id is not None else f"group {data.group_id}"
+    logger.info(f"User {current_user.username} scheduled maintenance {window.id} for {target}")
+    return _window_dict(window, datetime.utcnow())
+
+
+@router.delete("/{window_id}", status_code=204)
+def delete_maintenance_window(
+    window_id: int,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.USER))
+):
+    """Cancel a maintenance window (ends it at once if it is in progress)"""
+    window = session.get(MaintenanceWindow, window_id)
+    if not window:
+        raise HTTPException(status_code=404, detail=f"Maintenance window {window_id} not found")
+    session.delete(window)
+    session.commit()
+    maintenance_index.invalidate()
+    logger.info(f"User {current_user.username} deleted maintenance window {window_id}")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Header, HTTPException, Response
+from typing import Optional
+import os
+
+from app.utils.metrics import metrics, CONTENT_TYPE
+
+router = APIRouter()
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # when set, scrapers must send "Authorization: Bearer <token>"
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text format - counters, gauges and histograms of this worker"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select
+import logging
+
+from app.db.session import get_read_session
+from app.db.models import Host, Alert, Tombstone, User
+from app.db.versioning import tombstone_floor
+from app.utils.role_decorator import get_current_user
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/", response_model=dict)
+def get_changes(
+    since: int = Query(0, ge=0, description="Last version the client has seen (0 = full state)"),
+    limit: int = Query(500, ge=1, le=5000, description="Max changes per page"),
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Hosts and alerts changed after `since`, plus ids deleted after it.
+    Pass the returned `version` as `since` on the next call; repeat while `has_more`.
+    Deleting a host also removes its alerts - clients drop them with the host.
+    Alerts moved to the archive after their retention come back as deleted alerts.
+    Deletions are kept for TOMBSTONE_RETENTION_DAYS: a `since` older than that
+    gets 410 and the client must start again from since=0.
+    """
+    floor = tombstone_floor(session)
+    if 0 < since < floor:
+        raise HTTPException(
+            status_code=410, detail=f"Deletions up to version {floor} were pruned - full resync required (since=0)"
+        )
+    hosts = session.exec(select(Host).where(Host.version > since).order_by(Host.version).limit(limit)).all()
+    alerts = session.exec(select(Alert).where(Alert.version > since).order_by(Alert.version).limit(limit)).all()
+    tombstones = session.exec(
+        select(Tombstone).where(Tombstone.version > since).order_by(Tombstone.version).limit(limit)
+    ).all()
+
+    changes = sorted(
+        [("host", h) for h in hosts] + [("alert", a) for a in alerts] + [("deleted", t) for t in tombstones],
+        key=lambda change: change[1].version
+    )
+    has_more = len(changes) > limit or limit in (len(hosts), len(alerts), len(tombstones))
+    changes = changes[:limit]
+
+    result = {
+        "version": changes[-1][1].version if changes else since,
+        "has_more": has_more,
+        "hosts": [],
+        "alerts": [],
+        "deleted": {"hosts": [], "alerts": []},
+    }
+    for kind, row in changes:
+        if kind == "host" and row.deleted_at is not None:
+            result["deleted"]["hosts"].append(row.id)  # hidden, being removed by a job
+        elif kind == "host":
+            result["hosts"].append(row)
+        elif kind == "alert":
+            result["alerts"].append({
+                "id": row.id,
+                "host_id": row.host_id,
+                "severity": row.severity,
+                "message": row.message,
+                "timestamp": row.timestamp,
+                "version": row.version
+            })
+        else:
+            result["deleted"][f"{row.entity}s"].append(row.entity_id)
+
+    logger.debug("User %s synced %d changes since %s", current_user.username, len(changes), since)
+    return result
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
-from sqlalchemy import Column, ForeignKey
+from sqlalchemy import Column, ForeignKey, Index
 from enum import Enum
 
 
@@ -11,6 +11,13 @@ class UserRole(str, Enum):
     VIEWER = "VIEWER"
 
 
+class JobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(unique=True, index=True)
@@ -26,16 +33,26 @@ class HostGroup(SQLModel, table=True):
     name: str = Field(unique=True, index=True)
     description: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    deleted_at: Optional[datetime] = None  # hidden, removal running as a background job
+    parent_id: Optional[int] = None  # gateway host the members depend on (no FK - host and group would reference each other)
     hosts: List["Host"] = Relationship(back_populates="group")
 
 
 class Host(SQLModel, table=True):
+    # Covering index for per-group status aggregates (GET /hostgroups/summary)
+    __table_args__ = (Index("ix_host_group_id_status", "group_id", "status"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     ip: str
     status: Optional[str] = Field(default="unknown")
     last_seen: Optional[datetime] = Field(default_factory=datetime.utcnow)
     group_id: Optional[int] = Field(default=None, sa_column=Column(ForeignKey("hostgroup.id", ondelete="SET NULL")))
+    version: int = Field(default=0, index=True)  # change version for GET /sync, set on every flush
+    deleted_at: Optional[datetime] = None  # hidden, removal running as a background job
+    status_since: Optional[datetime] = None  # start of the current status (set with each HostTransition)
+    # Upstream dependency (gateway/uplink); overrides the group's. Not probed while it is DOWN.
+    parent_id: Optional[int] = Field(default=None, sa_column=Column(ForeignKey("host.id", ondelete="SET NULL")))
 
     group: Optional[HostGroup] = Relationship(back_populates="hosts")
     alerts: List["Alert"] = Relationship(back_populates="host", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
@@ -46,14 +63,125 @@ class Host(SQLModel, table=True):
 
 class Alert(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    host_id: int = Field(sa_column=Column(ForeignKey("host.id", ondelete="CASCADE")))
+    host_id: int = Field(sa_column=Column(ForeignKey("host.id", ondelete="CASCADE"), index=True))
     severity: str
     message: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
+    version: int = Field(default=0, index=True)
     
     host: Optional[Host] = Relationship(back_populates="alerts")
 
 
+class HostTransition(SQLModel, table=True):
+    """Host status change written by the ping loop - the source of the availability rollups"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    host_id: int = Field(sa_column=Column(ForeignKey("host.id", ondelete="CASCADE"), index=True))
+    group_id: Optional[int] = None  # group at the time of the change
+    status: str  # "UP" | "DOWN" | "UNREACHABLE"
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AvailabilityCounters(SQLModel):
+    """
+    One day of availability, updated whenever a host leaves a state.
+    total_* are running sums over all days up to this one, so any range is
+    the difference of two rows - see app.services.availability.
+    """
+    up_seconds: float = 0
+    down_seconds: float = 0
+    outages: int = 0           # DOWN transitions started that day
+    repairs: int = 0           # outages that ended that day
+    repair_seconds: float = 0  # summed length of those outages (MTTR = repair_seconds / repairs)
+    total_up_seconds: float = 0
+    total_down_seconds: float = 0
+    total_outages: int = 0
+    total_repairs: int = 0
+    total_repair_seconds: float = 0
+
+
+class HostAvailability(AvailabilityCounters, table=True):
+    __table_args__ = {"sqlite_with_rowid": False}  # rows stored in (host_id, day) order
+
+    host_id: int = Field(sa_column=Column(ForeignKey("host.id", ondelete="CASCADE"), primary_key=True))
+    day: date = Field(primary_key=True)
+
+
+class GroupAvailability(AvailabilityCounters, table=True):
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    group_id: int = Field(primary_key=True)  # no FK, purged by the delete_hostgroup job
+    day: date = Field(primary_key=True)
+
+
+class StreamEvent(SQLModel, table=True):
+    """Websocket event log - lets reconnecting clients replay what they missed"""
+    seq: int = Field(primary_key=True)
+    type: str
+    host_id: Optional[int] = None  # no FK, events outlive their host
+    payload: str  # full event as sent to clients (JSON)
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+
+class Tombstone(SQLModel, table=True):
+    """Marker left behind by a deleted host/alert so sync clients can drop it"""
+    __table_args__ = (Index("ix_tombstone_entity_version", "entity", "version"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entity: str  # "host" | "alert"
+    entity_id: int
+    version: int
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class Job(SQLModel, table=True):
+    """Background job (chunked deletes, bulk operations) with progress - see app.services.jobs"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(index=True)
+    status: JobStatus = Field(default=JobStatus.PENDING, index=True)
+    target_id: Optional[int] = None
+    params: Optional[str] = None  # JSON
+    progress: int = 0
+    total: Optional[int] = None
+    result: Optional[str] = None  # JSON
+    error: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class HostCheck(SQLModel, table=True):
+    """Service check the ping loop runs for a host - see app.services.checks (none: default reachability)"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    host_id: int = Field(sa_column=Column(ForeignKey("host.id", ondelete="CASCADE"), index=True))
+    type: str  # "reachable" | "icmp" | "tcp" | "http" | "dns" | "command"
+    config: str = "{}"  # JSON, validated per type
+    enabled: bool = Field(default=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MaintenanceWindow(SQLModel, table=True):
+    """Scheduled maintenance of a host or a group - see app.services.maintenance"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    host_id: Optional[int] = Field(default=None, sa_column=Column(ForeignKey("host.id", ondelete="CASCADE"), index=True))
+    group_id: Optional[int] = Field(default=None, index=True)  # no FK, purged by the delete_hostgroup job
+    starts_at: datetime  # UTC
+    ends_at: datetime
+    recurrence: Optional[str] = None  # None (once) | "daily" | "weekly"
+    until: Optional[datetime] = None  # recurring: no occurrence starts after this
+    reason: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class SyncState(SQLModel, table=True):
+    """Single-row global change counter - every host/alert change takes the next value"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = Field(default=0)
+    # Tombstones up to this version were pruned - a client behind it must resync from scratch
+    tombstone_floor: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+
 
 #Do poprawek: CASCADE przy usuwaniu hostów, bez tego alerty zostaną "sierotami"
 # last_seen moze miec automatyczny timestamp
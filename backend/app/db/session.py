@@ -1,21 +1,274 @@
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import inspect, event, text
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
+import asyncio
+import logging
+import os
+import time
 
+try:
+    import fcntl
+except ImportError:  # Windows - single worker, no lock needed
+    fcntl = None
 
-#We create Path object in order to point our database file
-DB_FILE = Path(__file__).resolve().parents[2] / "data" / "app.db"
+from app.db.versioning import backfill_versions
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+#We create Path object in order to point our database file (DB_PATH overrides it - benchmarks, tests)
+DB_FILE = Path(os.getenv("DB_PATH") or Path(__file__).resolve().parents[2] / "data" / "app.db")
 DB_FILE.parent.mkdir(parents=True, exist_ok=True) #if catalog doesn't exist, create it. If it exists, it's OK
 
 DATABASE_URL = f"sqlite:///{DB_FILE}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_FILE}"
+INIT_LOCK = DB_FILE.parent / "init.lock"
+
+
+
+# ===== STORAGE PROFILE =====
+
+# production: WAL (readers and the writer don't block each other) + tuned caches
+# default: SQLite defaults, only waits for locks instead of failing
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+STORAGE_PROFILES = {
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",      # with WAL: durable across app crashes, fsync only at checkpoints
+        "cache_size": -65536,         # KiB -> 64 MB page cache per connection
+        "mmap_size": 268435456,       # 256 MB of the file read through mmap
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,         # ms to wait for another process holding the lock
+    },
+    "default": {
+        "busy_timeout": 5000,
+    },
+}
+READ_POOL_SIZE = 8
+SPLIT_READS = STORAGE_PROFILES.get(DB_PROFILE, {}).get("journal_mode") == "WAL"  # WriteSession reads via the read pool
+
+
+def _apply_pragmas(dbapi_connection, read_only: bool):
+    pragmas = STORAGE_PROFILES.get(DB_PROFILE, STORAGE_PROFILES["default"])
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        if read_only and name in ("journal_mode", "synchronous"):
+            continue  # database-wide / writer settings
+        cursor.execute(f"PRAGMA {name}={value}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=1")
+    cursor.close()
+
+
+# ===== ENGINES =====
+
+# Writer - one connection per process: `def` endpoints once they write (WriteSession), the DB
+# writer thread (app.db.writer) and startup migrations. Writers queue for it instead of for the file lock.
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0
+)
+
+# Read pools (query_only) - sync for `def` endpoints, async for code on the event loop
+# (async dependencies, ping loop, websockets). Writes from the event loop go through db_writer.
+read_engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_SIZE
+)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=READ_POOL_SIZE, max_overflow=READ_POOL_SIZE)
 
 
+@event.listens_for(engine, "connect")
+def _writer_connect(dbapi_connection, connection_record):
+    # pysqlite starts transactions on its own and breaks SAVEPOINT - let SQLAlchemy do it
+    dbapi_connection.isolation_level = None
+    _apply_pragmas(dbapi_connection, read_only=False)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+@event.listens_for(engine, "begin")
+def _writer_begin(conn):
+    # Take the write lock up front - no deadlock when two processes upgrade from read to write
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@event.listens_for(read_engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _reader_connect(dbapi_connection, connection_record):
+    _apply_pragmas(dbapi_connection, read_only=True)
+
+# What to do when the sync engine is used on the event loop thread: off | warn | raise
+DB_LOOP_CHECK = os.getenv("DB_LOOP_CHECK", "warn")
+
+
+class BlockingDBCallError(RuntimeError):
+    """Sync DB call made from the event loop thread"""
+
+
+def install_loop_check(target_engine):
+    """Report sync queries that run on the event loop thread (they stall every request and websocket)"""
+    event.listen(target_engine, "before_cursor_execute", _check_not_on_event_loop)
+
+
+def _check_not_on_event_loop(conn, cursor, statement, parameters, context, executemany):
+    if DB_LOOP_CHECK == "off":
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # worker thread - fine
+    message = f"Blocking DB call on the event loop: {' '.join(statement.split()[:6])} ..."
+    if DB_LOOP_CHECK == "raise":
+        raise BlockingDBCallError(message)
+    logger.warning(message, stack_info=True)
+
+
+install_loop_check(engine)
+install_loop_check(read_engine)
 
 
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+    # With several uvicorn workers every one of them runs this at startup - one at a time
+    with _init_lock():
+        SQLModel.metadata.create_all(engine)
+        _add_missing_columns()
+        # create_all skips indexes of tables that already exist - add new ones to old databases
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+        backfill_versions(engine)
+        _start_availability()
+
+
+@contextmanager
+def _init_lock():
+    if fcntl is None:
+        yield
+        return
+    with open(INIT_LOCK, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _add_missing_columns():
+    """create_all never alters existing tables - add columns introduced after the DB was created"""
+    with engine.begin() as conn:
+        inspector = inspect(conn)  # same connection - the writer pool has only one
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(engine.dialect)}'
+                if column.default is not None and column.default.is_scalar:
+                    default = column.default.arg
+                    ddl += f" DEFAULT {getattr(default, 'value', default)!r}"
+                conn.exec_driver_sql(ddl)
+
+
+def _start_availability():
+    """Hosts with a status from before availability tracking existed count from now on"""
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE host SET status_since = :now WHERE status_since IS NULL AND status IN ('UP', 'DOWN')"),
+            {"now": datetime.utcnow()}
+        )
+
+
+# ===== METRICS =====
+
+DB_COMMIT_SECONDS = metrics.histogram("db_commit_duration_seconds", "Session commit including its flush")
+DB_SESSIONS_OPEN = metrics.gauge("db_sessions_open", "Request-scoped sessions currently open", ("pool",))
+DB_SESSION_SECONDS = metrics.histogram("db_session_duration_seconds", "How long a request holds its session", ("pool",))
+
+
+@event.listens_for(OrmSession, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+
+@contextmanager
+def _tracked(pool: str):
+    sessions = DB_SESSIONS_OPEN.labels(pool)
+    sessions.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sessions.dec()
+        DB_SESSION_SECONDS.labels(pool).observe(time.perf_counter() - started)
+
+
+class WriteSession(Session):
+    """
+    Session of an endpoint that may write. It reads through the read pool and
+    takes the writer connection (and with it BEGIN IMMEDIATE, the write lock)
+    only at its first flush or DML statement, until the commit or rollback -
+    404 checks, permission checks and pure reads never wait for the writer.
+    """
+
+    def __init__(self, writer=None, reader=None, **kwargs):
+        self.writer = writer or engine
+        # Without WAL the open read transaction would block the commit - read through the writer then
+        self.reader = reader or (read_engine if SPLIT_READS else self.writer)
+        self._writing = False
+        super().__init__(self.writer, **kwargs)
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if clause is not None and getattr(clause, "is_dml", False):
+            self._writing = True
+        return self.writer if self._writing else self.reader
+
+    def flush(self, objects=None):
+        if self.new or self.dirty or self.deleted:
+            self._writing = True  # before the flush hooks ask for a connection
+        super().flush(objects)
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._writing = False
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._writing = False
+
 
 def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    with _tracked("writer"), WriteSession() as session:
+        yield session
+
+
+def get_read_session():
+    with _tracked("read"), Session(read_engine) as session:
+        yield session
+
+
+async def get_async_session():
+    with _tracked("async"):
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
@@ -0,0 +1,95 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlmodel import delete, select, func
+
+from app.db.models import Host, Alert, SyncState, Tombstone
+
+# Tables tracked by GET /sync. Bulk UPDATE/DELETE statements bypass the ORM
+# and therefore this hook - callers using them must stamp versions themselves.
+VERSIONED = (Host, Alert)
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", 30))  # clients offline longer do a full resync
+
+
+def next_versions(session: Session, count: int) -> int:
+    """Reserve `count` consecutive change versions and return the first one.
+
+    The counter row is updated inside the caller's transaction, so SQLite's
+    write lock keeps versions unique and ordered by commit.
+    """
+    conn = session.connection()
+    last = conn.execute(
+        text("UPDATE syncstate SET version = version + :n WHERE id = 1 RETURNING version"),
+        {"n": count}
+    ).scalar()
+    if last is None:
+        conn.execute(text("INSERT INTO syncstate (id, version) VALUES (1, :n)"), {"n": count})
+        last = count
+    return last - count + 1
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_versions(session, flush_context, instances):
+    changed = [obj for obj in session.new if isinstance(obj, VERSIONED)]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, VERSIONED) and session.is_modified(obj, include_collections=False)
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, VERSIONED)]
+    if not changed and not deleted:
+        return
+
+    version = next_versions(session, len(changed) + len(deleted))
+    for obj in changed:
+        obj.version = version
+        version += 1
+    for obj in deleted:
+        session.add(Tombstone(entity=obj.__tablename__, entity_id=obj.id, version=version))
+        version += 1
+
+
+def entity_version(session: Session, model) -> int:
+    """Highest change version of a table, including deletions (used for ETags)"""
+    current = session.exec(select(func.max(model.version))).one() or 0
+    deleted = session.exec(
+        select(func.max(Tombstone.version)).where(Tombstone.entity == model.__tablename__)
+    ).one() or 0
+    # Pruned deletions still count - the ETag must never go back to an older value
+    return max(current, deleted, tombstone_floor(session))
+
+
+def tombstone_floor(session: Session) -> int:
+    """Highest pruned tombstone version; GET /sync cannot answer an older `since` completely"""
+    return session.exec(select(SyncState.tombstone_floor).where(SyncState.id == 1)).first() or 0
+
+
+def prune_tombstones(session: Session, before: datetime) -> int:
+    """Delete tombstones older than `before` and raise the floor to the newest one deleted"""
+    floor = session.exec(select(func.max(Tombstone.version)).where(Tombstone.deleted_at < before)).one()
+    if floor is None:
+        return 0
+    deleted = session.exec(delete(Tombstone).where(Tombstone.version <= floor)).rowcount
+    session.connection().execute(
+        text("UPDATE syncstate SET tombstone_floor = max(tombstone_floor, :floor) WHERE id = 1"), {"floor": floor}
+    )
+    return deleted
+
+
+def backfill_versions(engine):
+    """Give rows created before versioning existed (version 0) unique versions"""
+    with engine.begin() as conn:
+        counter = conn.execute(text("SELECT version FROM syncstate WHERE id = 1")).scalar()
+        if counter is None:
+            conn.execute(text("INSERT INTO syncstate (id, version) VALUES (1, 0)"))
+            counter = 0
+
+        for table in ("host", "alert"):
+            if conn.execute(text(f"SELECT 1 FROM {table} WHERE version = 0 LIMIT 1")).first() is None:
+                continue
+            # ids are unique, so base + id gives every legacy row its own version
+            conn.execute(text(f"UPDATE {table} SET version = :base + id WHERE version = 0"), {"base": counter})
+            counter += conn.execute(text(f"SELECT max(id) FROM {table}")).scalar()
+
+        conn.execute(text("UPDATE syncstate SET version = :v WHERE id = 1"), {"v": counter})
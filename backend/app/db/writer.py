@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.db.session import engine
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WRITER_BATCH_SIZE = 200        # jobs committed together at most
+WRITER_QUEUE_SIZE = 10_000     # jobs waiting before submit() blocks the producer
+
+WriteJob = Callable[[Session], Any]
+
+DB_WRITER_BATCH = metrics.histogram(
+    "db_writer_batch_jobs", "Jobs committed together by the DB writer", buckets=(1, 2, 5, 10, 25, 50, 100, 200)
+)
+
+_STOP = object()
+
+
+class DBWriter:
+    """
+    Single writer thread for the high-volume producers (ping loop, MQTT, register).
+    Producers submit jobs - callables that get a Session and add/change rows.
+    The writer takes whatever is queued, runs every job in its own savepoint
+    (a failing job only rolls back itself) and commits the whole batch once:
+    one fsync for N producers instead of N competing transactions.
+    """
+
+    def __init__(self, engine, batch_size: int = WRITER_BATCH_SIZE, queue_size: int = WRITER_QUEUE_SIZE):
+        self.engine = engine
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.jobs = 0
+        self.commits = 0
+        self.failed = 0
+
+    # ===== PRODUCERS =====
+
+    def submit(self, job: WriteJob) -> Future:
+        """Queue a job; the future resolves with its return value once committed"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def call(self, job: WriteJob) -> Any:
+        """Blocking submit - for threads (MQTT callbacks, sync code)"""
+        return self.submit(job).result()
+
+    async def run(self, job: WriteJob) -> Any:
+        """Submit from the event loop without blocking it"""
+        return await asyncio.wrap_future(self.submit(job))
+
+    # ===== LIFECYCLE =====
+
+    def stop(self, timeout: float = 5):
+        """Commit what is queued, then stop the thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "jobs": self.jobs,
+            "commits": self.commits,
+            "failed": self.failed,
+            "queued": self._queue.qsize(),
+            "jobs_per_commit": round(self.jobs / self.commits, 2) if self.commits else 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                self._thread.start()
+
+    # ===== WRITER THREAD =====
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            stopping = item is _STOP
+            batch = [] if stopping else [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    continue
+                batch.append(item)
+            if batch:
+                self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch: List[Tuple[WriteJob, Future]]):
+        started = time.perf_counter()
+        done = []
+        try:
+            with Session(self.engine, expire_on_commit=False) as session:
+                for job, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with session.begin_nested():
+                            result = job(session)
+                        done.append((future, result))
+                    except Exception as e:
+                        self.failed += 1
+                        future.set_exception(e)
+                session.commit()
+        except Exception as e:
+            logger.error(f"DB writer: commit of {len(done)} jobs failed: {e}")
+            self.failed += len(done)
+            for future, _ in done:
+                future.set_exception(e)
+            return
+
+        self.jobs += len(done)
+        self.commits += 1
+        DB_WRITER_BATCH.observe(len(done))
+        for future, result in done:
+            future.set_result(result)
+        logger.debug("DB writer: committed %d jobs in %.1f ms", len(done), (time.perf_counter() - started) * 1000)
+
+
+db_writer = DBWriter(engine)
+
+metrics.gauge("db_writer_queue_depth", "Write jobs waiting for the writer thread", function=lambda: db_writer.stats()["queued"])
+metrics.counter("db_writer_jobs_total", "Write jobs committed", function=lambda: db_writer.jobs)
+metrics.counter("db_writer_failed_total", "Write jobs that raised or whose commit failed", function=lambda: db_writer.failed)
@@ -1,17 +1,61 @@
 import asyncio
-import logging
+import os
+import time
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from app.api.v1.hosts import router as hosts_router
 from app.api.v1.auth import router as auth_router
 from app.api.v1.alerts import router as alerts_router
 from app.api.v1.hostgroups import router as hostgroups_router
-from app.db.session import create_db_and_tables
-from app.services.ping_service import ping_loop
+from app.api.v1.dashboard import router as dashboard_router
+from app.api.v1.sync import router as sync_router
+from app.api.v1.jobs import router as jobs_router
+from app.api.v1.availability import router as availability_router
+from app.api.v1.metrics import router as metrics_router
+from app.api.v1.debug import router as debug_router
+from app.api.v1.maintenance import router as maintenance_router
+from app.db.session import create_db_and_tables, async_engine
+from app.db.writer import db_writer
+# Hub-only services (ping loop, archive, discovery jobs, profiler) are imported eagerly:
+# the routers every worker serves import them too (archive queries, /debug, discovery
+# limits), so deferring them to start_background_services would not save a worker the
+# import; they only start their loops on the hub.
+from app.services.ping_service import ping_loop, save_probe_state
+from app.services.alert_archive import archive_loop
+from app.services.jobs import job_runner
+from app.services import deletion  # noqa: F401  (registers job handlers)
 from app.services.mqtt_service import mqtt_client
-from app.ws.alerts import router as ws_router
-from app.utils.logging_config import logger
+from app.services.checks import check_runner
+from app.services.dashboard_cache import dashboard_cache
+from app.services.maintenance import maintenance_index
+from app.utils.password_pool import password_pool
+from app.utils.user_cache import user_cache
+from app.utils.metrics import MetricsMiddleware, metrics
+from app.ws.alerts import router as ws_router, manager
+from app.ws.bus import bus
+from app.ws.stream import event_stream
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.utils.logging_config import setup_logging
+
+logger = setup_logging()
+
+STARTUP_SECONDS = metrics.gauge("app_startup_seconds", "Seconds from process start to each startup milestone", ("phase",))
+
+
+def _process_age() -> float:
+    """Seconds since this process was started (interpreter start included); Linux only, else 0"""
+    try:
+        with open("/proc/self/stat") as stat, open("/proc/uptime") as uptime:
+            started_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+            return float(uptime.read().split()[0]) - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+STARTUP_SECONDS.labels("imported").set(_process_age())
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)  # per-route latency on GET /metrics
 
 #podpinamy routery
 
@@ -19,6 +63,13 @@ app.include_router(hosts_router, prefix="/hosts", tags=["hosts"])
 app.include_router(auth_router, tags=["auth"])
 app.include_router(alerts_router, prefix="/alerts", tags=["alerts"])
 app.include_router(hostgroups_router, prefix="/hostgroups", tags=["hostgroups"])
+app.include_router(dashboard_router, prefix="/dashboard", tags=["dashboard"])
+app.include_router(sync_router, prefix="/sync", tags=["sync"])
+app.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
+app.include_router(availability_router, prefix="/availability", tags=["availability"])
+app.include_router(metrics_router, tags=["metrics"])
+app.include_router(debug_router, prefix="/debug", tags=["debug"])
+app.include_router(maintenance_router, prefix="/maintenance", tags=["maintenance"])
 
 #websocket
 app.include_router(ws_router)
@@ -27,18 +78,48 @@ app.include_router(ws_router)
 #Create database on start
 @app.on_event("startup")
 async def on_startup():
-    create_db_and_tables()
+    started = time.perf_counter()
+    await run_in_threadpool(create_db_and_tables)
+    STARTUP_SECONDS.labels("database").set(time.perf_counter() - started)
     logger.info("Database initialized")
+    async with AsyncSession(async_engine) as session:
+        await session.run_sync(event_stream.load)
+    # Keep the caches of all uvicorn workers in sync
+    dashboard_cache.on_change = lambda change: bus.notify("dashboard", change)
+    user_cache.on_invalidate = lambda user_id: bus.notify("user", {"user_id": user_id})
+    bus.on("dashboard", dashboard_cache.apply_remote)
+    bus.on("user", lambda data: user_cache.invalidate_local(data["user_id"]))
+    bus.on("jobs", lambda data: job_runner.wake_local())
+    maintenance_index.on_invalidate = lambda: bus.notify("maintenance", {})
+    bus.on("maintenance", lambda data: maintenance_index.invalidate_local())
+    # Only the bus hub runs the ping loop and MQTT (one copy across workers)
+    await bus.start(on_leader=start_background_services)
+    ready = _process_age()
+    STARTUP_SECONDS.labels("ready").set(ready)
+    logger.info(f"Ready to serve {ready:.2f}s after process start")
+
+
+async def start_background_services():
     # Start ping loop in background (non-blocking)
     asyncio.create_task(ping_loop())
+    asyncio.create_task(archive_loop())
+    asyncio.create_task(job_runner.run_loop())
     mqtt_client.connect()
-    logger.info("MQTT client connected")
+    logger.info("MQTT client connecting in background")
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    mqtt_client.disconnect()
-    logger.info("MQTT client disconnected")
+    if bus.is_hub or not bus.started:
+        mqtt_client.disconnect()
+        logger.info("MQTT client disconnected")
+        await asyncio.to_thread(save_probe_state)
+        await check_runner.close()
+    password_pool.shutdown()
+    manager.disconnect_all()
+    await bus.stop()
+    await run_in_threadpool(db_writer.stop)
+    await async_engine.dispose()
 
 
 
@@ -0,0 +1,229 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, delete, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.models import Alert, Host, Tombstone
+from app.db.session import async_engine
+from app.db.versioning import TOMBSTONE_RETENTION_DAYS, next_versions, prune_tombstones
+from app.db.writer import db_writer
+from app.services.dashboard_cache import dashboard_cache
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(__file__).resolve().parents[2] / "data" / "archive"
+# Days an alert stays in the DB, per severity (ALERT_RETENTION_<SEVERITY>_DAYS overrides)
+ALERT_RETENTION_DAYS = {
+    severity: int(os.getenv(f"ALERT_RETENTION_{severity}_DAYS", days))
+    for severity, days in (("INFO", 30), ("WARNING", 90), ("CRITICAL", 365))
+}
+DEFAULT_RETENTION_DAYS = int(os.getenv("ALERT_RETENTION_DEFAULT_DAYS", 90))  # any other severity
+ARCHIVE_CHUNK = 500          # alerts moved per writer job
+ARCHIVE_PAUSE = 0.05         # seconds between chunks - leaves room for other writers
+ARCHIVE_INTERVAL = 3600      # seconds between archive runs
+ARCHIVE_QUERY_LIMIT = 10_000
+
+
+class AlertArchive:
+    """
+    Moves alerts past their retention out of the DB into monthly gzip JSONL files
+    (data/archive/alerts-YYYY-MM.jsonl.gz), oldest first, in small chunks.
+    A chunk is written and fsynced before it is deleted, so a crash can only
+    duplicate archived lines (query() drops duplicates), never lose alerts.
+    """
+
+    def __init__(
+        self,
+        directory: Path = ARCHIVE_DIR,
+        retention: Dict[str, int] = ALERT_RETENTION_DAYS,
+        default_retention: int = DEFAULT_RETENTION_DAYS,
+        chunk_size: int = ARCHIVE_CHUNK
+    ):
+        self.directory = directory
+        self.retention = retention
+        self.default_retention = default_retention
+        self.chunk_size = chunk_size
+        self.last_run: Optional[datetime] = None
+        self.archived_total = 0
+
+    # ===== ARCHIVING =====
+
+    def expired(self, now: datetime):
+        """Oldest chunk of alerts past their severity's retention"""
+        conditions = [
+            and_(Alert.severity == severity, Alert.timestamp < now - timedelta(days=days))
+            for severity, days in self.retention.items()
+        ]
+        conditions.append(and_(
+            Alert.severity.not_in(list(self.retention)),
+            Alert.timestamp < now - timedelta(days=self.default_retention)
+        ))
+        return (
+            select(Alert, Host.name)
+            .join(Host, Host.id == Alert.host_id, isouter=True)
+            .where(or_(*conditions))
+            .order_by(Alert.id)
+            .limit(self.chunk_size)
+        )
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """Archive everything that is due; returns the number of alerts moved"""
+        now = now or datetime.utcnow()
+        total = 0
+        while True:
+            async with AsyncSession(async_engine) as session:
+                rows = (await session.exec(self.expired(now))).all()
+            if not rows:
+                break
+            records = [self._record(alert, host_name) for alert, host_name in rows]
+            await asyncio.to_thread(self.write, records)
+            ids = [record["id"] for record in records]
+            await db_writer.run(lambda session: self.remove(session, ids))
+            total += len(ids)
+            if len(rows) < self.chunk_size:
+                break
+            await asyncio.sleep(ARCHIVE_PAUSE)
+
+        # Tombstones (these deletions included) are kept only as long as a sync client may be offline
+        pruned = await db_writer.run(
+            lambda session: prune_tombstones(session, now - timedelta(days=TOMBSTONE_RETENTION_DAYS))
+        )
+
+        self.last_run = now
+        self.archived_total += total
+        if total:
+            dashboard_cache.invalidate_alerts()
+            logger.info(f"Alert archive: moved {total} alerts to {self.directory}")
+        if pruned:
+            logger.info(f"Alert archive: pruned {pruned} tombstones older than {TOMBSTONE_RETENTION_DAYS} days")
+        return total
+
+    @staticmethod
+    def remove(session, ids: List[int]):
+        """Delete archived alerts, with the tombstones /sync clients need to drop them too"""
+        session.exec(delete(Alert).where(Alert.id.in_(ids)))
+        # The bulk delete bypasses the versioning hook - stamp the deletions here
+        version = next_versions(session, len(ids))
+        session.add_all([
+            Tombstone(entity=Alert.__tablename__, entity_id=alert_id, version=version + offset)
+            for offset, alert_id in enumerate(ids)
+        ])
+
+    def write(self, records: List[dict]):
+        """Append records to their month files and fsync them"""
+        by_month: Dict[str, List[dict]] = {}
+        for record in records:
+            by_month.setdefault(record["timestamp"][:7], []).append(record)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for month, month_records in by_month.items():
+            data = "".join(json.dumps(record) + "\n" for record in month_records).encode()
+            with open(self._path(month), "ab") as raw:
+                # Every append is a separate gzip member - concatenated members are one valid stream
+                with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                    archive.write(data)
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    # ===== QUERY =====
+
+    def query(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        host_id: Optional[int] = None,
+        severity: Optional[str] = None,
+        limit: int = 1000
+    ) -> List[dict]:
+        """Archived alerts matching the filters, newest first"""
+        start, end = _utc_naive(start), _utc_naive(end)
+        start_key = start.isoformat() if start else None
+        end_key = end.isoformat() if end else None
+        found: Dict[int, dict] = {}
+        for path in self._files(start, end):
+            for record in self._read(path):
+                if start_key and record["timestamp"] < start_key:
+                    continue
+                if end_key and record["timestamp"] >= end_key:
+                    continue
+                if host_id is not None and record["host_id"] != host_id:
+                    continue
+                if severity and record["severity"] != severity:
+                    continue
+                found[record["id"]] = record
+        results = sorted(found.values(), key=lambda r: (r["timestamp"], r["id"]), reverse=True)
+        return results[:limit]
+
+    def _files(self, start: Optional[datetime], end: Optional[datetime]) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        first = start.strftime("%Y-%m") if start else None
+        last = end.strftime("%Y-%m") if end else None
+        paths = []
+        for path in sorted(self.directory.glob("alerts-*.jsonl.gz")):
+            month = path.name[len("alerts-"):-len(".jsonl.gz")]
+            if (first and month < first) or (last and month > last):
+                continue
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def _read(path: Path) -> Iterable[dict]:
+        try:
+            with gzip.open(path, "rt") as archive:
+                for line in archive:
+                    yield json.loads(line)
+        except (EOFError, OSError, ValueError) as e:
+            # Member being appended right now, or a torn write after a crash
+            logger.debug(f"Alert archive: stopped reading {path.name}: {e}")
+
+    # ===== HELPERS =====
+
+    def _path(self, month: str) -> Path:
+        return self.directory / f"alerts-{month}.jsonl.gz"
+
+    @staticmethod
+    def _record(alert: Alert, host_name: Optional[str]) -> dict:
+        return {
+            "id": alert.id,
+            "host_id": alert.host_id,
+            "host_name": host_name,
+            "severity": alert.severity,
+            "message": alert.message,
+            "timestamp": alert.timestamp.isoformat(),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "retention_days": {**self.retention, "*": self.default_retention},
+            "last_run": self.last_run,
+            "archived_total": self.archived_total,
+        }
+
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # Alert timestamps are naive UTC
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+alert_archive = AlertArchive()
+
+
+async def archive_loop():
+    """Background retention job (runs in the bus hub, next to the ping loop)"""
+    logger.info("Alert archive loop starting...")
+    while True:
+        try:
+            await alert_archive.run_once()
+        except Exception as e:
+            logger.error(f"Alert archive error: {type(e).__name__}: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
@@ -0,0 +1,212 @@
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from app.db.models import (
+    AvailabilityCounters, GroupAvailability, Host, HostAvailability, HostTransition
+)
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("up_seconds", "down_seconds", "outages", "repairs", "repair_seconds")
+STATE_COUNTER = {"UP": "up_seconds", "DOWN": "down_seconds"}  # "unknown" time is not monitored time
+
+# Uptime is kept as daily rollups instead of being derived from alerts.
+# A transition closes the previous state's interval and adds it (split at
+# midnight UTC) to the host's and its group's day rows; the interval still
+# open is added at read time from Host.status_since. Every row also carries
+# running totals, so a range over all hosts costs two row lookups per host.
+
+
+# ===== WRITE (ping loop, through the DB writer) =====
+
+def record_transition(session: Session, host: Host, status: str, at: datetime):
+    """Log a status change, add the interval it closes to the rollups and apply it to the host"""
+    changes: Dict[date, Dict[str, float]] = {}
+
+    def add(day: date, **amounts):
+        for counter, amount in amounts.items():
+            day_changes = changes.setdefault(day, {})
+            day_changes[counter] = day_changes.get(counter, 0) + amount
+
+    if status == "DOWN":
+        add(at.date(), outages=1)
+    counter = STATE_COUNTER.get(host.status)
+    if counter and host.status_since is not None and host.status_since < at:
+        for day, seconds in split_by_day(host.status_since, at):
+            add(day, **{counter: seconds})
+        if host.status == "DOWN" and status == "UP":
+            add(at.date(), repairs=1, repair_seconds=(at - host.status_since).total_seconds())
+
+    if changes:
+        _apply(session, HostAvailability, "host_id", host.id, changes)
+        if host.group_id is not None:
+            _apply(session, GroupAvailability, "group_id", host.group_id, changes)
+    session.add(HostTransition(host_id=host.id, group_id=host.group_id, status=status, timestamp=at))
+    host.status = status
+    host.status_since = at
+    session.add(host)
+
+
+def _apply(
+    session: Session,
+    model: Type[AvailabilityCounters],
+    key: str,
+    key_value: int,
+    changes: Dict[date, Dict[str, float]]
+):
+    # Add to the changed days and to the running totals of every row from the first of them on
+    first = min(changes)
+    key_column = getattr(model, key)
+    rows = {
+        row.day: row
+        for row in session.exec(select(model).where(key_column == key_value, model.day >= first)).all()
+    }
+    previous = session.exec(
+        select(model).where(key_column == key_value, model.day < first).order_by(model.day.desc()).limit(1)
+    ).first()
+    base = {counter: getattr(previous, f"total_{counter}") if previous else 0 for counter in COUNTERS}
+    added = dict.fromkeys(COUNTERS, 0)
+    for day in sorted(set(rows) | set(changes)):
+        row = rows.get(day)
+        if row is None:
+            row = model(**{key: key_value}, day=day)
+        else:
+            base = {counter: getattr(row, f"total_{counter}") for counter in COUNTERS}
+        for counter, amount in changes.get(day, {}).items():
+            setattr(row, counter, getattr(row, counter) + amount)
+            added[counter] += amount
+        for counter in COUNTERS:
+            setattr(row, f"total_{counter}", base[counter] + added[counter])
+        session.add(row)
+
+
+# ===== READ =====
+
+def host_availability(session: Session, host_id: int, start: date, end: date, now: Optional[datetime] = None) -> dict:
+    """Uptime, outages and MTTR of one host for the days start..end (inclusive), per day and in total"""
+    rows = session.exec(
+        select(HostAvailability)
+        .where(HostAvailability.host_id == host_id, HostAvailability.day >= start, HostAvailability.day <= end)
+    ).all()
+    host = session.get(Host, host_id)
+    return summarize(rows, _open_spans([host] if host else []), start, end, now)
+
+
+def group_availability(session: Session, group_id: int, start: date, end: date, now: Optional[datetime] = None) -> dict:
+    """Same for a host group - every host counts for the group it was in at the time"""
+    rows = session.exec(
+        select(GroupAvailability)
+        .where(GroupAvailability.group_id == group_id, GroupAvailability.day >= start, GroupAvailability.day <= end)
+    ).all()
+    hosts = session.exec(select(Host).where(Host.group_id == group_id, Host.deleted_at.is_(None))).all()
+    return summarize(rows, _open_spans(hosts), start, end, now)
+
+
+def hosts_availability(session: Session, start: date, end: date, now: Optional[datetime] = None) -> Dict[int, dict]:
+    """Totals of every host from the running totals - no per-day rows are read"""
+    def last_day(*conditions):
+        return (
+            select(func.max(HostAvailability.day))
+            .where(HostAvailability.host_id == Host.id, *conditions)
+            .correlate(Host)
+            .scalar_subquery()
+        )
+
+    at_end, before_start = aliased(HostAvailability), aliased(HostAvailability)
+    statement = (
+        select(
+            Host.id, Host.status, Host.status_since,
+            *[getattr(at_end, f"total_{counter}") for counter in COUNTERS],
+            *[getattr(before_start, f"total_{counter}") for counter in COUNTERS]
+        )
+        .select_from(Host)
+        .outerjoin(at_end, and_(at_end.host_id == Host.id, at_end.day == last_day(HostAvailability.day <= end)))
+        .outerjoin(before_start, and_(
+            before_start.host_id == Host.id, before_start.day == last_day(HostAvailability.day < start)
+        ))
+        .where(Host.deleted_at.is_(None))
+    )
+    range_start, range_end = _bounds(start, end, now)
+    count = len(COUNTERS)
+    result = {}
+    for host_id, status, since, *totals in session.exec(statement).all():
+        counters = {
+            counter: (at_end_total or 0) - (before_start_total or 0)
+            for counter, at_end_total, before_start_total in zip(COUNTERS, totals[:count], totals[count:])
+        }
+        if status in STATE_COUNTER and since is not None:
+            counters[STATE_COUNTER[status]] += max((range_end - max(since, range_start)).total_seconds(), 0)
+        result[host_id] = {"start": start, "end": end, **_metrics(counters)}
+    return result
+
+
+def summarize(
+    rows: Iterable[AvailabilityCounters],
+    open_spans: List[Tuple[str, datetime]],
+    start: date,
+    end: date,
+    now: Optional[datetime] = None
+) -> dict:
+    """Add the still-open intervals to the day rows and compute uptime % and MTTR, per day and in total"""
+    totals = dict.fromkeys(COUNTERS, 0)
+    days: Dict[date, dict] = {}
+    for row in rows:
+        for counter in COUNTERS:
+            amount = getattr(row, counter)
+            totals[counter] += amount
+            days.setdefault(row.day, dict.fromkeys(COUNTERS, 0))[counter] += amount
+
+    range_start, range_end = _bounds(start, end, now)
+    for status, since in open_spans:
+        counter = STATE_COUNTER[status]
+        for day, seconds in split_by_day(max(since, range_start), range_end):
+            totals[counter] += seconds
+            days.setdefault(day, dict.fromkeys(COUNTERS, 0))[counter] += seconds
+
+    return {
+        "start": start,
+        "end": end,
+        **_metrics(totals),
+        "days": [{"day": day, **_metrics(days[day])} for day in sorted(days)],
+    }
+
+
+def _metrics(counters: dict) -> dict:
+    monitored = counters["up_seconds"] + counters["down_seconds"]
+    return {
+        "up_seconds": round(counters["up_seconds"], 1),
+        "down_seconds": round(counters["down_seconds"], 1),
+        "uptime_percent": round(100 * counters["up_seconds"] / monitored, 3) if monitored else None,
+        "outages": counters["outages"],
+        "repairs": counters["repairs"],
+        "mttr_seconds": round(counters["repair_seconds"] / counters["repairs"], 1) if counters["repairs"] else None,
+    }
+
+
+# ===== HELPERS =====
+
+def split_by_day(start: datetime, end: datetime) -> Iterable[Tuple[date, float]]:
+    """Seconds of [start, end) falling on each UTC day"""
+    while start < end:
+        stop = min(end, datetime.combine(start.date() + timedelta(days=1), time.min))
+        yield start.date(), (stop - start).total_seconds()
+        start = stop
+
+
+def _bounds(start: date, end: date, now: Optional[datetime]) -> Tuple[datetime, datetime]:
+    # Whole UTC days, but never past now
+    now = now or datetime.utcnow()
+    return datetime.combine(start, time.min), min(datetime.combine(end + timedelta(days=1), time.min), now)
+
+
+def _open_spans(hosts: Iterable[Host]) -> List[Tuple[str, datetime]]:
+    return [
+        (host.status, host.status_since)
+        for host in hosts
+        if host.status in STATE_COUNTER and host.status_since is not None
+    ]
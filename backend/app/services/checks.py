@@ -0,0 +1,405 @@
+import asyncio
+import logging
+import platform
+import shlex
+import socket
+import ssl
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from icmplib import async_ping
+from icmplib.exceptions import ICMPLibError, SocketPermissionError
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CHECK_TIMEOUT = 2.0      # seconds per check unless its config says otherwise
+CHECK_MAX_TIMEOUT = 60.0
+CHECK_GRACE = 1.0        # checks enforce their timeout themselves; the runner stops them this much later
+DEFAULT_PORTS = (80, 443)
+HTTP_MAX_BODY = 1 << 20  # larger (or unsized) bodies are not read - the connection is closed instead
+HTTP_USER_AGENT = "monitoring-check"
+IS_WINDOWS = platform.system() == "Windows"
+
+# Checks of one type running at the same time - a slow type cannot starve the others
+CHECK_CONCURRENCY = {
+    "reachable": 512,
+    "icmp": 256,
+    "tcp": 512,
+    "http": 128,     # also the most idle keep-alive connections kept per origin
+    "dns": 32,       # getaddrinfo runs in the default thread pool
+    "command": 8,    # one process each
+}
+
+CHECK_SECONDS = metrics.histogram("check_duration_seconds", "One service check (pool wait excluded)", ("type", "result"))
+CHECKS_IN_FLIGHT = metrics.gauge("checks_in_flight", "Service checks running or waiting for a pool slot", ("type",))
+
+
+class CheckResult(NamedTuple):
+    type: str
+    ok: bool
+    result: str  # "up" | "down" | "timeout" | "error"
+    seconds: float
+    detail: str = ""
+
+
+class CheckTarget(NamedTuple):
+    name: str     # the host's address as configured - a DNS name or an IP, put in for {ip} in URLs and commands
+    address: str  # what it resolved to - sockets connect here
+
+
+CheckFunction = Callable[["CheckRunner", CheckTarget, dict, float], Awaitable[Tuple[bool, str]]]
+CHECK_TYPES: Dict[str, CheckFunction] = {}
+
+
+def check_type(name: str):
+    """Register an async check: fn(runner, target, config, timeout) -> (ok, detail)"""
+    def register(fn: CheckFunction) -> CheckFunction:
+        CHECK_TYPES[name] = fn
+        return fn
+    return register
+
+
+# ===== PROBES =====
+
+async def _tcp_alive(ip: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except ConnectionRefusedError:
+        return True  # the host answered with a reset - it exists
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+async def _tcp_open(ip: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+async def _icmp_alive(ip: str, timeout: float) -> bool:
+    try:
+        result = await async_ping(ip, count=1, timeout=timeout, privileged=False)
+    except SocketPermissionError:
+        raise  # the caller switches to TCP only
+    except ICMPLibError:
+        return False
+    return result.is_alive
+
+
+async def probe(ip: str, ports: Sequence[int], timeout: float, icmp: bool = True) -> bool:
+    """ICMP echo and TCP connects at once; True as soon as any of them gets an answer"""
+    checks = [asyncio.ensure_future(_tcp_alive(ip, port, timeout)) for port in ports]
+    if icmp:
+        checks.append(asyncio.ensure_future(_icmp_alive(ip, timeout)))
+    try:
+        for check in asyncio.as_completed(checks):
+            if await check:
+                return True
+        return False
+    finally:
+        for check in checks:
+            check.cancel()
+
+
+# ===== CHECK TYPES =====
+
+@check_type("reachable")
+async def check_reachable(runner: "CheckRunner", target: CheckTarget, config: dict, timeout: float) -> Tuple[bool, str]:
+    """Default for hosts without checks: ICMP echo or any TCP answer, a reset included"""
+    ports = config.get("ports") or DEFAULT_PORTS
+    try:
+        alive = await probe(target.address, ports, timeout, icmp=runner.icmp)
+    except SocketPermissionError:
+        if runner.icmp:
+            logger.warning("Checks: unprivileged ICMP not permitted, reachability uses TCP only")
+        runner.icmp = False
+        alive = await probe(target.address, ports, timeout, icmp=False)
+    return alive, "" if alive else "no answer"
+
+
+@check_type("icmp")
+async def check_icmp(runner: "CheckRunner", target: CheckTarget, config: dict, timeout: float) -> Tuple[bool, str]:
+    try:
+        result = await async_ping(target.address, count=1, timeout=timeout, privileged=False)
+    except SocketPermissionError:
+        return False, "ICMP not permitted for this process"
+    if not result.is_alive:
+        return False, "no echo reply"
+    return True, f"rtt {result.avg_rtt:.1f} ms"
+
+
+@check_type("tcp")
+async def check_tcp(runner: "CheckRunner", target: CheckTarget, config: dict, timeout: float) -> Tuple[bool, str]:
+    """Connects to every listed port; passes when all accept (config "require": "any" - when one does)"""
+    ports = config["ports"]
+    accepted = await asyncio.gather(*(_tcp_open(target.address, port, timeout) for port in ports))
+    closed = [port for port, ok in zip(ports, accepted) if not ok]
+    ok = any(accepted) if config.get("require") == "any" else not closed
+    return ok, f"closed: {', '.join(map(str, closed))}" if closed else ""
+
+
+async def _http_request(runner: "CheckRunner", method: str, url: str, verify: bool, target: CheckTarget) -> int:
+    """
+    One HTTP/1.1 request on a pooled keep-alive connection -> status code.
+    The body is read and thrown away so the connection can be reused; a
+    pooled connection the server already closed is retried once on a new one.
+    A URL on the host's own name connects to its resolved address; the Host
+    header and the TLS server name (SNI, certificate check) stay the name.
+    """
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    connect_to = target.address if parts.hostname == target.name.lower() else parts.hostname
+    origin = (parts.scheme, parts.hostname, connect_to, port, verify)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    request = (
+        f"{method} {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        f"User-Agent: {HTTP_USER_AGENT}\r\nAccept: */*\r\n\r\n"
+    ).encode()
+
+    idle = runner._idle.setdefault(origin, deque())
+    while True:
+        reused = bool(idle)
+        if reused:
+            reader, writer = idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(
+                connect_to, port,
+                ssl=runner.tls_context(verify) if https else None,
+                server_hostname=parts.hostname if https else None
+            )
+        try:
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            writer.close()
+            if reused and not getattr(e, "partial", b""):
+                continue  # idle connection closed by the server
+            raise
+        except BaseException:
+            writer.close()
+            raise
+        break
+
+    try:
+        status, keep_alive = await _http_response(reader, head, method)
+    except BaseException:
+        writer.close()
+        raise
+    if keep_alive and len(idle) < runner.concurrency.get("http", 64):
+        idle.append((reader, writer))
+    else:
+        writer.close()
+    return status
+
+
+async def _http_response(reader: asyncio.StreamReader, head: bytes, method: str) -> Tuple[int, bool]:
+    """Status line and headers parsed, body skipped -> (status, connection reusable)"""
+    lines = head.decode("latin-1").split("\r\n")
+    version, status = lines[0].split(" ", 2)[:2]
+    status = int(status)
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        return status, keep_alive
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        total = 0
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            total += size
+            if total > HTTP_MAX_BODY:
+                return status, False
+            await reader.readexactly(size + 2)  # chunk and its CRLF
+            if size == 0:
+                return status, keep_alive  # (trailers are not supported)
+    length = headers.get("content-length")
+    if length is None or int(length) > HTTP_MAX_BODY:
+        return status, False  # body runs until close, or too large to bother
+    await reader.readexactly(int(length))
+    return status, keep_alive
+
+
+@check_type("http")
+async def check_http(runner: "CheckRunner", target: CheckTarget, config: dict, timeout: float) -> Tuple[bool, str]:
+    name = target.name
+    url = (config.get("url") or "http://{ip}/").replace("{ip}", f"[{name}]" if ":" in name else name)
+    started = time.perf_counter()
+    try:
+        status = await asyncio.wait_for(
+            _http_request(runner, config.get("method", "GET"), url, config.get("verify_tls", True), target), timeout
+        )
+    except asyncio.TimeoutError:
+        return False, f"no response within {timeout}s"
+    except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+        return False, f"{type(e).__name__}: {e}"
+    latency_ms = (time.perf_counter() - started) * 1000
+    expected = config.get("expect_status")
+    detail = f"HTTP {status} in {latency_ms:.0f} ms"
+    if not (status in expected if expected else status < 400):
+        return False, detail
+    if config.get("max_latency_ms") and latency_ms > config["max_latency_ms"]:
+        return False, f"{detail} (limit {config['max_latency_ms']} ms)"
+    return True, detail
+
+
+@check_type("dns")
+async def check_dns(runner: "CheckRunner", target: CheckTarget, config: dict, timeout: float) -> Tuple[bool, str]:
+    """The name resolves (to the expected address, if configured)"""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(config["name"], None, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        return False, f"{config['name']}: {e.strerror}"
+    addresses = sorted({info[4][0] for info in infos})
+    expected = config.get("expect")
+    ok = expected in addresses if expected else bool(addresses)
+    return ok, f"{config['name']} -> {', '.join(addresses)}"
+
+
+@check_type("command")
+async def check_command(runner: "CheckRunner", target: CheckTarget, config: dict, timeout: float) -> Tuple[bool, str]:
+    """Runs the command ({ip} replaced by the host's address as configured); exit code 0 passes"""
+    args = [arg.replace("{ip}", target.name) for arg in shlex.split(config["command"])]
+    process = await asyncio.create_subprocess_exec(
+        *args, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        code = await asyncio.wait_for(process.wait(), timeout)
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    return code == 0, f"exit code {code}"
+
+
+def validate_check(kind: str, config: dict) -> dict:
+    """Config checked and normalised for the type; raises ValueError"""
+    if kind not in CHECK_TYPES:
+        raise ValueError(f"unknown check type '{kind}' (one of: {', '.join(CHECK_TYPES)})")
+    config = dict(config)
+    timeout = config.get("timeout", CHECK_TIMEOUT)
+    if not isinstance(timeout, (int, float)) or not 0 < timeout <= CHECK_MAX_TIMEOUT:
+        raise ValueError(f"timeout must be between 0 and {CHECK_MAX_TIMEOUT} seconds")
+
+    if kind in ("reachable", "tcp"):
+        ports = config.get("ports")
+        if kind == "tcp" and not ports:
+            raise ValueError("tcp check needs a non-empty list of ports")
+        if ports is not None and (
+            not isinstance(ports, list) or not all(isinstance(p, int) and 0 < p < 65536 for p in ports)
+        ):
+            raise ValueError("ports must be a list of port numbers (1-65535)")
+        if config.get("require", "all") not in ("all", "any"):
+            raise ValueError('require must be "all" or "any"')
+    elif kind == "http":
+        url = config.get("url")
+        if url is not None and not (isinstance(url, str) and url.startswith(("http://", "https://"))):
+            raise ValueError("url must start with http:// or https://")
+        if config.get("method", "GET") not in ("GET", "HEAD"):
+            raise ValueError("method must be GET or HEAD")
+        expected = config.get("expect_status")
+        if isinstance(expected, int):
+            config["expect_status"] = expected = [expected]
+        if expected is not None and not (isinstance(expected, list) and all(isinstance(s, int) for s in expected)):
+            raise ValueError("expect_status must be a status code or a list of them")
+        latency = config.get("max_latency_ms")
+        if latency is not None and (isinstance(latency, bool) or not isinstance(latency, (int, float)) or latency <= 0):
+            raise ValueError("max_latency_ms must be a positive number")
+    elif kind == "dns":
+        if not isinstance(config.get("name"), str) or not config["name"]:
+            raise ValueError("dns check needs the name to resolve")
+    elif kind == "command":
+        if not isinstance(config.get("command"), str) or not shlex.split(config["command"]):
+            raise ValueError("command check needs the command to run")
+    return config
+
+
+# ===== RUNNER =====
+
+class CheckRunner:
+    """
+    Runs service checks on the event loop. Every type has its own pool
+    (semaphore) so slow HTTP or command checks cannot hold up the cheap
+    ICMP/TCP ones, and HTTP checks reuse idle keep-alive connections per origin.
+    """
+
+    def __init__(self, concurrency: Dict[str, int] = CHECK_CONCURRENCY):
+        self.concurrency = dict(concurrency)
+        self.icmp = not IS_WINDOWS  # unprivileged ICMP; switched off when the OS does not permit it
+        self._pools: Dict[str, asyncio.Semaphore] = {}
+        self._idle: Dict[tuple, Deque[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._tls: Dict[bool, ssl.SSLContext] = {}
+
+    async def run(self, kind: str, ip: str, config: dict, address: Optional[str] = None) -> CheckResult:
+        """One check of `ip` (the configured name or IP), connecting to `address` if it was resolved beforehand"""
+        target = CheckTarget(ip, address or ip)
+        timeout = config.get("timeout", CHECK_TIMEOUT)
+        pool = self._pools.get(kind)
+        if pool is None:
+            pool = self._pools[kind] = asyncio.Semaphore(self.concurrency.get(kind, 64))
+        in_flight = CHECKS_IN_FLIGHT.labels(kind)
+        in_flight.inc()
+        try:
+            async with pool:
+                started = time.perf_counter()
+                try:
+                    ok, detail = await asyncio.wait_for(CHECK_TYPES[kind](self, target, config, timeout), timeout + CHECK_GRACE)
+                    result = "up" if ok else "down"
+                except asyncio.TimeoutError:
+                    ok, result, detail = False, "timeout", f"no result within {timeout}s"
+                except Exception as e:
+                    ok, result, detail = False, "error", f"{type(e).__name__}: {e}"
+                seconds = time.perf_counter() - started
+        finally:
+            in_flight.dec()
+        CHECK_SECONDS.labels(kind, result).observe(seconds)
+        return CheckResult(kind, ok, result, seconds, detail)
+
+    async def check_host(
+        self, ip: str, checks: Optional[Sequence[Tuple[str, dict]]] = None, address: Optional[str] = None
+    ) -> Tuple[bool, str, List[CheckResult]]:
+        """
+        All of a host's (type, config) checks at once - the default reachability
+        check when it has none. Alive when every check passes; the result is
+        "up", or "timeout"/"error"/"down" after the first failing check in that order.
+        """
+        results = await asyncio.gather(*(
+            self.run(kind, ip, config, address) for kind, config in checks or [("reachable", {})]
+        ))
+        if all(result.ok for result in results):
+            return True, "up", results
+        failed = {result.result for result in results if not result.ok}
+        return False, next(r for r in ("timeout", "error", "down") if r in failed), results
+
+    def tls_context(self, verify: bool = True) -> ssl.SSLContext:
+        context = self._tls.get(verify)
+        if context is None:
+            context = self._tls[verify] = ssl.create_default_context()
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+        return context
+
+    async def close(self):
+        """Closes the idle HTTP connections"""
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+check_runner = CheckRunner()
@@ -0,0 +1,276 @@
+import json
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import Session, select
+
+from app.db.models import Host, HostGroup, Alert
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ALERTS = 50
+
+
+class DashboardCache:
+    """
+    In-process copy of everything the dashboard shows (hosts, group summaries,
+    latest alerts). Loaded from the DB once, then kept up to date by the routers
+    and the ping loop. The serialized JSON is reused until something changes,
+    so N polling dashboards cost one serialization instead of N table scans.
+    Changes are passed to `on_change` so other workers can apply them (apply_remote).
+    """
+
+    def __init__(self, alerts_limit: int = SNAPSHOT_ALERTS):
+        self.alerts_limit = alerts_limit
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._alerts_dirty = True
+        self._hosts: Dict[int, dict] = {}
+        self._groups: Dict[int, dict] = {}
+        self._alerts: deque = deque(maxlen=alerts_limit)
+        self._payload: Optional[bytes] = None
+        self.on_change: Optional[Callable[[dict], None]] = None
+
+    # ===== READ =====
+
+    def snapshot(self, session: Session) -> bytes:
+        """Return the dashboard snapshot as JSON bytes, loading missing parts from the DB"""
+        with self._lock:
+            if not self._loaded:
+                self._load(session)
+            if self._alerts_dirty:
+                self._load_alerts(session)
+            if self._payload is None:
+                self._payload = self._serialize()
+            return self._payload
+
+    def _load(self, session: Session):
+        self._hosts.clear()
+        self._groups.clear()
+        for group in session.exec(select(HostGroup).where(HostGroup.deleted_at.is_(None))).all():
+            self._groups[group.id] = self._group_entry(group)
+        for host in session.exec(select(Host).where(Host.deleted_at.is_(None))).all():
+            self._hosts[host.id] = self._host_entry(host)
+            self._count(self._hosts[host.id], +1)
+        self._loaded = True
+        self._alerts_dirty = True
+        self._payload = None
+        logger.debug(f"Dashboard cache loaded {len(self._hosts)} hosts, {len(self._groups)} groups")
+
+    def _load_alerts(self, session: Session):
+        statement = (
+            select(Alert)
+            .outerjoin(Host, Host.id == Alert.host_id)
+            .where(Host.deleted_at.is_(None))
+            .order_by(Alert.timestamp.desc(), Alert.id.desc())
+            .limit(self.alerts_limit)
+        )
+        self._alerts.clear()
+        for alert in session.exec(statement).all():
+            self._alerts.append(self._alert_entry(alert))
+        self._alerts_dirty = False
+        self._payload = None
+
+    def _serialize(self) -> bytes:
+        alerts = []
+        for alert in self._alerts:
+            host = self._hosts.get(alert["host_id"])
+            alerts.append({**alert, "host": host})
+        data = {
+            "generated_at": datetime.utcnow(),
+            "hosts": list(self._hosts.values()),
+            "groups": list(self._groups.values()),
+            "alerts": alerts,
+        }
+        return json.dumps(jsonable_encoder(data)).encode()
+
+    # ===== WRITE HOOKS =====
+
+    def upsert_host(self, host: Host):
+        entry = self._host_entry(host)
+        self._upsert_host(entry)
+        self._changed({"op": "host", "host": jsonable_encoder(entry)})
+
+    def upsert_hosts(self, hosts: List[Host]):
+        """Many new hosts (discovery) - sent to the other workers as one change"""
+        entries = [self._host_entry(host) for host in hosts]
+        for entry in entries:
+            self._upsert_host(entry)
+        self._changed({"op": "hosts", "hosts": jsonable_encoder(entries)})
+
+    def set_host_status(self, host_id: int, status: str, last_seen: Optional[datetime] = None):
+        """State transition from the ping loop"""
+        self._set_host_status(host_id, status, last_seen)
+        self._changed({
+            "op": "host_status",
+            "host_id": host_id,
+            "status": status,
+            "last_seen": last_seen.isoformat() if last_seen else None
+        })
+
+    def remove_host(self, host_id: int):
+        self._remove_host(host_id)
+        self._changed({"op": "remove_host", "host_id": host_id})
+
+    def upsert_group(self, group: HostGroup):
+        fields = self._group_fields(group)
+        self._upsert_group(fields)
+        self._changed({"op": "group", "group": jsonable_encoder(fields)})
+
+    def remove_group(self, group_id: int):
+        self._remove_group(group_id)
+        self._changed({"op": "remove_group", "group_id": group_id})
+
+    def invalidate_alerts(self):
+        """Alerts were added/changed/removed - reload the latest N on next read"""
+        self._invalidate_alerts()
+        self._changed({"op": "alerts"})
+
+    def apply_remote(self, change: dict):
+        """Apply a change made by another worker"""
+        op = change.get("op")
+        if op == "host_status":
+            self._set_host_status(change["host_id"], change["status"], _parse_time(change.get("last_seen")))
+        elif op == "host":
+            self._upsert_host({**change["host"], "last_seen": _parse_time(change["host"]["last_seen"])})
+        elif op == "hosts":
+            for entry in change["hosts"]:
+                self._upsert_host({**entry, "last_seen": _parse_time(entry["last_seen"])})
+        elif op == "remove_host":
+            self._remove_host(change["host_id"])
+        elif op == "group":
+            self._upsert_group({**change["group"], "created_at": _parse_time(change["group"]["created_at"])})
+        elif op == "remove_group":
+            self._remove_group(change["group_id"])
+        elif op == "alerts":
+            self._invalidate_alerts()
+        else:
+            self.clear()
+
+    def _changed(self, change: dict):
+        if self.on_change is not None:
+            self.on_change(change)
+
+    def _upsert_host(self, entry: dict):
+        with self._lock:
+            if not self._loaded:
+                return
+            previous = self._hosts.get(entry["id"])
+            if previous:
+                self._count(previous, -1)
+            self._hosts[entry["id"]] = entry
+            self._count(entry, +1)
+            # Alerts embed host name/ip - rebuilt from _hosts on serialize
+            self._payload = None
+
+    def _set_host_status(self, host_id: int, status: str, last_seen: Optional[datetime] = None):
+        with self._lock:
+            entry = self._hosts.get(host_id)
+            if not entry:
+                return
+            self._count(entry, -1)
+            entry["status"] = status
+            if last_seen is not None:
+                entry["last_seen"] = last_seen
+            self._count(entry, +1)
+            self._payload = None
+
+    def _remove_host(self, host_id: int):
+        with self._lock:
+            entry = self._hosts.pop(host_id, None)
+            if not entry:
+                return
+            self._count(entry, -1)
+            # Host deletion removes its alerts too
+            self._alerts_dirty = True
+            self._payload = None
+
+    def _upsert_group(self, fields: dict):
+        with self._lock:
+            if not self._loaded:
+                return
+            entry = self._groups.get(fields["id"])
+            if entry:
+                entry.update(fields)  # keeps the host counters
+            else:
+                self._groups[fields["id"]] = {**fields, **self._empty_counts()}
+            self._payload = None
+
+    def _remove_group(self, group_id: int):
+        with self._lock:
+            if self._groups.pop(group_id, None) is None:
+                return
+            for entry in self._hosts.values():
+                if entry["group_id"] == group_id:
+                    entry["group_id"] = None
+            self._payload = None
+
+    def _invalidate_alerts(self):
+        with self._lock:
+            self._alerts_dirty = True
+            self._payload = None
+
+    def clear(self):
+        with self._lock:
+            self._loaded = False
+            self._payload = None
+
+    # ===== HELPERS =====
+
+    def _count(self, host_entry: dict, delta: int):
+        group = self._groups.get(host_entry["group_id"])
+        if not group:
+            return
+        group["host_count"] += delta
+        status = host_entry["status"]
+        key = {"UP": "up", "DOWN": "down", "UNREACHABLE": "unreachable"}.get(status, "unknown")
+        group[key] += delta
+
+    @staticmethod
+    def _host_entry(host: Host) -> dict:
+        return {
+            "id": host.id,
+            "name": host.name,
+            "ip": host.ip,
+            "status": host.status,
+            "last_seen": host.last_seen,
+            "group_id": host.group_id,
+        }
+
+    @staticmethod
+    def _group_fields(group: HostGroup) -> dict:
+        return {
+            "id": group.id,
+            "name": group.name,
+            "description": group.description,
+            "parent_id": group.parent_id,
+            "created_at": group.created_at,
+        }
+
+    @staticmethod
+    def _empty_counts() -> dict:
+        return {"host_count": 0, "up": 0, "down": 0, "unreachable": 0, "unknown": 0}
+
+    def _group_entry(self, group: HostGroup) -> dict:
+        return {**self._group_fields(group), **self._empty_counts()}
+
+    @staticmethod
+    def _alert_entry(alert: Alert) -> dict:
+        return {
+            "id": alert.id,
+            "host_id": alert.host_id,
+            "severity": alert.severity,
+            "message": alert.message,
+            "timestamp": alert.timestamp,
+        }
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+dashboard_cache = DashboardCache()
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.models import (
+    Alert, GroupAvailability, Host, HostAvailability, HostCheck, HostGroup, HostTransition, MaintenanceWindow
+)
+from app.db.session import async_engine
+from app.db.writer import db_writer
+from app.services.jobs import job_runner, JobContext
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH = 1000          # rows removed per writer job
+DELETE_PAUSE = 0.02          # seconds between batches - other writers get the lock in between
+
+# Hosts and groups are hidden (deleted_at) by the request; these jobs remove the rows.
+
+
+@job_runner.handler("delete_host")
+async def purge_host(ctx: JobContext) -> dict:
+    """Delete a hidden host's alerts and state history in batches, then the host itself"""
+    host_id = ctx.job.target_id
+    async with AsyncSession(async_engine) as session:
+        total = (await session.exec(select(func.count(Alert.id)).where(Alert.host_id == host_id))).one()
+    await ctx.progress(0, total)
+
+    def delete_batch(session: Session) -> int:
+        ids = session.exec(select(Alert.id).where(Alert.host_id == host_id).limit(DELETE_BATCH)).all()
+        if ids:
+            session.exec(delete(Alert).where(Alert.id.in_(ids)))
+        return len(ids)
+
+    deleted = await _in_batches(ctx, delete_batch)
+
+    def delete_history_batch(session: Session) -> int:
+        ids = session.exec(select(HostTransition.id).where(HostTransition.host_id == host_id).limit(DELETE_BATCH)).all()
+        if ids:
+            session.exec(delete(HostTransition).where(HostTransition.id.in_(ids)))
+        return len(ids)
+
+    await _in_batches(ctx, delete_history_batch, report=False)
+
+    def delete_host(session: Session):
+        session.exec(delete(HostAvailability).where(HostAvailability.host_id == host_id))  # one row per day
+        session.exec(delete(MaintenanceWindow).where(MaintenanceWindow.host_id == host_id))
+        session.exec(delete(HostCheck).where(HostCheck.host_id == host_id))
+        host = session.get(Host, host_id)
+        if host is not None:
+            session.delete(host)  # no alerts left, leaves the sync tombstone
+    await db_writer.run(delete_host)
+    return {"alerts_deleted": deleted}
+
+
+@job_runner.handler("delete_hostgroup")
+async def purge_hostgroup(ctx: JobContext) -> dict:
+    """Unassign a hidden group's hosts in batches, then delete the group"""
+    group_id = ctx.job.target_id
+    async with AsyncSession(async_engine) as session:
+        total = (await session.exec(select(func.count(Host.id)).where(Host.group_id == group_id))).one()
+    await ctx.progress(0, total)
+
+    def unassign_batch(session: Session) -> int:
+        hosts = session.exec(select(Host).where(Host.group_id == group_id).limit(DELETE_BATCH)).all()
+        for host in hosts:
+            host.group_id = None  # through the ORM - bumps the host's sync version
+            session.add(host)
+        return len(hosts)
+
+    unassigned = await _in_batches(ctx, unassign_batch)
+
+    def delete_group(session: Session):
+        session.exec(delete(GroupAvailability).where(GroupAvailability.group_id == group_id))
+        session.exec(delete(MaintenanceWindow).where(MaintenanceWindow.group_id == group_id))
+        group = session.get(HostGroup, group_id)
+        if group is not None:
+            session.delete(group)
+    await db_writer.run(delete_group)
+    return {"hosts_unassigned": unassigned}
+
+
+async def _in_batches(ctx: JobContext, batch, report: bool = True) -> int:
+    done = 0
+    while True:
+        count = await db_writer.run(batch)
+        done += count
+        if report:
+            await ctx.progress(done)
+        if count < DELETE_BATCH:
+            return done
+        await asyncio.sleep(DELETE_PAUSE)
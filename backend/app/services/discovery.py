@@ -0,0 +1,191 @@
+import asyncio
+import ipaddress
+import logging
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, Set
+
+from icmplib.exceptions import SocketPermissionError
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+try:
+    import resource
+except ImportError:  # Windows - no RLIMIT_NOFILE
+    resource = None
+
+from app.db.models import Host, HostGroup
+from app.db.session import async_engine
+from app.db.writer import db_writer
+from app.services.availability import record_transition
+from app.services.checks import probe
+from app.services.dashboard_cache import dashboard_cache
+from app.services.jobs import job_runner, JobContext
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_PORTS = (22, 80, 443)      # TCP fallback when ICMP is not permitted or filtered
+DISCOVERY_CONCURRENCY = 256          # addresses probed at the same time (capped by the open-file limit)
+DISCOVERY_RATE = 500                 # new addresses per second - keeps the sweep polite to the network
+DISCOVERY_TIMEOUT = 1.0              # seconds per address
+DISCOVERY_MAX_ADDRESSES = 4 * 65536  # per job
+DISCOVERY_INSERT_BATCH = 500         # responsive addresses per writer job
+DISCOVERY_PROGRESS_EVERY = 1024      # addresses between progress updates
+
+DISCOVERY_PROBES = metrics.counter("discovery_probes_total", "Addresses probed by discovery jobs", ("result",))
+
+
+# ===== ADDRESSES =====
+
+def parse_networks(cidrs: Iterable[str]) -> List[ipaddress._BaseNetwork]:
+    """CIDR strings -> networks with overlaps merged; raises ValueError on a bad range"""
+    networks = [ipaddress.ip_network(cidr.strip(), strict=False) for cidr in cidrs]
+    merged = []
+    for version in (4, 6):
+        merged.extend(ipaddress.collapse_addresses(n for n in networks if n.version == version))
+    return merged
+
+
+def address_count(networks: Sequence[ipaddress._BaseNetwork]) -> int:
+    """Number of addresses hosts() yields (no network/broadcast address in IPv4 ranges larger than /31)"""
+    return sum(
+        n.num_addresses - 2 if n.version == 4 and n.prefixlen < 31 else n.num_addresses
+        for n in networks
+    )
+
+
+def candidates(networks: Sequence[ipaddress._BaseNetwork]) -> Iterator[str]:
+    for network in networks:
+        for address in network.hosts():
+            yield str(address)
+
+
+# ===== PROBES =====
+
+class RateLimiter:
+    """Spaces acquisitions 1/rate seconds apart (one event loop, no lock needed)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        wait = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _worker_count(ports: Sequence[int]) -> int:
+    # Every address holds one socket per port plus one for ICMP - stay within half the open-file limit
+    if resource is None:
+        return DISCOVERY_CONCURRENCY
+    soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    if soft_limit == resource.RLIM_INFINITY:
+        return DISCOVERY_CONCURRENCY
+    return max(1, min(DISCOVERY_CONCURRENCY, soft_limit // 2 // (len(ports) + 1)))
+
+
+# ===== JOB =====
+
+@job_runner.handler("discover_hosts")
+async def discover_hosts(ctx: JobContext) -> dict:
+    """Sweep CIDR ranges and add every responsive, not yet known address as a host"""
+    networks = parse_networks(ctx.params["cidrs"])
+    ports = tuple(ctx.params.get("ports") or DISCOVERY_PORTS)
+    timeout = ctx.params.get("timeout") or DISCOVERY_TIMEOUT
+    group_id = ctx.params.get("group_id")
+    limiter = RateLimiter(ctx.params.get("rate") or DISCOVERY_RATE)
+    started = time.perf_counter()
+
+    known = await _known_ips()
+    total = address_count(networks)
+    await ctx.progress(0, total)
+
+    addresses = candidates(networks)  # shared by the workers - next() never yields to the loop
+    found: List[str] = []
+    stats = {"skipped_known": 0, "probed": 0, "responsive": 0, "added": 0}
+    icmp = True
+    done = 0
+
+    async def flush():
+        batch = found[:]
+        found.clear()
+        if batch:
+            stats["added"] += await _add_hosts(batch, group_id)
+
+    async def worker():
+        nonlocal done, icmp
+        for ip in addresses:
+            if ip in known:
+                stats["skipped_known"] += 1
+            else:
+                await limiter.acquire()
+                try:
+                    alive = await probe(ip, ports, timeout, icmp)
+                except SocketPermissionError:
+                    # Unprivileged ICMP not allowed (net.ipv4.ping_group_range) - TCP only from now on
+                    if icmp:
+                        logger.warning("Discovery: ICMP not permitted, probing TCP ports only")
+                    icmp = False
+                    alive = await probe(ip, ports, timeout, icmp)
+                stats["probed"] += 1
+                DISCOVERY_PROBES.labels("responsive" if alive else "silent").inc()
+                if alive:
+                    stats["responsive"] += 1
+                    found.append(ip)
+                    if len(found) >= DISCOVERY_INSERT_BATCH:
+                        await flush()
+            done += 1
+            if done % DISCOVERY_PROGRESS_EVERY == 0:
+                await ctx.progress(done, total)
+
+    await asyncio.gather(*(worker() for _ in range(_worker_count(ports))))
+    await flush()
+    await ctx.progress(done, total)
+    logger.info(
+        f"Discovery job {ctx.job.id}: {stats['probed']} addresses probed, "
+        f"{stats['responsive']} responsive, {stats['added']} hosts added"
+    )
+    return {
+        "networks": [str(n) for n in networks],
+        "addresses": total,
+        **stats,
+        "icmp": icmp,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+async def _known_ips() -> Set[str]:
+    async with AsyncSession(async_engine) as session:
+        return set((await session.exec(select(Host.ip).where(Host.deleted_at.is_(None)))).all())
+
+
+async def _add_hosts(ips: List[str], group_id: Optional[int]) -> int:
+    now = datetime.utcnow()
+    hosts = await db_writer.run(lambda session: insert_hosts(session, ips, group_id, now))
+    if hosts:
+        dashboard_cache.upsert_hosts(hosts)
+    return len(hosts)
+
+
+def insert_hosts(session: Session, ips: List[str], group_id: Optional[int], now: datetime) -> List[Host]:
+    """Add the addresses not known yet as UP hosts (into the group unless it is gone); returns the new hosts"""
+    existing = set(session.exec(select(Host.ip).where(Host.ip.in_(ips), Host.deleted_at.is_(None))).all())
+    group = session.get(HostGroup, group_id) if group_id is not None else None
+    hosts = [
+        Host(
+            name=ip,
+            ip=ip,
+            last_seen=now,
+            group_id=group.id if group is not None and group.deleted_at is None else None
+        )
+        for ip in dict.fromkeys(ips) if ip not in existing
+    ]
+    session.add_all(hosts)
+    session.flush()  # ids for the transitions
+    for host in hosts:
+        record_transition(session, host, "UP", now)  # it just answered - no "Host is UP" alert per host
+    return hosts
@@ -0,0 +1,161 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FLIGHT_DIR = Path(__file__).resolve().parents[2] / "data" / "flight"
+FLIGHT_CYCLES = int(os.getenv("FLIGHT_RECORDER_CYCLES", 20))                 # ping cycles kept in memory
+FLIGHT_PROBES = int(os.getenv("FLIGHT_RECORDER_PROBES", 50))                  # slowest and slowest failed probes kept per cycle
+# Memory bound: CYCLES x (2 x PROBES small tuples + per-result counters), whatever the number of hosts
+# (20 x 100 tuples by default, instead of a dict per probed host per cycle)
+FLIGHT_THRESHOLD = float(os.getenv("FLIGHT_RECORDER_THRESHOLD_SECONDS", 30))  # slower cycles are dumped
+FLIGHT_DUMP_INTERVAL = 60    # seconds between dumps while every cycle is slow
+FLIGHT_MAX_DUMPS = 50        # oldest dump files are removed beyond this
+FLIGHT_DUMP_PREFIX = "cycle-"
+
+
+ProbeTuple = Tuple[float, int, str, str]  # (seconds, host_id, ip, result)
+
+
+class CycleRecord:
+    """
+    Timings of one ping cycle: phases (wall time, summed if entered repeatedly),
+    probe count and time per result, and the slowest and slowest failed probes
+    """
+
+    def __init__(self, probes_kept: int = FLIGHT_PROBES):
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.probes_kept = probes_kept
+        self.results: Dict[str, List[float]] = {}  # result -> [probes, seconds]
+        self.slowest: List[ProbeTuple] = []         # min-heaps of the N slowest
+        self.failed: List[ProbeTuple] = []
+        self.hosts = 0
+        self.transitions = 0
+        self.skipped = 0  # hosts not probed - maintenance, upstream DOWN or failing
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def probe(self, host_id: int, ip: str, seconds: float, result: str):
+        """Record one host probe - probes overlap, so the "probe" phase is timed around them instead"""
+        totals = self.results.setdefault(result, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        probe = (seconds, host_id, ip, result)
+        self._keep(self.slowest, probe)
+        if result != "up":
+            self._keep(self.failed, probe)
+
+    def _keep(self, heap: List[ProbeTuple], probe: ProbeTuple):
+        if len(heap) < self.probes_kept:
+            heapq.heappush(heap, probe)
+        elif probe[0] > heap[0][0]:
+            heapq.heapreplace(heap, probe)
+
+    @staticmethod
+    def _probe_dicts(heap: List[ProbeTuple]) -> List[dict]:
+        return [
+            {"host_id": host_id, "ip": ip, "seconds": round(seconds, 6), "result": result}
+            for seconds, host_id, ip, result in sorted(heap, reverse=True)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "hosts": self.hosts,
+            "transitions": self.transitions,
+            "skipped": self.skipped,
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "results": {result: {"probes": count, "seconds": round(seconds, 6)} for result, (count, seconds) in self.results.items()},
+            "probes": self._probe_dicts(self.slowest),
+            "failed_probes": self._probe_dicts(self.failed),
+        }
+
+
+class FlightRecorder:
+    """
+    Keeps the timings of the last K ping cycles. A cycle slower than the
+    threshold is written to data/flight/cycle-<time>.json together with the
+    cycles before it, so the slow one can be compared with normal ones.
+    """
+
+    def __init__(
+        self,
+        cycles: int = FLIGHT_CYCLES,
+        probes_kept: int = FLIGHT_PROBES,
+        threshold: float = FLIGHT_THRESHOLD,
+        directory: Path = FLIGHT_DIR,
+        dump_interval: float = FLIGHT_DUMP_INTERVAL,
+        max_dumps: int = FLIGHT_MAX_DUMPS
+    ):
+        self.probes_kept = probes_kept
+        self.threshold = threshold
+        self.directory = directory
+        self.dump_interval = dump_interval
+        self.max_dumps = max_dumps
+        self.cycles: deque = deque(maxlen=cycles)
+        self._last_dump = 0.0
+
+    def start_cycle(self) -> CycleRecord:
+        return CycleRecord(self.probes_kept)
+
+    async def finish(self, cycle: CycleRecord) -> Optional[Path]:
+        """Store the cycle; returns the dump file if it was slow enough to be dumped"""
+        cycle.duration = time.perf_counter() - cycle._started
+        previous = list(self.cycles)
+        self.cycles.append(cycle)
+        if cycle.duration < self.threshold:
+            return None
+        if time.monotonic() - self._last_dump < self.dump_interval:
+            return None
+        self._last_dump = time.monotonic()
+        try:
+            # Serializing the kept cycles and writing them is file I/O - keep it off the loop
+            return await asyncio.to_thread(self.dump, cycle, previous)
+        except OSError as e:
+            logger.error(f"Flight recorder: dump failed: {e}")
+            return None
+
+    def dump(self, cycle: CycleRecord, previous: List[CycleRecord]) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{FLIGHT_DUMP_PREFIX}{cycle.started_at.strftime('%Y%m%dT%H%M%S%f')}.json"
+        data = {
+            "threshold": self.threshold,
+            "slow_cycle": cycle.to_dict(),
+            "previous_cycles": [record.to_dict() for record in previous],
+        }
+        path.write_text(json.dumps(data))
+        logger.warning(
+            f"Flight recorder: ping cycle took {cycle.duration:.1f}s (threshold {self.threshold}s), "
+            f"phases {', '.join(f'{name}={seconds:.2f}s' for name, seconds in cycle.phases.items())} - dumped to {path.name}"
+        )
+        for old in self.dumps()[self.max_dumps:]:
+            old.unlink(missing_ok=True)
+        return path
+
+    def dumps(self) -> List[Path]:
+        """Dump files, newest first"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob(f"{FLIGHT_DUMP_PREFIX}*.json"), reverse=True)
+
+
+flight_recorder = FlightRecorder()
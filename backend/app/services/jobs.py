@@ -0,0 +1,198 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.models import Job, JobStatus
+from app.db.session import async_engine
+from app.db.writer import db_writer
+from app.ws.bus import bus
+
+logger = logging.getLogger(__name__)
+
+JOB_CONCURRENCY = 2        # jobs running at the same time
+JOB_POLL_INTERVAL = 5      # seconds between checks for new jobs when nobody wakes the runner
+
+
+class JobContext:
+    """What a job handler gets: its Job row, decoded params and a progress reporter"""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.params: dict = json.loads(job.params) if job.params else {}
+
+    async def progress(self, done: int, total: Optional[int] = None):
+        """Store progress on the Job row (readable through GET /jobs/{id})"""
+        job_id = self.job.id
+
+        def update(session: Session):
+            job = session.get(Job, job_id)
+            if job is None:
+                return
+            job.progress = done
+            if total is not None:
+                job.total = total
+            session.add(job)
+        await db_writer.run(update)
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[dict]]]
+
+
+class JobRunner:
+    """
+    Runs background jobs stored in the Job table - one worker for deletes,
+    bulk operations and anything else too slow for a request.
+    Requests create a PENDING row in their own transaction and call wake();
+    the runner (only in the bus hub) claims it, runs its handler and stores
+    progress/result. Jobs interrupted by a restart are run again, so handlers
+    must be safe to repeat (e.g. "delete the next batch until none is left").
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self._handlers: Dict[str, JobHandler] = {}
+        self._running: Dict[int, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def handler(self, kind: str):
+        """Decorator registering the handler for a job kind"""
+        def register(fn: JobHandler) -> JobHandler:
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    # ===== PRODUCERS =====
+
+    @staticmethod
+    def create(
+        session: Session,
+        kind: str,
+        target_id: Optional[int] = None,
+        params: Optional[dict] = None,
+        created_by: Optional[str] = None
+    ) -> Job:
+        """Add a PENDING job to the caller's transaction; call wake() after commit"""
+        job = Job(
+            kind=kind,
+            target_id=target_id,
+            params=json.dumps(params) if params else None,
+            created_by=created_by
+        )
+        session.add(job)
+        return job
+
+    def wake(self):
+        """Thread-safe: look for new jobs now, in whichever worker runs them"""
+        if self._loop is not None:
+            self.wake_local()
+        else:
+            bus.notify("jobs", {})
+
+    def wake_local(self):
+        """Wake the runner if it lives in this worker (bus handler - never re-broadcasts)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # ===== RUNNER =====
+
+    async def run_loop(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await db_writer.run(self._requeue_interrupted)
+        logger.info("Job runner starting...")
+        while True:
+            try:
+                if len(self._running) < self.concurrency:
+                    job = await self._claim_next()
+                    if job is not None:
+                        self._running[job.id] = asyncio.create_task(self._run(job))
+                        continue
+            except Exception as e:
+                logger.error(f"Job runner error: {type(e).__name__}: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_next(self) -> Optional[Job]:
+        statement = select(Job).where(Job.status == JobStatus.PENDING).order_by(Job.id)
+        if self._running:
+            statement = statement.where(Job.id.not_in(list(self._running)))
+        async with AsyncSession(async_engine) as session:
+            job = (await session.exec(statement.limit(1))).first()
+        if job is None:
+            return None
+
+        def claim(session: Session) -> bool:
+            row = session.get(Job, job.id)
+            if row is None or row.status != JobStatus.PENDING:
+                return False
+            row.status = JobStatus.RUNNING
+            row.started_at = datetime.utcnow()
+            session.add(row)
+            return True
+        return job if await db_writer.run(claim) else None
+
+    async def _run(self, job: Job):
+        handler = self._handlers.get(job.kind)
+        status, result, error = JobStatus.DONE, None, None
+        try:
+            if handler is None:
+                raise ValueError(f"no handler for job kind '{job.kind}'")
+            logger.info(f"Job {job.id} ({job.kind}) started")
+            result = await handler(JobContext(job))
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {type(e).__name__}: {e}")
+            status, error = JobStatus.FAILED, f"{type(e).__name__}: {e}"
+
+        def finish(session: Session):
+            row = session.get(Job, job.id)
+            if row is None:
+                return
+            row.status = status
+            row.error = error
+            row.result = json.dumps(result, default=str) if result is not None else None
+            row.finished_at = datetime.utcnow()
+            session.add(row)
+        try:
+            await db_writer.run(finish)
+            logger.info(f"Job {job.id} ({job.kind}) {status.value.lower()}")
+        finally:
+            self._running.pop(job.id, None)
+            self._wakeup.set()  # a slot is free
+
+    @staticmethod
+    def _requeue_interrupted(session: Session):
+        for job in session.exec(select(Job).where(Job.status == JobStatus.RUNNING)).all():
+            job.status = JobStatus.PENDING
+            session.add(job)
+            logger.warning(f"Job {job.id} ({job.kind}) was interrupted, queued again")
+
+
+job_runner = JobRunner()
+
+
+def job_dict(job: Job) -> dict:
+    """API representation of a job"""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "target_id": job.target_id,
+        "params": json.loads(job.params) if job.params else None,
+        "progress": job.progress,
+        "total": job.total,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_by": job.created_by,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -0,0 +1,146 @@
+import bisect
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from app.db.models import Host, MaintenanceWindow
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RECURRENCES = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+MAINTENANCE_HORIZON = timedelta(days=7)   # recurring windows are expanded this far ahead
+MAINTENANCE_REFRESH = timedelta(days=1)   # rebuilt when less than this is left of the horizon
+
+Target = Tuple[str, int]  # ("host", host_id) | ("group", group_id)
+
+
+def occurrences(window: MaintenanceWindow, start: datetime, end: datetime) -> Iterator[Tuple[datetime, datetime]]:
+    """(start, end) of every occurrence of the window that overlaps [start, end)"""
+    period = RECURRENCES.get(window.recurrence)
+    if period is None:
+        if window.starts_at < end and window.ends_at > start:
+            yield window.starts_at, window.ends_at
+        return
+    duration = window.ends_at - window.starts_at
+    skip = (start - window.ends_at) // period + 1 if start >= window.ends_at else 0  # occurrences over by `start`
+    occurrence = window.starts_at + skip * period
+    while occurrence < end and (window.until is None or occurrence <= window.until):
+        yield occurrence, occurrence + duration
+        occurrence += period
+
+
+def merge(spans: Iterable[Tuple[datetime, datetime]]) -> Tuple[List[datetime], List[datetime]]:
+    """Overlapping or touching spans joined -> sorted starts and their ends"""
+    starts: List[datetime] = []
+    ends: List[datetime] = []
+    for start, end in sorted(spans):
+        if ends and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class MaintenanceIndex:
+    """
+    Maintenance windows as sorted, merged intervals per host and per group:
+    "is this host in maintenance" is a bisect, asked by the ping loop for
+    every host each cycle and by MQTT ingestion for every message, without
+    touching the DB. Recurring windows are expanded up to a horizon. The
+    index is rebuilt when windows change (`on_invalidate` tells the other
+    workers) and before the horizon runs out.
+    """
+
+    def __init__(self, horizon: timedelta = MAINTENANCE_HORIZON, refresh: timedelta = MAINTENANCE_REFRESH):
+        self.horizon = horizon
+        self.refresh = refresh
+        self._intervals: Dict[Target, Tuple[List[datetime], List[datetime]]] = {}
+        self._host_groups: Dict[int, Optional[int]] = {}  # for lookups by host id only (MQTT)
+        self._built_until: Optional[datetime] = None
+        self._generation = 0
+        self._stale = True
+        self._lock = threading.Lock()
+        self.on_invalidate: Optional[Callable[[], None]] = None
+
+    # ===== BUILD =====
+
+    def needs_reload(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.utcnow()
+        return self._stale or self._built_until is None or self._built_until - now < self.refresh
+
+    def load(self, session: Session, now: Optional[datetime] = None):
+        """Rebuild from the DB: windows not over yet, expanded up to now + horizon"""
+        now = now or datetime.utcnow()
+        until = now + self.horizon
+        generation = self._generation
+        windows = session.exec(
+            select(MaintenanceWindow).where(
+                or_(MaintenanceWindow.recurrence.is_not(None), MaintenanceWindow.ends_at > now)
+            )
+        ).all()
+        spans: Dict[Target, List[Tuple[datetime, datetime]]] = {}
+        for window in windows:
+            target = ("host", window.host_id) if window.host_id is not None else ("group", window.group_id)
+            spans.setdefault(target, []).extend(occurrences(window, now, until))
+        intervals = {target: merge(target_spans) for target, target_spans in spans.items() if target_spans}
+        with self._lock:
+            self._intervals = intervals
+            self._built_until = until
+            self._stale = self._generation != generation  # changed while we were reading
+        logger.debug("Maintenance index: %d windows, %d targets", len(windows), len(intervals))
+
+    def set_hosts(self, hosts: Iterable[Host]):
+        """Host -> group membership for active_until(host_id) (refreshed by the ping loop every cycle)"""
+        self._host_groups = {host.id: host.group_id for host in hosts}
+
+    def invalidate(self):
+        """Windows were added or removed - rebuild on the next check, in every worker"""
+        self.invalidate_local()
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+
+    def invalidate_local(self):
+        with self._lock:
+            self._generation += 1
+            self._stale = True
+
+    # ===== LOOKUP =====
+
+    def active_until(
+        self, host_id: int, group_id: Optional[int] = None, at: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """End of the maintenance the host (or its group) is in, None when it is not in maintenance"""
+        at = at or datetime.utcnow()
+        if group_id is None:
+            group_id = self._host_groups.get(host_id)
+        intervals = self._intervals  # swapped whole by load() - no lock needed to read
+        ends = [self._lookup(intervals, ("host", host_id), at)]
+        if group_id is not None:
+            ends.append(self._lookup(intervals, ("group", group_id), at))
+        ends = [end for end in ends if end is not None]
+        return max(ends) if ends else None
+
+    @staticmethod
+    def _lookup(intervals, target: Target, at: datetime) -> Optional[datetime]:
+        found = intervals.get(target)
+        if found is None:
+            return None
+        starts, ends = found
+        i = bisect.bisect_right(starts, at) - 1
+        if i >= 0 and ends[i] > at:
+            return ends[i]
+        return None
+
+
+maintenance_index = MaintenanceIndex()
+
+metrics.gauge(
+    "maintenance_targets", "Hosts and groups with maintenance in the index",
+    function=lambda: len(maintenance_index._intervals)
+)
@@ -1,11 +1,15 @@
 import paho.mqtt.client as mqtt
 import json
 import logging
+import time
 from datetime import datetime
-from sqlmodel import Session, select
+from sqlmodel import Session
 
-from app.db.session import engine
+from app.db.writer import db_writer
 from app.db.models import Alert, Host
+from app.services.dashboard_cache import dashboard_cache
+from app.services.maintenance import maintenance_index
+from app.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +17,12 @@ MQTT_BROKER = "test.mosquitto.org"
 MQTT_PORT = 1883
 MQTT_TOPIC_SUB = "monitoring/alerts"
 MQTT_TOPIC_PUB = "monitoring/alerts/published"
+MQTT_RECONNECT_MIN = 1     # seconds, doubled after every failed attempt
+MQTT_RECONNECT_MAX = 120
+
+MQTT_MESSAGES = metrics.counter("mqtt_messages_received_total", "Incoming MQTT alerts by outcome", ("result",))
+MQTT_MESSAGE_SECONDS = metrics.histogram("mqtt_message_duration_seconds", "Handling of one incoming MQTT alert")
+MQTT_PUBLISHED = metrics.counter("mqtt_published_total", "Outgoing MQTT alerts by outcome", ("result",))
 
 
 class MQTTClient:
@@ -20,6 +30,9 @@ class MQTTClient:
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_connect_fail = self.on_connect_fail
+        self.client.reconnect_delay_set(MQTT_RECONNECT_MIN, MQTT_RECONNECT_MAX)
         self.connected = False
 
     def on_connect(self, client, userdata, flags, rc):
@@ -31,23 +44,38 @@ class MQTTClient:
         else:
             logger.error(f"MQTT: Connection failed with code {rc}")
 
+    def on_connect_fail(self, client, userdata):
+        logger.warning(f"MQTT: Cannot reach {MQTT_BROKER}:{MQTT_PORT}, retrying")
+
+    def on_disconnect(self, client, userdata, rc):
+        self.connected = False
+        if rc != 0:
+            logger.warning(f"MQTT: Connection lost (code {rc}), reconnecting")
+
     def on_message(self, client, userdata, msg):
+        started = time.perf_counter()
+        result = "error"
         try:
             payload = json.loads(msg.payload.decode())
-            logger.debug(f"MQTT: Received: {payload}")
+            logger.debug("MQTT: Received: %s", payload)
             
             host_id = payload.get("host_id")
             status = payload.get("status")
             message = payload.get("message", "")
             severity = "CRITICAL" if status == "DOWN" else "INFO"
+
+            # Hosts in maintenance: dropped before any DB work
+            if host_id is not None and maintenance_index.active_until(host_id) is not None:
+                logger.debug("MQTT: Host %s in maintenance, alert dropped", host_id)
+                result = "maintenance"
+                return
             
-            # Save alert to database
-            with Session(engine) as session:
+            # Save alert to database (committed together with other writers' jobs)
+            def save(session: Session) -> bool:
                 # Check if host exists
                 host = session.get(Host, host_id)
-                if not host:
-                    logger.warning(f"MQTT: Host {host_id} not found")
-                    return
+                if not host or host.deleted_at is not None:
+                    return False
                 
                 # Create alert
                 alert = Alert(
@@ -56,17 +84,28 @@ class MQTTClient:
                     severity=severity
                 )
                 session.add(alert)
-                session.commit()
-                logger.info(f"MQTT: Alert saved for host {host_id}")
+                return True
+
+            if not db_writer.call(save):
+                logger.warning(f"MQTT: Host {host_id} not found")
+                result = "unknown_host"
+                return
+            dashboard_cache.invalidate_alerts()
+            logger.info(f"MQTT: Alert saved for host {host_id}")
+            result = "saved"
                 
         except Exception as e:
             logger.error(f"MQTT: Error processing message: {e}")
+        finally:
+            MQTT_MESSAGES.labels(result).inc()
+            MQTT_MESSAGE_SECONDS.observe(time.perf_counter() - started)
 
     def publish_alert(self, host_id: int, host_name: str, severity: str, message: str):
         """Publish alert to MQTT topic - 0.75 pkt extension"""
         try:
             if not self.connected:
                 logger.warning("MQTT: Not connected, cannot publish")
+                MQTT_PUBLISHED.labels("not_connected").inc()
                 return
             
             payload = {
@@ -78,13 +117,16 @@ class MQTTClient:
             }
             
             self.client.publish(MQTT_TOPIC_PUB, json.dumps(payload), qos=1)
-            logger.debug(f"MQTT: Published alert for host {host_name}: {message}")
+            MQTT_PUBLISHED.labels("queued").inc()
+            logger.debug("MQTT: Published alert for host %s: %s", host_name, message)
         except Exception as e:
+            MQTT_PUBLISHED.labels("error").inc()
             logger.error(f"MQTT: Publish error: {e}")
 
     def connect(self):
+        """Connect in paho's network thread - DNS, TCP and retries with backoff never block the caller"""
         try:
-            self.client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+            self.client.connect_async(MQTT_BROKER, MQTT_PORT, keepalive=60)
             self.client.loop_start()
         except Exception as e:
             logger.error(f"MQTT: Failed to connect: {e}")
@@ -95,3 +137,10 @@ class MQTTClient:
 
 
 mqtt_client = MQTTClient()
+
+metrics.gauge("mqtt_connected", "1 while connected to the broker", function=lambda: mqtt_client.connected)
+# QoS 1 messages not yet acknowledged by the broker (paho keeps no public counter)
+metrics.gauge(
+    "mqtt_outgoing_queue_depth", "Published MQTT messages waiting for the broker",
+    function=lambda: len(getattr(mqtt_client.client, "_out_messages", ()))
+)
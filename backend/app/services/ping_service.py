@@ -1,99 +1,255 @@
 import asyncio
+import json
+import time
 from datetime import datetime
-from typing import Dict
-import socket
-import platform
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 import logging
 
-from icmplib import ping
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.session import engine
-from app.db.models import Host, Alert
-from app.ws.alerts import manager
+from app.db.session import async_engine
+from app.db.writer import db_writer
+from app.db.models import Host, HostCheck, HostGroup, Alert
+from app.ws.alerts import publish, host_event
+from app.ws.stream import event_stream
 from app.services.mqtt_service import mqtt_client
+from app.services.dashboard_cache import dashboard_cache
+from app.services.availability import record_transition
+from app.services.checks import check_runner
+from app.services.maintenance import maintenance_index
+from app.services.resolver import dns_cache
+from app.utils.metrics import metrics
+from app.services.flight_recorder import flight_recorder
 
 logger = logging.getLogger(__name__)
 
 MAX_FAILURES = 3
+UNREACHABLE = "UNREACHABLE"  # not probed - an upstream host (parent or group gateway) is DOWN
 PING_INTERVAL = 8
-IS_WINDOWS = platform.system() == "Windows"
+PROBE_STATE_FILE = Path(__file__).resolve().parents[2] / "data" / "probe_state.json"
+PROBE_STATE_MAX_AGE = 300  # seconds - an older snapshot says nothing about the hosts now
 
+# Consecutive failed probes per host; snapshotted at shutdown so a restart
+# continues confirming a failing host instead of counting from zero
+failure_counts: Dict[int, int] = {}
 
-def is_host_alive(ip: str) -> bool:
-    # Special case for localhost - always use socket check
-    if ip in ('127.0.0.1', 'localhost', '::1'):
-        try:
-            # Try Python's own loopback
-            with socket.create_connection((ip, 8000), timeout=1):
-                return True
-        except Exception:
-            # If backend port is closed, try simple socket test
-            try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.settimeout(1)
-                s.connect((ip if ip != 'localhost' else '127.0.0.1', 80))
-                s.close()
-                return True
-            except Exception:
-                # Localhost always exists, even if no ports open
-                return True
-    
-    # Na Windows ICMP wymaga admin - używamy tylko TCP
-    if IS_WINDOWS:
+PING_CYCLE_SECONDS = metrics.histogram(
+    "ping_cycle_duration_seconds", "Time to probe every host once and persist the changes",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+PING_PROBE_SECONDS = metrics.histogram("ping_probe_duration_seconds", "Single host probe", ("result",))
+PING_PROBES_IN_FLIGHT = metrics.gauge("ping_probes_in_flight", "Host probes running right now")
+PING_HOSTS = metrics.gauge("ping_hosts", "Hosts checked in the last ping cycle")
+PING_PROBES_SKIPPED = metrics.counter(
+    "ping_probes_skipped_total", "Probes skipped: maintenance, or an upstream host is DOWN or failing", ("reason",)
+)
+HOST_TRANSITIONS = metrics.counter("host_transitions_total", "Host status changes detected by the ping loop", ("status",))
+
+
+async def _probe(host: Host, checks: Optional[List[Tuple[str, dict]]]) -> Tuple[bool, str, float, str]:
+    """Run the host's checks -> (alive, result, seconds, what failed)"""
+    address = dns_cache.address(host.ip)  # resolved before the round - no DNS wait here
+    if address is None:
+        return False, "error", 0.0, f"dns: {dns_cache.error(host.ip)}"
+    started = time.perf_counter()
+    PING_PROBES_IN_FLIGHT.inc()
+    try:
+        # Sockets go to the cached address; URLs and commands keep the configured name (Host header, TLS)
+        alive, result, results = await check_runner.check_host(host.ip, checks, address=address)
+        detail = "; ".join(f"{r.type}: {r.detail}" for r in results if not r.ok)
+    except Exception as check_error:
+        logger.error(f"Check error for {host.name}: {check_error}")
+        alive, result, detail = False, "error", str(check_error)
+    finally:
+        PING_PROBES_IN_FLIGHT.dec()
+    if result == "timeout":
+        logger.debug("TIMEOUT %s (%s)", host.name, host.ip)
+    return alive, result, time.perf_counter() - started, detail
+
+
+# ===== DEPENDENCIES =====
+
+def dependency_parents(hosts: Sequence[Host], gateways: Dict[int, int]) -> Dict[int, int]:
+    """Host id -> upstream host id: its own parent, else its group's gateway (only monitored hosts count)"""
+    ids = {host.id for host in hosts}
+    parents = {}
+    for host in hosts:
+        parent_id = host.parent_id or gateways.get(host.group_id)
+        if parent_id in ids and parent_id != host.id:
+            parents[host.id] = parent_id
+    return parents
+
+
+def dependency_levels(hosts: Sequence[Host], parents: Dict[int, int]) -> List[List[Host]]:
+    """Hosts by depth - every parent in an earlier level than its dependents; a dependency loop is cut (removed from parents)"""
+    depth: Dict[int, int] = {}
+    for host in hosts:
+        chain = []
+        node = host.id
+        while node not in depth:
+            if node in chain:
+                logger.warning(f"Host {node} depends on itself through its parents - dependency ignored")
+                del parents[node]
+                depth[node] = 0
+                break
+            chain.append(node)
+            if node not in parents:
+                depth[node] = 0
+                break
+            node = parents[node]
+        for node in reversed(chain):
+            if node not in depth:
+                depth[node] = depth[parents[node]] + 1
+    levels: List[List[Host]] = []
+    for host in hosts:
+        while len(levels) <= depth[host.id]:
+            levels.append([])
+        levels[depth[host.id]].append(host)
+    return levels
+
+
+def _notify(cycle, alerts: list, host: Host, severity: str, message: str, **extra):
+    """Alert row (persisted with the cycle), MQTT message and websocket event for one host"""
+    alerts.append(Alert(host_id=host.id, severity=severity, message=message))
+    with cycle.phase("publish"):
+        mqtt_client.publish_alert(host.id, host.name, severity, message)
+    with cycle.phase("broadcast"):
         try:
-            with socket.create_connection((ip, 80), timeout=2):
-                return True
-        except Exception:
-            try:
-                # Fallback: spróbuj port 443
-                with socket.create_connection((ip, 443), timeout=2):
-                    return True
-            except Exception:
-                return False
-    
-    # Na Linux/Mac: ICMP + TCP fallback
+            publish({**host_event(host, severity, message), **extra})
+        except Exception as ws_error:
+            logger.debug("WS broadcast error: %s", ws_error)
+
+
+def _persist(session: Session, transitions: list, alerts: list):
+    """Writer job: store state transitions, their alerts and the stream events of one cycle"""
+    existing = set()
+    for host_id, host_status, last_seen, changed_at in transitions:
+        host = session.get(Host, host_id)
+        if host is None or host.deleted_at is not None:
+            continue  # deleted while we were pinging it
+        record_transition(session, host, host_status, changed_at)
+        host.last_seen = last_seen
+        session.add(host)
+        existing.add(host_id)
+    for alert in alerts:
+        if alert.host_id in existing:
+            session.add(alert)
+    event_stream.save(session)
+
+
+def save_probe_state(path: Path = PROBE_STATE_FILE):
+    """Write the failure counts at shutdown (hub only)"""
+    data = {"saved_at": time.time(), "failure_counts": {str(k): v for k, v in failure_counts.items() if v}}
     try:
-        result = ping(ip, count=1, timeout=2, privileged=False)
-        if result.is_alive:
-            return True
-    except Exception as icmp_error:
-        print(f"  [ICMP error for {ip}]")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(".tmp")
+        temp.write_text(json.dumps(data))
+        temp.replace(path)
+        logger.info(f"Probe state saved ({len(data['failure_counts'])} failing hosts)")
+    except OSError as e:
+        logger.error(f"Probe state: save failed: {e}")
 
-    # TCP fallback
+
+def load_probe_state(path: Path = PROBE_STATE_FILE) -> int:
+    """Restore a recent snapshot into failure_counts; returns the number of hosts restored"""
     try:
-        with socket.create_connection((ip, 80), timeout=2):
-            return True
-    except Exception:
-        pass
-    
-    return False
+        data = json.loads(path.read_text())
+        path.unlink()  # used once - a later crash must not restore it again
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError) as e:
+        logger.warning(f"Probe state: unreadable snapshot ignored: {e}")
+        return 0
+    age = time.time() - data.get("saved_at", 0)
+    if age > PROBE_STATE_MAX_AGE:
+        logger.info(f"Probe state: snapshot is {age:.0f}s old, ignored")
+        return 0
+    counts = {int(host_id): int(count) for host_id, count in data.get("failure_counts", {}).items()}
+    failure_counts.update(counts)
+    logger.info(f"Probe state restored ({len(counts)} failing hosts, {age:.0f}s old)")
+    return len(counts)
 
 
 async def ping_loop():
-    failure_counts: Dict[int, int] = {}
+    load_probe_state()
     logger.info("Ping loop starting...")
 
     while True:
         try:
-            with Session(engine) as session:
-                hosts = session.exec(select(Host)).all()
-                logger.debug(f"Checking {len(hosts)} hosts...")
-
-                for host in hosts:
-                    try:
-                        # Run ping in executor (non-blocking)
-                        loop = asyncio.get_event_loop()
-                        alive = await asyncio.wait_for(
-                            loop.run_in_executor(None, is_host_alive, host.ip),
-                            timeout=2
-                        )
-                    except asyncio.TimeoutError:
-                        logger.debug(f"TIMEOUT {host.name} ({host.ip})")
-                        alive = False
-                    except Exception as ping_error:
-                        logger.error(f"Ping error for {host.name}: {ping_error}")
-                        alive = False
+            cycle_started = time.perf_counter()
+            cycle = flight_recorder.start_cycle()
+            # Read through the async pool, write through the DB writer - no DB I/O on the event loop
+            with cycle.phase("load"):
+                async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                    hosts = (await session.exec(select(Host).where(Host.deleted_at.is_(None)))).all()
+                    gateways = dict((await session.exec(
+                        select(HostGroup.id, HostGroup.parent_id)
+                        .where(HostGroup.parent_id.is_not(None), HostGroup.deleted_at.is_(None))
+                    )).all())
+                    checks: Dict[int, List[Tuple[str, dict]]] = {}
+                    for check in (await session.exec(select(HostCheck).where(HostCheck.enabled))).all():
+                        checks.setdefault(check.host_id, []).append((check.type, json.loads(check.config)))
+                    if maintenance_index.needs_reload():
+                        await session.run_sync(maintenance_index.load)
+            maintenance_index.set_hosts(hosts)
+            with cycle.phase("resolve"):
+                # Only names never seen are waited for; the rest refresh in the background before they expire
+                await dns_cache.prepare((host.ip for host in hosts), ahead=2 * PING_INTERVAL)
+            logger.debug("Checking %d hosts...", len(hosts))
+            PING_HOSTS.set(len(hosts))
+            cycle.hosts = len(hosts)
+            transitions = []  # (host_id, status, last_seen, changed_at) persisted and applied to the dashboard cache
+            alerts = []
+
+            parents = dependency_parents(hosts, gateways)
+            hosts_by_id = {host.id: host for host in hosts}
+            blocked: Dict[int, int] = {}    # DOWN/unreachable this cycle -> the DOWN host at the root of it
+            deferred: Set[int] = set()      # failing but not DOWN yet, in maintenance, or behind such a host - dependents wait
+            unreachable: Dict[int, List[Host]] = {}  # root -> dependents that became unreachable this cycle
+            reachable: Dict[int, List[Host]] = {}    # parent -> dependents that answered again
+
+            now = datetime.utcnow()
+            for level in dependency_levels(hosts, parents):
+                probing = []
+                for host in level:
+                    # ===== MAINTENANCE =====
+                    if maintenance_index.active_until(host.id, host.group_id, now) is not None:
+                        failure_counts[host.id] = 0  # start confirming from zero once it is over
+                        deferred.add(host.id)        # its dependents are not probed either
+                        PING_PROBES_SKIPPED.labels("maintenance").inc()
+                        cycle.skipped += 1
+                        continue
+
+                    # ===== UPSTREAM DOWN =====
+                    parent_id = parents.get(host.id)
+                    if parent_id in blocked:
+                        root_id = blocked[parent_id]
+                        blocked[host.id] = root_id
+                        failure_counts[host.id] = 0
+                        PING_PROBES_SKIPPED.labels("unreachable").inc()
+                        cycle.skipped += 1
+                        if host.status != UNREACHABLE:
+                            host.status = UNREACHABLE
+                            transitions.append((host.id, host.status, host.last_seen, datetime.utcnow()))
+                            unreachable.setdefault(root_id, []).append(host)
+                        continue
+                    if parent_id in deferred:
+                        deferred.add(host.id)
+                        PING_PROBES_SKIPPED.labels("deferred").inc()
+                        cycle.skipped += 1
+                        continue
+                    probing.append(host)
+
+                # The whole level at once - the check runner's pools bound what really runs in parallel
+                with cycle.phase("probe"):
+                    outcomes = await asyncio.gather(*(_probe(host, checks.get(host.id)) for host in probing))
+
+                for host, (alive, result, probe_seconds, detail) in zip(probing, outcomes):
+                    PING_PROBE_SECONDS.labels(result).observe(probe_seconds)
+                    cycle.probe(host.id, host.ip, probe_seconds, result)
+                    parent_id = parents.get(host.id)
 
                     # ===== HOST UP =====
                     if alive:
@@ -103,42 +259,25 @@ async def ping_loop():
                         if previous_status == "unknown":
                             host.status = "UP"
                             host.last_seen = datetime.utcnow()
-                            
-                            alert = Alert(
-                                host_id=host.id,
-                                severity="INFO",
-                                message="Host is UP"
-                            )
-                            session.add(alert)
-                            
-                            # Publish to MQTT
-                            mqtt_client.publish_alert(host.id, host.name, "INFO", "Host is UP")
-                            
+                            transitions.append((host.id, host.status, host.last_seen, datetime.utcnow()))
+                            _notify(cycle, alerts, host, "INFO", "Host is UP")
                             logger.info(f"[UP] Host {host.name} ({host.ip}) initialized as UP")
-                            try:
-                                await manager.broadcast(f"ALERT: Host {host.name} is UP")
-                            except Exception as ws_error:
-                                logger.debug(f"WS broadcast error: {ws_error}")
 
                         elif previous_status == "DOWN":
                             host.status = "UP"
                             host.last_seen = datetime.utcnow()
-
-                            alert = Alert(
-                                host_id=host.id,
-                                severity="INFO",
-                                message="Host recovered (UP)"
-                            )
-                            session.add(alert)
-
-                            # Publish to MQTT
-                            mqtt_client.publish_alert(host.id, host.name, "INFO", "Host recovered (UP)")
-
+                            transitions.append((host.id, host.status, host.last_seen, datetime.utcnow()))
+                            _notify(cycle, alerts, host, "INFO", "Host recovered (UP)")
                             logger.warning(f"[RECOVERED] ALERT: Host {host.name} recovered")
-                            try:
-                                await manager.broadcast(f"ALERT: Host {host.name} recovered (UP)")
-                            except Exception as ws_error:
-                                logger.debug(f"WS broadcast error: {ws_error}")
+
+                        elif previous_status == UNREACHABLE:
+                            host.status = "UP"
+                            host.last_seen = datetime.utcnow()
+                            transitions.append((host.id, host.status, host.last_seen, datetime.utcnow()))
+                            if parent_id is not None:
+                                reachable.setdefault(parent_id, []).append(host)  # reported once per parent below
+                            else:
+                                _notify(cycle, alerts, host, "INFO", "Host is UP")  # dependency removed meanwhile
 
                     # ===== HOST DOWN =====
                     else:
@@ -148,56 +287,48 @@ async def ping_loop():
                         # Immediately mark unknown host as DOWN
                         if previous_status == "unknown":
                             host.status = "DOWN"
-
-                            alert = Alert(
-                                host_id=host.id,
-                                severity="CRITICAL",
-                                message="Host is DOWN"
-                            )
-                            session.add(alert)
-
-                            # Publish to MQTT
-                            mqtt_client.publish_alert(host.id, host.name, "CRITICAL", "Host is DOWN")
-
-                            logger.warning(f"[DOWN] Host {host.name} ({host.ip}) initialized as DOWN")
-                            try:
-                                await manager.broadcast(f"ALERT: Host {host.name} is DOWN")
-                            except Exception as ws_error:
-                                logger.debug(f"WS broadcast error: {ws_error}")
+                            transitions.append((host.id, host.status, host.last_seen, datetime.utcnow()))
+                            _notify(cycle, alerts, host, "CRITICAL", "Host is DOWN")
+                            logger.warning(f"[DOWN] Host {host.name} ({host.ip}) initialized as DOWN ({detail})")
 
                         elif (
                             failure_counts[host.id] >= MAX_FAILURES
                             and previous_status != "DOWN"
                         ):
                             host.status = "DOWN"
+                            transitions.append((host.id, host.status, host.last_seen, datetime.utcnow()))
+                            _notify(cycle, alerts, host, "CRITICAL", "Host is DOWN")
+                            logger.warning(f"[DOWN] ALERT: Host {host.name} is DOWN ({detail})")
 
-                            alert = Alert(
-                                host_id=host.id,
-                                severity="CRITICAL",
-                                message="Host is DOWN"
-                            )
-                            session.add(alert)
-
-                            # Publish to MQTT
-                            mqtt_client.publish_alert(host.id, host.name, "CRITICAL", "Host is DOWN")
-
-                            logger.warning(f"[DOWN] ALERT: Host {host.name} is DOWN")
-                            try:
-                                await manager.broadcast(f"ALERT: Host {host.name} is DOWN")
-                            except Exception as ws_error:
-                                logger.debug(f"WS broadcast error: {ws_error}")
-
-                    session.add(host)
-
-                try:
-                    session.commit()
-                except Exception as commit_error:
-                    # Handle case where host was deleted by another session
-                    if "StaleDataError" in str(type(commit_error).__name__):
-                        logger.debug(f"Host was deleted during ping check: {commit_error}")
-                        session.rollback()
-                    else:
-                        raise
+                        if host.status == "DOWN":
+                            blocked[host.id] = host.id
+                        else:
+                            deferred.add(host.id)
+
+            # ===== DEPENDENTS =====
+            # One alert, MQTT message and websocket event per root cause instead of one per host
+            for root_id, dependents in unreachable.items():
+                root = hosts_by_id[root_id]
+                message = f"Host is DOWN - {len(dependents)} dependent hosts unreachable"
+                _notify(cycle, alerts, root, "CRITICAL", message, dependents=[h.id for h in dependents])
+                logger.warning(f"[UNREACHABLE] {len(dependents)} hosts behind {root.name} ({root.ip}) are unreachable")
+            for parent_id, dependents in reachable.items():
+                parent = hosts_by_id[parent_id]
+                message = f"{len(dependents)} dependent hosts reachable again"
+                _notify(cycle, alerts, parent, "INFO", message, dependents=[h.id for h in dependents])
+                logger.info(f"[REACHABLE] {len(dependents)} hosts behind {parent.name} ({parent.ip}) answer again")
+
+            with cycle.phase("persist"):
+                await db_writer.run(lambda session: _persist(session, transitions, alerts))
+            with cycle.phase("broadcast"):
+                for host_id, host_status, last_seen, _ in transitions:
+                    dashboard_cache.set_host_status(host_id, host_status, last_seen)
+                    HOST_TRANSITIONS.labels(host_status).inc()
+                if transitions:
+                    dashboard_cache.invalidate_alerts()
+            cycle.transitions = len(transitions)
+            PING_CYCLE_SECONDS.observe(time.perf_counter() - cycle_started)
+            await flight_recorder.finish(cycle)
 
         except Exception as e:
             logger.error(f"Ping loop error: {type(e).__name__}: {e}")
@@ -0,0 +1,349 @@
+import asyncio
+import ipaddress
+import logging
+import random
+import socket
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RESOLV_CONF = Path("/etc/resolv.conf")
+HOSTS_FILE = Path("/etc/hosts")
+DNS_TIMEOUT = 1.5        # seconds per query to one nameserver
+DNS_CONCURRENCY = 64     # lookups in flight at once
+DNS_MIN_TTL = 30         # shorter answer TTLs are cached this long anyway
+DNS_MAX_TTL = 3600
+DNS_NEGATIVE_TTL = 60    # "no such name" without an SOA to take the TTL from, and the cap with one (RFC 2308)
+DNS_RETRY_TTL = 10       # the resolver failed: asked again this much later, the last addresses still served...
+DNS_STALE_MAX = 3600     # ...for at most this long past their TTL
+SYSTEM_TTL = 300         # names left to getaddrinfo, which reports no TTL
+
+A, CNAME, SOA, AAAA = 1, 5, 6, 28
+NOERROR, NXDOMAIN = 0, 3
+
+DNS_QUERIES = metrics.counter("dns_queries_total", "Lookups sent to the resolver", ("result",))
+DNS_QUERY_SECONDS = metrics.histogram("dns_query_duration_seconds", "One name lookup, every query of it included")
+
+
+class DnsError(Exception):
+    """No usable answer - timeout, SERVFAIL, malformed or truncated response"""
+
+
+class NoAddress(Exception):
+    """The name does not exist or has no address; ttl from the zone's SOA when the server sent one"""
+
+    def __init__(self, message: str, ttl: Optional[int] = None):
+        super().__init__(message)
+        self.ttl = ttl
+
+
+class DnsEntry(NamedTuple):
+    addresses: Tuple[str, ...]  # empty - the name does not resolve
+    expires: float              # cache clock time the entry is refreshed at
+    valid_until: float = 0.0    # end of the last good answer's TTL (the limit for serving it stale)
+    error: str = ""             # why there are no addresses, or why the last refresh failed
+
+
+# ===== WIRE FORMAT =====
+
+def _query_packet(qid: int, name: str, qtype: int) -> bytes:
+    labels = b"".join(bytes([len(label)]) + label for label in name.rstrip(".").encode("idna").split(b"."))
+    return struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0) + labels + b"\0" + struct.pack("!HH", qtype, 1)
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        length = data[offset]
+        if length >= 0xC0:
+            return offset + 2  # a compression pointer ends the name
+        offset += length + 1
+        if length == 0:
+            return offset
+
+
+def parse_response(data: bytes, qid: int, qtype: int) -> Tuple[int, List[str], Optional[int]]:
+    """-> (rcode, addresses of the queried type, TTL to cache the answer for)"""
+    try:
+        answer_id, flags, questions, answers, authority, _ = struct.unpack_from("!HHHHHH", data)
+        if answer_id != qid:
+            raise DnsError("answer to another query")
+        if flags & 0x0200:
+            raise DnsError("truncated answer")
+        offset = 12
+        for _ in range(questions):
+            offset = _skip_name(data, offset) + 4
+        addresses, ttls = [], []
+        for index in range(answers + authority):
+            offset = _skip_name(data, offset)
+            rtype, _, ttl, length = struct.unpack_from("!HHIH", data, offset)
+            offset += 10 + length
+            if index < answers:
+                if rtype == qtype:
+                    family = socket.AF_INET if qtype == A else socket.AF_INET6
+                    addresses.append(socket.inet_ntop(family, data[offset - length:offset]))
+                    ttls.append(ttl)
+                elif rtype == CNAME:
+                    ttls.append(ttl)  # the chain expires with its shortest link
+            elif rtype == SOA:
+                # Negative answer: cached for min(SOA TTL, SOA MINIMUM) - RFC 2308
+                ttls.append(min(ttl, struct.unpack_from("!I", data, offset - 4)[0]))
+    except (struct.error, IndexError, ValueError) as e:
+        raise DnsError(f"malformed answer: {e}")
+    return flags & 0x000F, addresses, min(ttls) if ttls else None
+
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, qid: int):
+        self.qid = qid.to_bytes(2, "big")
+        self.answer = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data: bytes, addr):
+        if data[:2] == self.qid and not self.answer.done():
+            self.answer.set_result(data)
+
+    def error_received(self, exc: Exception):
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+
+async def query(nameserver: Tuple[str, int], name: str, qtype: int, timeout: float = DNS_TIMEOUT):
+    """One UDP query -> parse_response(); raises DnsError, OSError or asyncio.TimeoutError"""
+    qid = random.getrandbits(16)
+    transport, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: _DnsProtocol(qid), remote_addr=nameserver
+    )
+    try:
+        transport.sendto(_query_packet(qid, name, qtype))
+        data = await asyncio.wait_for(protocol.answer, timeout)
+    finally:
+        transport.close()
+    return parse_response(data, qid, qtype)
+
+
+def _nameservers(path: Path = RESOLV_CONF) -> List[Tuple[str, int]]:
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return []
+    return [(line.split()[1], 53) for line in lines if line.startswith("nameserver") and len(line.split()) > 1]
+
+
+def _hosts_file_names(path: Path = HOSTS_FILE) -> Set[str]:
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return set()
+    return {name.lower() for line in lines for name in line.split("#")[0].split()[1:]}
+
+
+def is_ip(name: str) -> bool:
+    try:
+        ipaddress.ip_address(name)
+    except ValueError:
+        return False
+    return True
+
+
+# ===== CACHE =====
+
+class DnsCache:
+    """
+    Host name -> addresses for the probe engine. Answers are cached for their
+    DNS TTL (clamped), names that do not resolve for the negative TTL, and
+    prepare() refreshes entries in the background before they expire, so a
+    probe reads a ready address and never waits for DNS. When the resolver
+    fails the last addresses keep being served for up to DNS_STALE_MAX.
+    Names from the hosts file, single-label names (search domains) and setups
+    without a nameserver go through getaddrinfo with SYSTEM_TTL.
+    """
+
+    def __init__(
+        self,
+        nameservers: Optional[List[Tuple[str, int]]] = None,
+        hosts_names: Optional[Set[str]] = None,
+        timeout: float = DNS_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.nameservers = _nameservers() if nameservers is None else nameservers
+        self.hosts_names = _hosts_file_names() if hosts_names is None else hosts_names
+        self.timeout = timeout
+        self.clock = clock
+        self._entries: Dict[str, DnsEntry] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._literals: Set[str] = set()
+        self._slots = asyncio.Semaphore(DNS_CONCURRENCY)
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.prefetches = 0
+
+    def address(self, name: str) -> Optional[str]:
+        """The address to probe for a host's ip field (an IP literal as is); None when it does not resolve"""
+        if name in self._literals:
+            return name
+        entry = self._entries.get(name)
+        if entry is None:
+            self.misses += 1
+            return None
+        if not entry.addresses:
+            self.negative_hits += 1
+            return None
+        if entry.valid_until <= self.clock():
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return entry.addresses[0]
+
+    def error(self, name: str) -> str:
+        entry = self._entries.get(name)
+        return entry.error if entry is not None and entry.error else f"{name}: not resolved yet"
+
+    async def prepare(self, names: Iterable[str], ahead: float = 0.0):
+        """
+        Before a probe round, with every host's ip field: names seen for the
+        first time are resolved now, entries expiring within `ahead` seconds
+        (negative ones included) are refreshed in the background. Entries of
+        names no longer asked for are dropped.
+        """
+        wanted = set(names)
+        # Names with an entry are known not to be literals - only new ones are parsed
+        self._literals = {name for name in wanted if name in self._literals or (name not in self._entries and is_ip(name))}
+        wanted -= self._literals
+        for name in [name for name in self._entries if name not in wanted]:
+            del self._entries[name]
+
+        now = self.clock()
+        missing = []
+        for name in wanted:
+            entry = self._entries.get(name)
+            if entry is None:
+                missing.append(name)
+            elif entry.expires - now <= ahead and name not in self._pending:
+                self.prefetches += 1
+                self._start(name)
+        if missing:
+            await asyncio.gather(*(self.resolve(name) for name in missing))
+
+    async def resolve(self, name: str) -> DnsEntry:
+        """Look the name up now and cache the answer; callers asking at the same time share one lookup"""
+        return await asyncio.shield(self._pending.get(name) or self._start(name))
+
+    def _start(self, name: str) -> asyncio.Task:
+        task = self._pending[name] = asyncio.ensure_future(self._refresh(name))
+        task.add_done_callback(lambda _: self._pending.pop(name, None))
+        return task
+
+    async def _refresh(self, name: str) -> DnsEntry:
+        async with self._slots:
+            started = time.perf_counter()
+            try:
+                addresses, ttl = await self._lookup(name)
+                result = "ok"
+            except NoAddress as e:
+                addresses, ttl, result, error = (), e.ttl, "nxdomain", str(e)
+            except (DnsError, OSError, asyncio.TimeoutError) as e:
+                addresses, ttl, result = None, None, "error"
+                error = f"{name}: {e or type(e).__name__}"
+            DNS_QUERIES.labels(result).inc()
+            DNS_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+        now = self.clock()
+        previous = self._entries.get(name)
+        if addresses:
+            ttl = min(max(ttl, DNS_MIN_TTL), DNS_MAX_TTL)
+            entry = DnsEntry(addresses, now + ttl, now + ttl)
+            if previous is not None and previous.addresses and previous.addresses != addresses:
+                logger.info(f"DNS: {name} now resolves to {', '.join(addresses)}")
+        elif addresses is not None:
+            ttl = DNS_NEGATIVE_TTL if ttl is None else min(max(ttl, DNS_MIN_TTL), DNS_NEGATIVE_TTL)
+            entry = DnsEntry((), now + ttl, error=error)
+            if previous is None or previous.addresses:
+                logger.warning(f"DNS: {error}")
+        elif previous is not None and previous.addresses and now < previous.valid_until + DNS_STALE_MAX:
+            entry = previous._replace(expires=now + DNS_RETRY_TTL, error=error)
+            logger.warning(f"DNS: {error} - still using {previous.addresses[0]}")
+        else:
+            entry = DnsEntry((), now + DNS_RETRY_TTL, error=error)
+            logger.warning(f"DNS: {error}")
+        self._entries[name] = entry
+        return entry
+
+    async def _lookup(self, name: str) -> Tuple[Tuple[str, ...], int]:
+        """-> (addresses, TTL); raises NoAddress, or DnsError when no nameserver answered"""
+        try:
+            name.encode("idna")
+        except UnicodeError:
+            raise NoAddress(f"{name}: not a valid host name")
+        if not self.nameservers or "." not in name.rstrip(".") or name.lower() in self.hosts_names:
+            return await self._system_lookup(name)
+        error: Exception = DnsError("no nameserver")
+        for nameserver in self.nameservers:
+            try:
+                rcode, addresses, ttl = await query(nameserver, name, A, self.timeout)
+                if rcode == NOERROR and not addresses:
+                    rcode, addresses, ttl = await query(nameserver, name, AAAA, self.timeout)
+            except DnsError as e:
+                if str(e) == "truncated answer":
+                    return await self._system_lookup(name)  # getaddrinfo retries over TCP
+                error = e
+                continue
+            except asyncio.TimeoutError:
+                error = DnsError(f"no answer from {nameserver[0]} within {self.timeout}s")
+                continue
+            except OSError as e:
+                error = e
+                continue
+            if rcode == NXDOMAIN:
+                raise NoAddress(f"{name}: no such name", ttl)
+            if rcode != NOERROR:
+                error = DnsError(f"{nameserver[0]} answered with rcode {rcode}")
+                continue
+            if not addresses:
+                raise NoAddress(f"{name}: no address", ttl)
+            return tuple(dict.fromkeys(addresses)), ttl
+        raise error
+
+    async def _system_lookup(self, name: str) -> Tuple[Tuple[str, ...], int]:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(loop.getaddrinfo(name, None, type=socket.SOCK_STREAM), 2 * self.timeout)
+        except socket.gaierror as e:
+            if e.errno in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)):
+                raise NoAddress(f"{name}: {e.strerror}")
+            raise DnsError(e.strerror)
+        return tuple(dict.fromkeys(info[4][0] for info in infos)), SYSTEM_TTL
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "negative": sum(1 for entry in self._entries.values() if not entry.addresses),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "prefetches": self.prefetches,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+dns_cache = DnsCache()
+
+metrics.gauge("dns_cache_entries", "Host names in the DNS cache", function=lambda: len(dns_cache._entries))
+metrics.counter("dns_cache_hits_total", "Probe addresses served from a fresh cache entry", function=lambda: dns_cache.hits)
+metrics.counter(
+    "dns_cache_stale_hits_total", "Probe addresses served past their TTL while the resolver fails",
+    function=lambda: dns_cache.stale_hits
+)
+metrics.counter(
+    "dns_cache_negative_hits_total", "Probes failed at once from a cached does-not-resolve answer",
+    function=lambda: dns_cache.negative_hits
+)
+metrics.counter("dns_cache_misses_total", "Probes of a name not resolved yet", function=lambda: dns_cache.misses)
+metrics.counter("dns_prefetches_total", "Background refreshes of names about to expire", function=lambda: dns_cache.prefetches)
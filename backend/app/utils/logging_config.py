@@ -1,25 +1,171 @@
+import atexit
+import copy
+import json
 import logging
 import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
-# Create logs directory
-LOG_DIR = Path(__file__).resolve().parents[2] / "logs"
-LOG_DIR.mkdir(exist_ok=True)
+from app.utils.metrics import metrics
 
+LOG_DIR = Path(__file__).resolve().parents[2] / "logs"
 LOG_FILE = LOG_DIR / "monitoring.log"
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")                # root level - DEBUG records are not even created below it
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")                  # per logger: "app.services.ping_service=DEBUG,sqlalchemy=WARNING"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")              # "json": one JSON object per line in the log file
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # records waiting for the listener; more are dropped
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "")        # noisy loggers only: "app.services.checks=20" (DEBUG/INFO records
+                                                          # per call site per interval); nothing is limited by default
+LOG_RATE_INTERVAL = 10                                    # seconds
+
+LOG_DROPPED = metrics.counter("log_records_dropped_total", "Log records dropped, by reason", ("reason",))
+LOG_QUEUE_DEPTH = metrics.gauge(
+    "log_queue_depth", "Log records waiting for the listener thread",
+    function=lambda: _listener.queue.qsize() if _listener is not None else 0
+)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread. Never blocks the caller: when the
+    queue is full the record is dropped and counted. Only the message is
+    rendered here - timestamps, formatting and file I/O happen in the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()  # args may change after we return
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.labels("queue_full").inc()
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # the default put_nowait fails on a full queue at shutdown
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `limits[logger]` DEBUG/INFO records per call site
+    (file:line) every `interval` seconds, for the listed loggers and their
+    children only. The first record after a suppressed stretch says how many
+    were dropped. Warnings, errors and every other logger always pass.
+    """
+
+    def __init__(self, limits: Dict[str, int], interval: float = LOG_RATE_INTERVAL):
+        super().__init__()
+        self.limits = limits
+        self.interval = interval
+        self._sites: Dict[Tuple[str, int], list] = {}  # call site -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def limit_for(self, name: str) -> int:
+        """Limit of the closest listed logger (0 = not limited)"""
+        while name:
+            if name in self.limits:
+                return self.limits[name]
+            name = name.rpartition(".")[0]
+        return 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        limit = self.limit_for(record.name)
+        if not limit:
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < limit:
+                site[1] += 1
+                return True
+            else:
+                site[2] += 1
+                LOG_DROPPED.labels("rate_limited").inc()
+                return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record - for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """"a.b=DEBUG,c=WARNING" -> {"a.b": 10, "c": 30}; bad entries are skipped"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        level = logging.getLevelName(level.strip().upper())
+        if name.strip() and isinstance(level, int):
+            levels[name.strip()] = level
+    return levels
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """"a.b=20,c=5" -> {"a.b": 20, "c": 5}; bad entries are skipped"""
+    limits = {}
+    for item in spec.split(","):
+        name, _, limit = item.partition("=")
+        if name.strip() and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+_listener: Optional[_Listener] = None
+
 
 def setup_logging():
-    """Configure logging to both file and console"""
-    
+    """Configure logging to both file and console through a background listener thread (called once by main)"""
+    global _listener
+
+    LOG_DIR.mkdir(exist_ok=True)
     # Create logger
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    
+    logger.setLevel(LOG_LEVEL.upper())
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
     # Remove existing handlers
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
-    
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    else:
+        atexit.register(stop_logging)
+
     # File handler - rotating logs
     file_handler = logging.handlers.RotatingFileHandler(
         LOG_FILE,
@@ -27,13 +173,15 @@ def setup_logging():
         backupCount=5
     )
     file_handler.setLevel(logging.DEBUG)
-    file_format = logging.Formatter(
-        '[%(asctime)s] %(levelname)-8s [%(name)s:%(lineno)d] %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if LOG_FORMAT == "json":
+        file_format = JsonFormatter()
+    else:
+        file_format = logging.Formatter(
+            '[%(asctime)s] %(levelname)-8s [%(name)s:%(lineno)d] %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     file_handler.setFormatter(file_format)
-    logger.addHandler(file_handler)
-    
+
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
@@ -41,10 +189,30 @@ def setup_logging():
         '[%(levelname)s] %(message)s'
     )
     console_handler.setFormatter(console_format)
-    logger.addHandler(console_handler)
-    
+
+    # Producers only enqueue; the listener thread formats and writes
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    rate_limits = parse_limits(LOG_RATE_LIMITS)
+    if rate_limits:
+        queue_handler.addFilter(RateLimitFilter(rate_limits))
+    logger.addHandler(queue_handler)
+    _listener = _Listener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+
+    # Uvicorn writes its access log synchronously to stdout - route it through the queue too
+    for name in ("uvicorn", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
     return logger
 
 
-# Initialize on import
-logger = setup_logging()
+def stop_logging():
+    """Flush the queue and stop the listener (at exit)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
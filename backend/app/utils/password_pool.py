@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from app.utils.jwt_utils import hash_password, verify_password
+
+logger = logging.getLogger(__name__)
+
+# bcrypt is CPU bound - one worker process per core, outside the request threadpool
+PASSWORD_POOL_WORKERS = os.cpu_count() or 2
+# Jobs allowed in flight (running + queued) before new ones are rejected
+PASSWORD_POOL_MAX_PENDING = PASSWORD_POOL_WORKERS * 8
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing queue is full - callers should answer 503"""
+
+
+class PasswordPool:
+    """
+    Size-limited process pool for bcrypt hashing/verification with admission control.
+    A login storm queues here (and fails fast once the queue is full) instead of
+    occupying the shared threadpool that serves every sync endpoint.
+    """
+
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_POOL_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs uvicorn/MQTT threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Password pool started with {self.workers} workers")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordPoolBusy(f"{self.pending} password jobs pending")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM kill, segfault) - the executor is unusable from now on
+                self._discard(executor)
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                self._discard(executor)
+                raise PasswordPoolBusy("password pool workers keep dying")
+        finally:
+            self.pending -= 1
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """Drop a broken executor; the next job starts a new one (jobs that failed with it only discard it once)"""
+        if self._executor is not executor:
+            return
+        logger.error("Password pool broken (a worker process died) - restarting it")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.restarts += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordPool()
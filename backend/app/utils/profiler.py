@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+PROFILE_MAX_SECONDS = 60
+PROFILE_DEFAULT_INTERVAL = 0.005   # seconds between samples (200 Hz)
+# Leaf frames of threads that are only waiting - dropped unless idle samples are requested
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("core.py", "_connection_worker_thread"),  # aiosqlite connection thread blocked on its queue
+}
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running in this process"""
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread reads every thread's stack
+    (sys._current_frames) at a fixed interval and counts identical stacks.
+    Nothing is hooked into the profiled code, so the cost is one stack walk
+    per thread per sample and only while a profile runs.
+    The result is the collapsed-stack format of flamegraph.pl / speedscope:
+    "thread;outer (file:line);...;inner (file:line) <samples>" per line.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval: float = PROFILE_DEFAULT_INTERVAL, include_idle: bool = False) -> str:
+        """Sample all threads of this process for `seconds`; blocks the calling thread meanwhile"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("a profile is already running")
+        try:
+            stacks = self._sample(min(seconds, PROFILE_MAX_SECONDS), interval, include_idle)
+        finally:
+            self._lock.release()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def _sample(self, seconds: float, interval: float, include_idle: bool) -> Counter:
+        stacks: Counter = Counter()
+        me = threading.get_ident()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = self._collapse(frame, include_idle)
+                if stack:
+                    stacks[f"{names.get(ident, ident)};{stack}"] += 1
+            time.sleep(interval)
+        return stacks
+
+    @staticmethod
+    def _collapse(frame, include_idle: bool) -> Optional[str]:
+        leaf = frame.f_code
+        if not include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+            return None
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+
+def _short_path(filename: str) -> str:
+    # "app/services/ping_service.py" / "site-packages/sqlalchemy/orm/session.py" instead of absolute paths
+    for marker in ("site-packages" + os.sep, os.sep + "app" + os.sep):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + (len(marker) if marker.startswith("site") else 1):]
+    return os.path.basename(filename)
+
+
+profiler = SamplingProfiler()
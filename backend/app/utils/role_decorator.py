@@ -1,10 +1,11 @@
 from fastapi import HTTPException, status, Depends, Header
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
 
-from app.db.session import get_session
+from app.db.session import get_async_session
 from app.db.models import User, UserRole
 from app.utils.jwt_utils import decode_token
+from app.utils.user_cache import user_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,9 +13,9 @@ logger = logging.getLogger(__name__)
 
 async def get_current_user(
     authorization: Optional[str] = Header(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> User:
-    """Extract user from Authorization header JWT token."""
+    """Extract user from Authorization header JWT token (cached per token, see user_cache)."""
     if not authorization:
         logger.warning("Missing Authorization header")
         raise HTTPException(
@@ -35,6 +36,11 @@ async def get_current_user(
             detail="Invalid Authorization header format"
         )
     
+    # Fast path: token already verified recently - no decoding, no DB hit
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+    
     try:
         payload = decode_token(token)
         if payload is None:
@@ -54,7 +60,7 @@ async def get_current_user(
                 detail="Invalid token"
             )
         
-        user = session.get(User, user_id)
+        user = await session.get(User, user_id)
         if not user or user.username != username:
             logger.warning(f"User {user_id} not found")
             raise HTTPException(
@@ -69,7 +75,8 @@ async def get_current_user(
                 detail="User is inactive"
             )
         
-        logger.debug(f"User {username} authenticated")
+        user_cache.put(token, user, payload.get("exp"))
+        logger.debug("User %s authenticated", username)
         return user
         
     except HTTPException:
@@ -96,7 +103,7 @@ def require_role(*required_roles: UserRole):
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"User role '{current_user.role}' not allowed. Required: {', '.join(str(r) for r in required_roles)}"
             )
-        logger.debug(f"User {current_user.username} authorized with role {current_user.role}")
+        logger.debug("User %s authorized with role %s", current_user.username, current_user.role)
         return current_user
     
     return role_checker
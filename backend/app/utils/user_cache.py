@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
+
+from app.db.models import User
+from app.utils.metrics import metrics
+
+USER_CACHE_MAX_SIZE = 10_000
+USER_CACHE_TTL_SECONDS = 60
+
+
+class UserCache:
+    """
+    Bounded TTL + LRU cache of verified JWT -> user principal.
+    Lets get_current_user skip token decoding and the DB lookup on repeat requests.
+    Entries for a user are dropped immediately when the user is updated or deleted;
+    `on_invalidate` forwards that to the other workers (see app.ws.bus).
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_MAX_SIZE, ttl: float = USER_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, User]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.on_invalidate: Optional[Callable[[int], None]] = None
+
+    def get(self, token: str) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: User, token_exp: Optional[float] = None):
+        """Cache a verified user; never longer than the TTL or the token's own expiry"""
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        # Detached copy - the request session that loaded `user` is about to close
+        principal = User.model_validate(user.model_dump())
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (expires_at, principal)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user (role/password change, deletion)"""
+        self.invalidate_local(user_id)
+        if self.on_invalidate is not None:
+            self.on_invalidate(user_id)
+
+    def invalidate_local(self, user_id: int):
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remove(self, token: str):
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.id]
+
+
+user_cache = UserCache()
+
+metrics.counter("user_cache_hits_total", "Requests authenticated from the user cache", function=lambda: user_cache.hits)
+metrics.counter("user_cache_misses_total", "Requests that decoded the token and loaded the user", function=lambda: user_cache.misses)
@@ -1,43 +1,406 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.session import async_engine
+from app.ws.stream import event_stream
+from app.ws.bus import bus
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+WS_QUEUE_SIZE = 256          # messages buffered per client before it counts as "behind"
+WS_MAX_OVERFLOWS = 3         # overflows tolerated (each answered with RESYNC) before eviction
+WS_SEND_TIMEOUT = 10         # seconds a single send may take before the client is evicted
+WS_BATCH_WINDOW = 0.25       # seconds events are collected into one array frame (0 = send one by one)
+RESYNC_MESSAGE = json.dumps({"type": "resync"})  # client missed events and must reload state
+
+WS_EVENTS = metrics.counter("ws_events_total", "Events handed to the websocket fan-out")
+WS_FANOUT_SECONDS = metrics.histogram("ws_fanout_duration_seconds", "Routing and serializing one event or batch")
+WS_MESSAGES = metrics.counter("ws_messages_queued_total", "Frames queued for websocket clients")
+WS_RESYNCS = metrics.counter("ws_resyncs_total", "Clients that fell behind and were told to reload")
+
+# Frames are additionally compressed when the client negotiates permessage-deflate
+# (uvicorn --ws-per-message-deflate, on by default with the websockets backend).
+
+
+def host_event(host, severity: str, message: str) -> dict:
+    """Structured host state event as sent to websocket clients"""
+    return {
+        "type": "host_status",
+        "host_id": host.id,
+        "host_name": host.name,
+        "group_id": host.group_id,
+        "status": host.status,
+        "severity": severity,
+        "message": message,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+class Client:
+    """One connected websocket with its own outbound queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.overflows = 0
+        # Resume: events routed while the replay is read are held here, and events
+        # up to replayed_seq are not sent live again (the replay frame had them)
+        self.held: Optional[list] = None
+        self.replayed_seq = 0
+        # Subscription filters - empty set means "any"
+        self.hosts: set[int] = set()
+        self.groups: set[int] = set()
+        self.severities: set[str] = set()
+
+    def wants_severity(self, severity: str) -> bool:
+        return not self.severities or severity in self.severities
+
+    def matches(self, event: dict) -> bool:
+        if (self.hosts or self.groups) and not (
+            event.get("host_id") in self.hosts or event.get("group_id") in self.groups
+        ):
+            return False
+        return self.wants_severity(event.get("severity"))
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    """
+    Fan-out of alert events to websocket clients.
+    broadcast() only enqueues; each client is drained by its own writer task,
+    so a stalled browser never delays other clients or the caller (ping loop).
+    Clients are indexed by their subscription (host/group/severity), so routing
+    an event only touches the clients interested in it.
+    With a batch window, events are buffered for one tick, repeated events for the
+    same host collapse into the latest one, and each client gets one array frame.
+    Must be called from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = WS_QUEUE_SIZE,
+        max_overflows: int = WS_MAX_OVERFLOWS,
+        batch_window: float = WS_BATCH_WINDOW
+    ):
+        self.queue_size = queue_size
+        self.max_overflows = max_overflows
+        self.batch_window = batch_window
+        self._pending: dict = {}                 # coalescing key -> latest event
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._pending_seq = 0
+        self.clients: dict[WebSocket, Client] = {}
+        self.evicted = 0
+        # Subscription index
+        self._everything: set[Client] = set()                 # no filters
+        self._by_severity: dict[str, set[Client]] = {}       # severity filter only
+        self._by_host: dict[int, set[Client]] = {}           # scoped to hosts...
+        self._by_group: dict[int, set[Client]] = {}          # ...and/or groups
+
+    @property
+    def active_connections(self) -> list[WebSocket]:
+        return list(self.clients)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = Client(websocket, self.queue_size)
+        client.writer = asyncio.create_task(self._writer(client))
+        self.clients[websocket] = client
+        self._index(client)
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self._unindex(client)
+        if client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    def subscribe(self, websocket: WebSocket, hosts=(), groups=(), severities=()):
+        """Replace the client's filters; no filters = receive everything"""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        new_hosts = {int(h) for h in hosts}
+        new_groups = {int(g) for g in groups}
+        new_severities = {str(s).upper() for s in severities}
+        self._unindex(client)
+        client.hosts, client.groups, client.severities = new_hosts, new_groups, new_severities
+        self._index(client)
+        self._enqueue(client, json.dumps({
+            "type": "subscribed",
+            "hosts": sorted(client.hosts),
+            "groups": sorted(client.groups),
+            "severities": sorted(client.severities),
+        }))
+
+    def disconnect_all(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending.clear()
+        for websocket in list(self.clients):
+            self.disconnect(websocket)
+
+    def broadcast(self, event: dict):
+        """Non-blocking: queue the event (serialized once) for every interested client"""
+        WS_EVENTS.inc()
+        if self.batch_window > 0:
+            self._buffer(event)
+            return
+        started = time.perf_counter()
+        targets = self._route(event)
+        if targets:
+            message = json.dumps(event)
+            for client in targets:
+                if self._live(client, event):
+                    self._enqueue(client, message)
+        WS_FANOUT_SECONDS.observe(time.perf_counter() - started)
+
+    def _buffer(self, event: dict):
+        host_id = event.get("host_id")
+        if host_id is not None:
+            key = ("host", host_id)
+            self._pending.pop(key, None)  # newer state replaces the older one (and moves to the end)
+        else:
+            self._pending_seq += 1
+            key = ("event", self._pending_seq)
+        self._pending[key] = event
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self.flush)
+
+    def flush(self):
+        """Send buffered events - one JSON array frame per client"""
+        self._flush_handle = None
+        events, self._pending = list(self._pending.values()), {}
+        if not events:
+            return
+        started = time.perf_counter()
+
+        per_client: dict[Client, list[str]] = {}
+        for event in events:
+            targets = self._route(event)
+            if not targets:
+                continue
+            message = json.dumps(event)
+            for client in targets:
+                if self._live(client, event):
+                    per_client.setdefault(client, []).append(message)
+
+        for client, messages in per_client.items():
+            self._enqueue(client, "[" + ",".join(messages) + "]")
+        WS_FANOUT_SECONDS.observe(time.perf_counter() - started)
+
+    def hold(self, websocket: WebSocket):
+        """Start of a resume: keep the client's live events back until replay() has sent the missed ones"""
+        client = self.clients.get(websocket)
+        if client is not None and client.held is None:
+            client.held = []
+
+    def replay(self, websocket: WebSocket, events: Optional[list]):
+        """
+        Send missed events (filtered by the client's subscription) as one frame, or
+        a resync, then the live events held meanwhile that the replay did not contain.
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        held, client.held = client.held or [], None
+        if events is None:
+            self._enqueue(client, RESYNC_MESSAGE)
+        else:
+            if events:
+                client.replayed_seq = max(client.replayed_seq, events[-1].get("seq", 0))
+            messages = [json.dumps(event) for event in events if client.matches(event)]
+            if messages:
+                self._enqueue(client, "[" + ",".join(messages) + "]")
+        messages = [json.dumps(event) for event in held if self._live(client, event)]
+        if messages:
+            self._enqueue(client, "[" + ",".join(messages) + "]")
+
+    @staticmethod
+    def _live(client: Client, event: dict) -> bool:
+        """Whether a routed event goes out now - not while a replay is prepared, not twice after one"""
+        if client.held is not None:
+            client.held.append(event)
+            return False
+        return event.get("seq", client.replayed_seq + 1) > client.replayed_seq
+
+    def _route(self, event: dict) -> set:
+        severity = event.get("severity")
+        targets = set(self._everything)
+        targets.update(self._by_severity.get(severity, ()))
+        for index, key in ((self._by_host, event.get("host_id")), (self._by_group, event.get("group_id"))):
+            for client in index.get(key, ()):
+                if client.wants_severity(severity):
+                    targets.add(client)
+        return targets
+
+    def _index(self, client: Client):
+        if client.hosts or client.groups:
+            for host_id in client.hosts:
+                self._by_host.setdefault(host_id, set()).add(client)
+            for group_id in client.groups:
+                self._by_group.setdefault(group_id, set()).add(client)
+        elif client.severities:
+            for severity in client.severities:
+                self._by_severity.setdefault(severity, set()).add(client)
+        else:
+            self._everything.add(client)
+
+    def _unindex(self, client: Client):
+        self._everything.discard(client)
+        for index, keys in (
+            (self._by_severity, client.severities),
+            (self._by_host, client.hosts),
+            (self._by_group, client.groups),
+        ):
+            for key in keys:
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(client)
+                    if not subscribers:
+                        del index[key]
+
+    def _enqueue(self, client: Client, message: str):
+        WS_MESSAGES.inc()
+        try:
+            client.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            client.overflows += 1
+
+        if client.overflows > self.max_overflows:
+            logger.warning(f"WS: evicting slow client after {client.overflows} queue overflows")
+            self._evict(client)
+            return
+
+        # Client fell behind - drop its backlog and tell it to reload instead
+        WS_RESYNCS.inc()
+        while not client.queue.empty():
+            client.queue.get_nowait()
+        client.queue.put_nowait(RESYNC_MESSAGE)
+        if not client.queue.full():
+            client.queue.put_nowait(message)
+
+    def _evict(self, client: Client):
+        self.evicted += 1
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    async def _writer(self, client: Client):
+        try:
+            while True:
+                message = await client.queue.get()
+                await asyncio.wait_for(client.websocket.send_text(message), timeout=WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"WS: send timed out after {WS_SEND_TIMEOUT}s, evicting client")
+            self._evict(client)
+        except Exception as e:
+            # Client disconnected or error
+            logger.debug("WS: send failed: %s", e)
+            self.disconnect(client.websocket)
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # "try again later"
+        except Exception:
+            pass
 
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                # Client disconnected or error - mark for removal
-                disconnected.append(connection)
-        
-        # Cleanup dead connections
-        for conn in disconnected:
-            self.disconnect(conn)
 
 manager = ConnectionManager()
 
+metrics.gauge("ws_clients", "Connected websocket clients", function=lambda: len(manager.clients))
+metrics.gauge(
+    "ws_queued_messages", "Frames waiting in client queues",
+    function=lambda: sum(client.queue.qsize() for client in list(manager.clients.values()))
+)
+metrics.counter("ws_evicted_total", "Slow clients disconnected", function=lambda: manager.evicted)
+
+
+def publish(event: dict):
+    """Number the event, keep it for replay and fan it out to subscribers in every worker"""
+    bus.publish_event(event)
+
+
+def _deliver(event: dict):
+    # The hub (or a standalone process) numbers events; other workers get them numbered
+    if "seq" in event:
+        event_stream.remember(event)
+    else:
+        event_stream.record(event)
+    manager.broadcast(event)
+
+
+bus.on_event(_deliver)
+
+
+async def resume(websocket: WebSocket, last_seq: int):
+    # Live events wait until the replay is out - none sent twice or ahead of older ones
+    manager.hold(websocket)
+    events = None
+    try:
+        events = event_stream.since(last_seq)
+        if events is None and last_seq < event_stream.last_seq:
+            # Older than the in-memory buffer - read the gap from the event log
+            async with AsyncSession(async_engine) as session:
+                events = await session.run_sync(lambda sync_session: event_stream.since(last_seq, sync_session))
+    finally:
+        manager.replay(websocket, events)
+
+
 @router.websocket("/ws/alerts")
-async def websocket_alerts(websocket: WebSocket):
+async def websocket_alerts(websocket: WebSocket, last_seq: Optional[int] = Query(None)):
+    """
+    Alert event stream. Clients get every event until they send a filter:
+    {"action": "subscribe", "hosts": [1, 2], "groups": [3], "severities": ["CRITICAL"]}
+    Hosts/groups narrow the scope (an event matches either), severities apply on top.
+    {"action": "unsubscribe"} goes back to receiving everything.
+
+    Every event carries a `seq`. After a reconnect, pass the last one seen as
+    ?last_seq=N (or send {"action": "resume", "last_seq": N} after subscribing)
+    to receive only the missed events; apply events in seq order.
+    """
     await manager.connect(websocket)
     try:
+        if last_seq is not None:
+            await resume(websocket, last_seq)
         while True:
             #we keep connection live
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                request = json.loads(text)
+            except ValueError:
+                continue  # keepalive / plain text
+            if not isinstance(request, dict):
+                continue
+            try:
+                if request.get("action") == "subscribe":
+                    manager.subscribe(
+                        websocket,
+                        hosts=request.get("hosts") or (),
+                        groups=request.get("groups") or (),
+                        severities=request.get("severities") or ()
+                    )
+                elif request.get("action") == "unsubscribe":
+                    manager.subscribe(websocket)
+                elif request.get("action") == "resume":
+                    await resume(websocket, int(request.get("last_seq", 0)))
+            except (TypeError, ValueError) as e:
+                logger.debug(f"WS: invalid subscription {request}: {e}")
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
-
-
-
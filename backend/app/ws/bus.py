@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows - no unix sockets, every worker runs standalone
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BUS_DIR = Path(__file__).resolve().parents[2] / "data"
+BUS_SOCKET = BUS_DIR / "event-bus.sock"
+BUS_LOCK = BUS_DIR / "event-bus.lock"
+BUS_RECONNECT_DELAY = 1          # seconds between attempts to reach / replace the hub
+BUS_HELLO_TIMEOUT = 5            # seconds to wait for the hub to greet a new connection
+BUS_MAX_BUFFER = 8 * 1024 * 1024  # bytes queued for one peer before it is dropped
+
+
+class EventBus:
+    """
+    Event bus between uvicorn workers over a Unix domain socket (no external broker).
+
+    The worker holding BUS_LOCK is the hub: it runs the background services
+    (ping loop, MQTT), numbers stream events and relays every message to the
+    other workers. Followers connect to the hub; if it dies, the next worker to
+    get the lock takes over. Messages are newline-delimited JSON:
+      {"kind": "event", "data": {...}}   - sequenced websocket event, delivered to every worker
+      {"kind": "<other>", "data": {...}} - notification for the *other* workers (cache invalidation)
+    The hub greets each follower with {"kind": "hello"}; a connection that is never
+    greeted (left in the backlog of a hub that is going away) is dropped and retried.
+
+    Without start() (tests, Windows) everything is delivered in-process.
+    """
+
+    def __init__(self, socket_path: Path = BUS_SOCKET, lock_path: Path = BUS_LOCK):
+        self.socket_path = socket_path
+        self.lock_path = lock_path
+        self.is_hub = False
+        self.started = False
+        self._handlers: Dict[str, Callable[[dict], None]] = {}
+        self._event_handler: Optional[Callable[[dict], None]] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._hub_writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._lock_fd: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_leader: Optional[Callable] = None
+
+    # ===== REGISTRATION =====
+
+    def on_event(self, handler: Callable[[dict], None]):
+        """Handler for stream events; called in every worker (hub first)"""
+        self._event_handler = handler
+
+    def on(self, kind: str, handler: Callable[[dict], None]):
+        """Handler for notifications of `kind` sent by other workers"""
+        self._handlers[kind] = handler
+
+    # ===== PUBLISHING =====
+
+    def publish_event(self, event: dict):
+        """Send a stream event to every worker - via the hub, which numbers it"""
+        if not self.started or self.is_hub:
+            self._deliver_event(event)
+            if self.started:
+                self._relay(self._encode("event", event))
+            return
+        self._send_to_hub(self._encode("event", event))
+
+    def notify(self, kind: str, data: dict):
+        """Tell the other workers about a local change. Thread-safe."""
+        if not self.started:
+            return
+        line = self._encode(kind, data)
+        if self._loop is not None and self._in_loop_thread():
+            self._notify_line(line)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._notify_line, line)
+
+    def _notify_line(self, line: bytes):
+        if self.is_hub:
+            self._relay(line)
+        else:
+            self._send_to_hub(line)
+
+    # ===== LIFECYCLE =====
+
+    async def start(self, on_leader: Optional[Callable] = None):
+        """Join the bus; `on_leader` is awaited in the worker that becomes (or later takes over as) hub"""
+        self._on_leader = on_leader
+        if fcntl is None or not hasattr(asyncio, "start_unix_server"):
+            logger.info("Event bus: unix sockets unavailable, running standalone")
+            if on_leader:
+                await on_leader()
+            return
+        self._loop = asyncio.get_running_loop()
+        self.started = True
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if not await self._try_become_hub():
+            await self._connect_to_hub()
+        if not self.is_hub:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        self.is_hub = False  # peers still being accepted are closed by _handle_peer
+        for task in (self._task, self._reader_task):
+            if task:
+                task.cancel()
+        for writer in list(self._peers):
+            writer.close()
+        self._peers.clear()
+        if self._hub_writer:
+            self._hub_writer.close()
+        if self._server:
+            self._server.close()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the flock
+            self._lock_fd = None
+        self.started = False
+
+    async def _try_become_hub(self) -> bool:
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        # Lock held - any socket file left over is from a dead hub
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=str(self.socket_path))
+        self.is_hub = True
+        self._hub_writer = None
+        logger.info(f"Event bus: hub in pid {os.getpid()}")
+        if self._on_leader:
+            await self._on_leader()
+        return True
+
+    async def _connect_to_hub(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(str(self.socket_path))
+            except (FileNotFoundError, ConnectionRefusedError):
+                if await self._try_become_hub():
+                    return
+                await asyncio.sleep(BUS_RECONNECT_DELAY)
+                continue
+            try:
+                hello = await asyncio.wait_for(reader.readline(), BUS_HELLO_TIMEOUT)
+            except (ConnectionError, asyncio.TimeoutError):
+                hello = b""
+            if self._decode(hello)[0] != "hello":
+                writer.close()
+                continue
+            self._hub_writer = writer
+            logger.info(f"Event bus: pid {os.getpid()} joined hub")
+            self._reader_task = asyncio.create_task(self._read_from_hub(reader))
+            return
+
+    async def _watch(self):
+        """Followers: when the hub goes away, take over or reconnect"""
+        while not self.is_hub:
+            await asyncio.wait({self._reader_task})
+            logger.warning("Event bus: lost hub connection")
+            self._hub_writer = None
+            await self._connect_to_hub()  # becomes hub if nobody else holds the lock
+
+    # ===== HUB SIDE =====
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if not self.is_hub:
+            writer.close()
+            return
+        self._peers.add(writer)
+        writer.write(self._encode("hello", {"pid": os.getpid()}))
+        try:
+            while line := await reader.readline():
+                kind, data = self._decode(line)
+                if kind is None:
+                    continue
+                if kind == "event":
+                    self._deliver_event(data)            # numbers it (hub)
+                    self._relay(self._encode("event", data))
+                else:
+                    self._deliver(kind, data)
+                    self._relay(line, exclude=writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    def _relay(self, line: bytes, exclude: Optional[asyncio.StreamWriter] = None):
+        for writer in list(self._peers):
+            if writer is exclude:
+                continue
+            if writer.transport.get_write_buffer_size() > BUS_MAX_BUFFER:
+                logger.warning("Event bus: dropping peer that stopped reading")
+                self._peers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    # ===== FOLLOWER SIDE =====
+
+    async def _read_from_hub(self, reader: asyncio.StreamReader):
+        try:
+            while line := await reader.readline():
+                kind, data = self._decode(line)
+                if kind == "event":
+                    self._deliver_event(data)
+                elif kind is not None:
+                    self._deliver(kind, data)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+    def _send_to_hub(self, line: bytes):
+        if self._hub_writer is None or self._hub_writer.is_closing():
+            logger.warning("Event bus: hub unavailable, message dropped")
+            return
+        self._hub_writer.write(line)
+
+    # ===== HELPERS =====
+
+    def _deliver_event(self, event: dict):
+        if self._event_handler:
+            try:
+                self._event_handler(event)
+            except Exception as e:
+                logger.error(f"Event bus: event handler failed: {e}")
+
+    def _deliver(self, kind: str, data: dict):
+        handler = self._handlers.get(kind)
+        if handler is None:
+            return
+        try:
+            handler(data)
+        except Exception as e:
+            logger.error(f"Event bus: handler for {kind} failed: {e}")
+
+    def _in_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _encode(kind: str, data: dict) -> bytes:
+        return json.dumps({"kind": kind, "data": data}, default=str).encode() + b"\n"
+
+    @staticmethod
+    def _decode(line: bytes):
+        if not line:
+            return None, None
+        try:
+            message = json.loads(line)
+            return message["kind"], message["data"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Event bus: malformed message ignored")
+            return None, None
+
+
+bus = EventBus()
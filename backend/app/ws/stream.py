@@ -0,0 +1,109 @@
+import json
+import logging
+import threading
+from collections import deque
+from typing import List, Optional
+
+from sqlmodel import Session, delete, select, func
+
+from app.db.models import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUFFER_SIZE = 1_000    # recent events kept in memory for replay
+MAX_REPLAY = 10_000          # gaps up to this size are replayed (older part from the DB), larger ones get a resync
+
+
+class EventStream:
+    """
+    Numbers every websocket event with a monotonically increasing `seq`, keeps the
+    latest ones in a ring buffer and logs all of them to the DB (StreamEvent).
+    A reconnecting client sends its last seq and gets only the events it missed -
+    from memory, or from the DB for older gaps.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE, max_replay: int = MAX_REPLAY):
+        self.max_replay = max_replay
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._unsaved: List[dict] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def load(self, session: Session):
+        """Continue numbering after the last logged event and warm the buffer (startup)"""
+        self._seq = session.exec(select(func.max(StreamEvent.seq))).one() or 0
+        recent = session.exec(
+            select(StreamEvent).order_by(StreamEvent.seq.desc()).limit(self._buffer.maxlen)
+        ).all()
+        self._buffer.clear()
+        self._buffer.extend(json.loads(row.payload) for row in reversed(recent))
+        logger.info(f"Event stream resumed at seq {self._seq} ({len(self._buffer)} events buffered)")
+
+    def record(self, event: dict) -> dict:
+        """Stamp the next seq on the event and buffer it"""
+        with self._lock:
+            self._seq += 1
+            event["seq"] = self._seq
+            self._buffer.append(event)
+            self._unsaved.append(event)
+        return event
+
+    def remember(self, event: dict):
+        """Buffer an event numbered by another worker (the bus hub)"""
+        with self._lock:
+            self._seq = max(self._seq, event["seq"])
+            self._buffer.append(event)
+
+    def save(self, session: Session) -> int:
+        """Add not yet logged events to the caller's transaction and prune the ones replay can no longer reach"""
+        with self._lock:
+            events, self._unsaved = self._unsaved, []
+        for event in events:
+            session.add(StreamEvent(
+                seq=event["seq"],
+                type=event.get("type", "event"),
+                host_id=event.get("host_id"),
+                payload=json.dumps(event)
+            ))
+        if events:
+            # A gap larger than max_replay gets a resync - older rows are never read again
+            session.exec(delete(StreamEvent).where(StreamEvent.seq <= events[-1]["seq"] - self.max_replay))
+        return len(events)
+
+    def since(self, last_seq: int, session: Optional[Session] = None) -> Optional[List[dict]]:
+        """
+        Events after last_seq in order, or None when the client must resync
+        (gap too large, or older than the buffer and no session given).
+        """
+        with self._lock:
+            missed = self._seq - last_seq
+            if missed <= 0:
+                return [] if missed == 0 else None  # client ahead of us: server lost state
+            if missed > self.max_replay:
+                return None
+            if self._buffer and self._buffer[0]["seq"] <= last_seq + 1:
+                events = []
+                for event in reversed(self._buffer):
+                    if event["seq"] <= last_seq:
+                        break
+                    events.append(event)
+                events.reverse()
+                return events
+            oldest_buffered = self._buffer[0]["seq"] if self._buffer else self._seq + 1
+            buffered = list(self._buffer)
+
+        if session is None:
+            return None
+        rows = session.exec(
+            select(StreamEvent)
+            .where(StreamEvent.seq > last_seq, StreamEvent.seq < oldest_buffered)
+            .order_by(StreamEvent.seq)
+        ).all()
+        return [json.loads(row.payload) for row in rows] + buffered
+
+
+event_stream = EventStream()
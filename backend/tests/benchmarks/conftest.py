@@ -0,0 +1,200 @@
+# Fixtures for the API benchmarks (skipped unless BENCH=1):
+# 1. bench_db - database seeded by seed.py (temporary, or BENCH_DB to keep and reuse it)
+# 2. bench_server - uvicorn serving the app on that database
+# 3. bench_tokens - Authorization headers per role
+# 4. bench_baseline - results of a run of the base commit on this machine (BENCH_BASELINE), if given
+# 5. bench_results - collected results, written as JSON at the end
+# 6. bench_run - runs the load for one endpoint, records it, returns (result, regressions against the baseline)
+# 7. bench_record - records an in-process measurement (per-call cost of a hot path), returns its regressions
+#
+# Absolute numbers depend on the machine, so there is no committed baseline: the gate compares
+# the head commit with the base commit measured on the same machine right before it.
+
+import asyncio
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import pytest
+
+from .load import run_load
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parents[1]
+
+BENCH_SCALE = os.getenv("BENCH_SCALE", "small")
+BENCH_DB = os.getenv("BENCH_DB")                                        # seeded file to reuse (seeded first if missing)
+BENCH_CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", 8))
+BENCH_DURATION = float(os.getenv("BENCH_DURATION", 5))                  # seconds of load per endpoint
+BENCH_TIMEOUT = float(os.getenv("BENCH_TIMEOUT", 120))                  # per request
+BENCH_RESULTS = Path(os.getenv("BENCH_RESULTS", "bench-results.json"))
+BENCH_BASELINE = os.getenv("BENCH_BASELINE")                            # BENCH_RESULTS file of the base commit, same machine
+BENCH_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", 0.3))              # 0.3: fail above 1.3x base p99 / below base/1.3 throughput
+
+# Seeded users per role (see seed.py: id 1 is admin, then roles rotate)
+BENCH_USERS = {
+    "ADMIN": (1, "admin"),
+    "USER": (4, "user-00004"),
+    "VIEWER": (2, "user-00002"),
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def bench_db(tmp_path_factory) -> Path:
+    path = Path(BENCH_DB) if BENCH_DB else tmp_path_factory.mktemp("bench") / f"{BENCH_SCALE}.db"
+    if not path.exists():
+        subprocess.run(
+            [sys.executable, str(BENCH_DIR / "seed.py"), "--scale", BENCH_SCALE],
+            env={**os.environ, "DB_PATH": str(path)}, cwd=BACKEND_DIR, check=True
+        )
+    return path
+
+
+@pytest.fixture(scope="session")
+def bench_server(bench_db):
+    """The app on the seeded DB, without the startup hooks - no ping loop, MQTT or archive job adding load"""
+    port = _free_port()
+    env = {**os.environ, "DB_PATH": str(bench_db), "LOG_LEVEL": "WARNING"}
+    env.pop("DB_LOOP_CHECK", None)  # production behaviour, not the test-suite check
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--lifespan", "off", "--no-access-log", "--log-level", "warning"],
+        env=env, cwd=BACKEND_DIR
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            httpx.get(f"{base_url}/", timeout=1)
+            break
+        except httpx.HTTPError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("benchmark server did not start")
+            time.sleep(0.1)
+    yield base_url
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+@pytest.fixture(scope="session")
+def bench_tokens() -> Dict[str, Dict[str, str]]:
+    from app.utils.jwt_utils import create_access_token
+
+    return {
+        role: {"Authorization": f"Bearer {create_access_token({'sub': username, 'user_id': user_id, 'role': role})}"}
+        for role, (user_id, username) in BENCH_USERS.items()
+    }
+
+
+def _machine() -> dict:
+    return {"host": platform.node(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+@pytest.fixture(scope="session")
+def bench_baseline() -> Dict[str, dict]:
+    """Per-endpoint results of the base run; refused unless it is the same scale on the same machine"""
+    if not BENCH_BASELINE:
+        return {}
+    base = json.loads(Path(BENCH_BASELINE).read_text())
+    if base.get("machine") != _machine() or base.get("scale") != BENCH_SCALE:
+        raise pytest.UsageError(
+            f"{BENCH_BASELINE} was measured at scale {base.get('scale')} on {base.get('machine')} - "
+            f"run the base commit at scale {BENCH_SCALE} on this machine ({_machine()})"
+        )
+    return base["results"]
+
+
+@pytest.fixture(scope="session")
+def bench_results():
+    results: Dict[str, dict] = {}
+    yield results
+    report = {
+        "scale": BENCH_SCALE,
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": _machine(),
+        "concurrency": BENCH_CONCURRENCY,
+        "duration": BENCH_DURATION,
+        "tolerance": BENCH_TOLERANCE,
+        "baseline": BENCH_BASELINE,
+        "results": results,
+    }
+    BENCH_RESULTS.write_text(json.dumps(report, indent=2))
+
+
+@pytest.fixture
+def bench_run(bench_server, bench_tokens, bench_baseline, bench_results):
+    def run(name: str, method: str, path: str, role: str = None, json: dict = None):
+        result = asyncio.run(run_load(
+            bench_server, method, path, BENCH_CONCURRENCY, BENCH_DURATION,
+            headers=bench_tokens[role] if role else None, json=json, timeout=BENCH_TIMEOUT
+        ))
+        problems = regressions(result, bench_baseline.get(name))
+        bench_results[name] = {**result, "regressions": problems}
+        return result, problems
+    return run
+
+
+@pytest.fixture
+def bench_record(bench_baseline, bench_results):
+    def record(name: str, result: dict):
+        problems = per_call_regressions(result, bench_baseline.get(name))
+        bench_results[name] = {**result, "regressions": problems}
+        return problems
+    return record
+
+
+def per_call_regressions(result: dict, baseline: dict) -> List[str]:
+    """Per-call cost (us) above what the base run allows; empty when there is no base run"""
+    if not baseline:
+        return []
+    limit = baseline["per_call_us"] * (1 + BENCH_TOLERANCE)
+    if result["per_call_us"] > limit:
+        return [f"{result['per_call_us']} us per call > {limit:.1f} us (base {baseline['per_call_us']} us)"]
+    return []
+
+
+def regressions(result: dict, baseline: dict) -> List[str]:
+    """What got worse than the base run allows; empty when there is no base run"""
+    problems = []
+    if not baseline:
+        return problems
+    p99_limit = baseline["p99_ms"] * (1 + BENCH_TOLERANCE)
+    if result["p99_ms"] > p99_limit:
+        problems.append(f"p99 {result['p99_ms']} ms > {p99_limit:.1f} ms (base {baseline['p99_ms']} ms)")
+    throughput_floor = baseline["throughput_rps"] / (1 + BENCH_TOLERANCE)
+    if result["throughput_rps"] < throughput_floor:
+        problems.append(
+            f"throughput {result['throughput_rps']} rps < {throughput_floor:.1f} rps "
+            f"(base {baseline['throughput_rps']} rps)"
+        )
+    return problems
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,76 @@
+"""Closed-loop HTTP load generator: N concurrent clients send requests back to back for a fixed time"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def run_load(
+    base_url: str,
+    method: str,
+    path: str,
+    concurrency: int,
+    duration: float,
+    headers: Optional[Dict[str, str]] = None,
+    json: Optional[dict] = None,
+    warmup: int = 1,
+    timeout: float = 60
+) -> dict:
+    """Throughput and latency percentiles (ms) of one endpoint; non-2xx answers count as errors"""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+    response_bytes = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=limits) as client:
+        for _ in range(warmup):  # lazy pools, caches, first-query plans
+            try:
+                await client.request(method, path, json=json)
+            except httpx.HTTPError:
+                errors += 1
+
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors, response_bytes
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=json)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                response_bytes += len(response.content)
+                if not response.is_success:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "avg_response_bytes": response_bytes // len(latencies) if latencies else 0,
+    }
@@ -0,0 +1,128 @@
+"""
+Seed a benchmark database with realistic volumes.
+
+Run with DB_PATH pointing at the target file (the benchmark conftest does this):
+    DB_PATH=/tmp/bench.db python tests/benchmarks/seed.py --scale small
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+backend_path = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(backend_path))
+
+SCALES = {
+    # scale: hosts, groups, users, alerts
+    "small": {"hosts": 2_000, "groups": 20, "users": 20, "alerts": 50_000},        # CI regression gate
+    "medium": {"hosts": 20_000, "groups": 200, "users": 200, "alerts": 1_000_000},
+    "full": {"hosts": 100_000, "groups": 1_000, "users": 1_000, "alerts": 10_000_000},
+}
+BENCH_PASSWORD = "bench-password"
+SEED = 42
+CHUNK = 50_000            # rows per executemany
+ALERT_HISTORY_DAYS = 90
+
+SEVERITIES = ("CRITICAL", "WARNING", "INFO")
+MESSAGES = {
+    "CRITICAL": ("Host is DOWN",),
+    "WARNING": ("Packet loss above threshold", "High latency"),
+    "INFO": ("Host is UP", "Host recovered (UP)"),
+}
+ROLES = ("ADMIN", "USER", "VIEWER")
+
+
+def _ts(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")  # the format SQLAlchemy stores in SQLite
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            conn.executemany(sql, chunk)
+            chunk.clear()
+    if chunk:
+        conn.executemany(sql, chunk)
+
+
+def seed(scale: str, db_path: Path):
+    # Imported here: app.db.session reads DB_PATH at import time
+    from sqlmodel import SQLModel
+    from app.db.session import create_db_and_tables
+    from app.utils.jwt_utils import hash_password
+
+    counts = SCALES[scale]
+    rng = random.Random(SEED)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    create_db_and_tables()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    # Filling the alert indexes row by row is the slowest part - build them once at the end
+    alert_indexes = [index.name for index in SQLModel.metadata.tables["alert"].indexes]
+    for name in alert_indexes:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+    hashed = hash_password(BENCH_PASSWORD)  # one bcrypt hash shared by every user
+    _insert(
+        conn,
+        "INSERT INTO user (id, username, email, hashed_password, is_active, role, created_at) VALUES (?, ?, ?, ?, 1, ?, ?)",
+        (
+            (i, "admin" if i == 1 else f"user-{i:05d}", f"user-{i:05d}@bench.local", hashed,
+             "ADMIN" if i == 1 else ROLES[i % len(ROLES)], _ts(now))
+            for i in range(1, counts["users"] + 1)
+        )
+    )
+    _insert(
+        conn,
+        "INSERT INTO hostgroup (id, name, description, created_at) VALUES (?, ?, ?, ?)",
+        ((i, f"group-{i:04d}", f"Benchmark group {i}", _ts(now)) for i in range(1, counts["groups"] + 1))
+    )
+    _insert(
+        conn,
+        "INSERT INTO host (id, name, ip, status, last_seen, group_id, version) VALUES (?, ?, ?, ?, ?, ?, 0)",
+        (
+            (i, f"host-{i:06d}", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+             rng.choices(("UP", "DOWN", "unknown"), (90, 8, 2))[0],
+             _ts(now - timedelta(seconds=rng.randrange(600))),
+             rng.randint(1, counts["groups"]) if rng.random() < 0.9 else None)
+            for i in range(1, counts["hosts"] + 1)
+        )
+    )
+    history = ALERT_HISTORY_DAYS * 86400
+
+    def alerts():
+        for i in range(1, counts["alerts"] + 1):
+            severity = rng.choices(SEVERITIES, (3, 2, 5))[0]
+            yield (
+                i, rng.randint(1, counts["hosts"]), severity, rng.choice(MESSAGES[severity]),
+                _ts(now - timedelta(seconds=history * (1 - i / counts["alerts"])))  # ids follow time
+            )
+
+    _insert(conn, "INSERT INTO alert (id, host_id, severity, message, timestamp, version) VALUES (?, ?, ?, ?, ?, 0)", alerts())
+    conn.commit()
+    conn.close()
+
+    create_db_and_tables()  # rebuilds the dropped indexes, gives the rows sync versions
+    print(f"Seeded {scale} ({counts}) into {db_path} in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    args = parser.parse_args()
+    db_path = os.getenv("DB_PATH")
+    if not db_path:
+        parser.error("set DB_PATH to the database file to seed")
+    seed(args.scale, Path(db_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Latency and throughput of the main read endpoints and login on a seeded database.
+
+    BENCH=1 python -m pytest tests/benchmarks -q                   # small scale, numbers only
+    BENCH=1 BENCH_SCALE=full BENCH_DB=/tmp/full.db python -m pytest tests/benchmarks -q
+
+Regression gate - base and head on the same machine, one after the other:
+
+    git checkout main && BENCH=1 BENCH_RESULTS=/tmp/base.json python -m pytest tests/benchmarks -q
+    git checkout - && BENCH=1 BENCH_BASELINE=/tmp/base.json python -m pytest tests/benchmarks -q
+"""
+import os
+
+import pytest
+
+from .seed import BENCH_PASSWORD
+
+pytestmark = pytest.mark.skipif(os.getenv("BENCH") != "1", reason="benchmarks run with BENCH=1")
+
+CASES = [
+    # name, method, path, role, body
+    ("hosts_list", "GET", "/hosts/", None, None),
+    ("hosts_search", "GET", "/hosts/search?name=host-0001&status=UP", None, None),
+    ("alerts_list", "GET", "/alerts/", "VIEWER", None),
+    ("hostgroups_list", "GET", "/hostgroups/", "VIEWER", None),
+    ("auth_login", "POST", "/auth/login", None, {"username": "user-00004", "password": BENCH_PASSWORD}),
+]
+
+
+@pytest.mark.parametrize("name, method, path, role, body", CASES, ids=[case[0] for case in CASES])
+def test_endpoint(bench_run, name, method, path, role, body):
+    result, problems = bench_run(name, method, path, role=role, json=body)
+    print(
+        f"\n{name}: {result['throughput_rps']} rps, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms "
+        f"({result['requests']} requests, {result['avg_response_bytes']} bytes)"
+    )
+    assert result["errors"] == 0, f"{result['errors']} failed requests: {result['statuses']}"
+    assert not problems, "; ".join(problems)
@@ -0,0 +1,174 @@
+"""
+Cost of the observability code on the hot paths, measured in-process (no server or seeded DB):
+the metrics middleware per request, a running sampling profiler on busy code and a log call
+through the queue handler. Each is measured next to the same work without it.
+
+    BENCH=1 python -m pytest tests/benchmarks/test_overhead_benchmarks.py -q -s
+
+The overhead budgets are ratios to that reference, so they hold on any machine; per-call
+times are also gated against BENCH_BASELINE like the endpoint benchmarks.
+"""
+import asyncio
+import hashlib
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.utils.logging_config import LOG_QUEUE_SIZE, NonBlockingQueueHandler, _Listener
+from app.utils.metrics import MetricsMiddleware
+from app.utils.profiler import profiler
+
+from .conftest import BENCH_TOLERANCE
+from .load import percentile
+
+pytestmark = pytest.mark.skipif(os.getenv("BENCH") != "1", reason="benchmarks run with BENCH=1")
+
+ROUNDS = 5
+REQUESTS = 2000   # per round
+LOG_CALLS = 5000  # stays below LOG_QUEUE_SIZE, so nothing is dropped
+
+
+def _app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def _request_us(app: FastAPI) -> float:
+    """Microseconds per sequential request through the ASGI stack"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/items/0")  # route compilation, threadpool start
+        started = time.perf_counter()
+        for i in range(REQUESTS):
+            await client.get(f"/items/{i}")
+        return (time.perf_counter() - started) / REQUESTS * 1e6
+
+
+def _busy(rounds: int = 200) -> bytes:
+    digest = b""
+    for i in range(rounds):
+        digest = hashlib.sha256(digest + str(i).encode()).digest()
+    return digest
+
+
+def _busy_us(calls: int = 2000) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        _busy()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers[:] = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def _log_latencies_us(logger: logging.Logger) -> list:
+    latencies = []
+    for i in range(LOG_CALLS):
+        started = time.perf_counter()
+        logger.info("Host %s is %s", i, "UP")
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    return latencies
+
+
+def _report(name: str, result: dict):
+    print(f"\n{name}: " + ", ".join(f"{key} {value}" for key, value in result.items()))
+
+
+class TestMetricsOverhead():
+    def test_middleware_per_request(self, bench_record):
+        plain, instrumented = _app(False), _app(True)
+        # Alternate the two so machine drift hits both; best round of each
+        rounds = [(asyncio.run(_request_us(plain)), asyncio.run(_request_us(instrumented))) for _ in range(ROUNDS)]
+        plain_us = min(plain for plain, _ in rounds)
+        instrumented_us = min(instrumented for _, instrumented in rounds)
+        result = {
+            "per_call_us": round(instrumented_us, 2),
+            "reference_us": round(plain_us, 2),
+            "overhead_us": round(instrumented_us - plain_us, 2),
+        }
+        _report("metrics_middleware", result)
+        problems = bench_record("metrics_middleware", result)
+        assert instrumented_us <= plain_us * (1 + BENCH_TOLERANCE), "metrics middleware costs more than the budget"
+        assert not problems, "; ".join(problems)
+
+
+class TestProfilerOverhead():
+    def test_busy_code_while_sampling(self, bench_record):
+        idle_us = min(_busy_us() for _ in range(ROUNDS))
+        seconds = idle_us * 2000 * ROUNDS / 1e6 * 2 + 1  # outlasts the measurement below
+        sampler = threading.Thread(target=profiler.profile, args=(seconds,), daemon=True)
+        sampler.start()
+        try:
+            sampled_us = min(_busy_us() for _ in range(ROUNDS))
+        finally:
+            sampler.join()
+        result = {
+            "per_call_us": round(sampled_us, 2),
+            "reference_us": round(idle_us, 2),
+            "overhead_us": round(sampled_us - idle_us, 2),
+        }
+        _report("profiler_sampling", result)
+        problems = bench_record("profiler_sampling", result)
+        assert sampled_us <= idle_us * (1 + BENCH_TOLERANCE), "a running profile slows the sampled code beyond the budget"
+        assert not problems, "; ".join(problems)
+
+
+class TestLoggingOverhead():
+    def test_info_record_through_the_queue(self, bench_record, tmp_path):
+        formatter = logging.Formatter("[%(asctime)s] %(levelname)-8s [%(name)s:%(lineno)d] %(message)s")
+        direct = logging.handlers.RotatingFileHandler(tmp_path / "direct.log", maxBytes=10 * 1024 * 1024, backupCount=1)
+        direct.setFormatter(formatter)
+        queued = logging.handlers.RotatingFileHandler(tmp_path / "queued.log", maxBytes=10 * 1024 * 1024, backupCount=1)
+        queued.setFormatter(formatter)
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        listener = _Listener(log_queue, queued)
+        listener.start()
+        try:
+            direct_us = _log_latencies_us(_logger("direct", direct))
+            queued_us = _log_latencies_us(_logger("queued", NonBlockingQueueHandler(log_queue)))
+        finally:
+            listener.stop()
+            direct.close()
+            queued.close()
+        result = {
+            "per_call_us": round(percentile(queued_us, 0.5), 2),
+            "p99_us": round(percentile(queued_us, 0.99), 2),
+            "reference_us": round(percentile(direct_us, 0.5), 2),
+            "reference_p99_us": round(percentile(direct_us, 0.99), 2),
+        }
+        _report("log_info_queued", result)
+        problems = bench_record("log_info_queued", result)
+        assert result["per_call_us"] <= result["reference_us"] * (1 + BENCH_TOLERANCE), \
+            "a queued log call costs more than a synchronous file write"
+        assert not problems, "; ".join(problems)
+
+    def test_suppressed_debug_call(self, bench_record):
+        logger = _logger("suppressed", NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE)))
+        started = time.perf_counter()
+        for i in range(LOG_CALLS):
+            logger.debug("probe %s took %.1f ms", i, 0.5)
+        per_call_us = (time.perf_counter() - started) / LOG_CALLS * 1e6
+        result = {"per_call_us": round(per_call_us, 3)}
+        _report("log_debug_suppressed", result)
+        problems = bench_record("log_debug_suppressed", result)
+        assert not problems, "; ".join(problems)
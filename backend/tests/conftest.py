@@ -4,9 +4,13 @@
 # 4. Fixtures dla JWT tokenów
 # 5. Fixtures dla HTTP headers z tokenami
 
+import os
 import sys
 from pathlib import Path
 
 # Dodaj backend do ścieżki Pythona
 backend_path = Path(__file__).parent.parent
-sys.path.insert(0, str(backend_path))
\ No newline at end of file
+sys.path.insert(0, str(backend_path))
+
+# Sync DB calls on the event loop fail the test instead of only logging a warning
+os.environ.setdefault("DB_LOOP_CHECK", "raise")
@@ -0,0 +1,31 @@
+# Shared fixtures for the unit tests:
+# 1. engine - in-memory DB with all tables, one connection shared by every session and thread (StaticPool),
+#    same transaction handling as the app's writer engine (explicit BEGIN, SAVEPOINT support)
+# 2. session - a session on that engine; modules that need rows override it as `def session(session)`
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
@@ -0,0 +1,91 @@
+"""Unit tests for alert retention and the archive files"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.db.models import Alert, Host, Tombstone
+from app.services.alert_archive import AlertArchive
+
+NOW = datetime(2026, 3, 15, 12, 0)
+
+
+@pytest.fixture
+def session(session):
+    session.add(Host(id=1, name="router", ip="10.0.0.1"))
+    session.commit()
+    return session
+
+
+def alert(alert_id, severity, age_days):
+    return Alert(id=alert_id, host_id=1, severity=severity, message="m", timestamp=NOW - timedelta(days=age_days))
+
+
+def record(alert_id, timestamp, host_id=1, severity="INFO"):
+    return {"id": alert_id, "host_id": host_id, "host_name": "router", "severity": severity,
+            "message": "m", "timestamp": timestamp}
+
+
+class TestRetention():
+    def test_retention_depends_on_severity(self, session):
+        archive = AlertArchive(retention={"INFO": 30, "CRITICAL": 365}, default_retention=90)
+        session.add_all([
+            alert(1, "INFO", 31),        # expired
+            alert(2, "INFO", 29),
+            alert(3, "CRITICAL", 100),
+            alert(4, "CRITICAL", 400),   # expired
+            alert(5, "WARNING", 91),     # expired (default retention)
+        ])
+        session.commit()
+
+        rows = session.exec(archive.expired(NOW)).all()
+
+        assert [(a.id, host_name) for a, host_name in rows] == [(1, "router"), (4, "router"), (5, "router")]
+
+    def test_expired_is_limited_to_one_chunk(self, session):
+        archive = AlertArchive(retention={"INFO": 1}, chunk_size=2)
+        session.add_all([alert(i, "INFO", 10) for i in range(1, 6)])
+        session.commit()
+
+        assert [a.id for a, _ in session.exec(archive.expired(NOW)).all()] == [1, 2]
+
+    def test_removed_alerts_leave_tombstones(self, session):
+        session.add_all([alert(1, "INFO", 31), alert(2, "INFO", 31), alert(3, "INFO", 1)])
+        session.commit()
+        newest = session.get(Alert, 3).version
+
+        AlertArchive.remove(session, [1, 2])
+        session.commit()
+
+        assert [a.id for a in session.exec(select(Alert)).all()] == [3]
+        tombstones = session.exec(select(Tombstone).order_by(Tombstone.version)).all()
+        assert [(t.entity, t.entity_id) for t in tombstones] == [("alert", 1), ("alert", 2)]
+        assert newest < tombstones[0].version < tombstones[1].version
+
+
+class TestArchiveFiles():
+    def test_records_go_to_month_files(self, tmp_path):
+        archive = AlertArchive(directory=tmp_path)
+
+        archive.write([record(1, "2026-01-31T23:00:00"), record(2, "2026-02-01T01:00:00")])
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["alerts-2026-01.jsonl.gz", "alerts-2026-02.jsonl.gz"]
+
+    def test_query_filters_and_orders_newest_first(self, tmp_path):
+        archive = AlertArchive(directory=tmp_path)
+        archive.write([record(1, "2026-01-10T00:00:00"), record(2, "2026-01-20T00:00:00", host_id=2)])
+        archive.write([record(3, "2026-02-05T00:00:00", severity="CRITICAL")])  # appended member
+
+        assert [r["id"] for r in archive.query()] == [3, 2, 1]
+        assert [r["id"] for r in archive.query(host_id=2)] == [2]
+        assert [r["id"] for r in archive.query(severity="CRITICAL")] == [3]
+        assert [r["id"] for r in archive.query(start=datetime(2026, 1, 15), end=datetime(2026, 2, 1))] == [2]
+        assert [r["id"] for r in archive.query(limit=1)] == [3]
+
+    def test_duplicates_from_interrupted_runs_are_dropped(self, tmp_path):
+        """A chunk written but not deleted before a crash is archived again on the next run"""
+        archive = AlertArchive(directory=tmp_path)
+        archive.write([record(1, "2026-01-10T00:00:00")])
+        archive.write([record(1, "2026-01-10T00:00:00")])
+
+        assert len(archive.query()) == 1
@@ -0,0 +1,69 @@
+"""Unit tests for the async DB path and the blocking-call check"""
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import session as db_session
+from app.db.models import Host
+from app.db.session import BlockingDBCallError, install_loop_check
+
+
+@pytest.fixture
+def sync_engine():
+    engine = create_engine("sqlite://")
+    install_loop_check(engine)
+    return engine
+
+
+def query(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT 1")).scalar()
+
+
+@pytest.mark.asyncio
+class TestLoopCheck():
+    async def test_sync_query_on_event_loop_is_rejected(self, sync_engine, monkeypatch):
+        """Sync engine used directly inside a coroutine"""
+        monkeypatch.setattr(db_session, "DB_LOOP_CHECK", "raise")
+
+        with pytest.raises(BlockingDBCallError):
+            query(sync_engine)
+
+    async def test_sync_query_in_worker_thread_is_allowed(self, sync_engine, monkeypatch):
+        """Offloaded to a thread - the loop stays free"""
+        monkeypatch.setattr(db_session, "DB_LOOP_CHECK", "raise")
+
+        assert await asyncio.to_thread(query, sync_engine) == 1
+
+    async def test_warn_mode_only_logs(self, sync_engine, monkeypatch, caplog):
+        monkeypatch.setattr(db_session, "DB_LOOP_CHECK", "warn")
+
+        assert query(sync_engine) == 1
+        assert "Blocking DB call on the event loop" in caplog.text
+
+
+class TestLoopCheckOutsideLoop():
+    def test_sync_code_is_not_affected(self, sync_engine, monkeypatch):
+        monkeypatch.setattr(db_session, "DB_LOOP_CHECK", "raise")
+
+        assert query(sync_engine) == 1
+
+
+@pytest.mark.asyncio
+class TestAsyncSession():
+    async def test_writes_are_versioned(self):
+        """The versioning before_flush hook also runs for async sessions"""
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            host = Host(name="router", ip="10.0.0.1")
+            session.add(host)
+            await session.commit()
+
+        assert host.version > 0
+        await engine.dispose()
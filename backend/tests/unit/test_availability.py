@@ -0,0 +1,104 @@
+"""Unit tests for the state-transition log and the daily availability rollups"""
+from datetime import date, datetime
+
+import pytest
+from sqlmodel import select
+
+from app.db.models import GroupAvailability, Host, HostAvailability, HostGroup, HostTransition
+from app.services.availability import (
+    group_availability, host_availability, hosts_availability, record_transition, split_by_day
+)
+
+DAY = date(2026, 3, 15)
+
+
+@pytest.fixture
+def session(session):
+    session.add(HostGroup(id=1, name="core"))
+    session.add(Host(id=1, name="router", ip="10.0.0.1", group_id=1))
+    session.add(Host(id=2, name="switch", ip="10.0.0.2", group_id=1))
+    session.commit()
+    return session
+
+
+def transition(session, status, hour, minute=0, day=15, host_id=1):
+    record_transition(session, session.get(Host, host_id), status, datetime(2026, 3, day, hour, minute))
+    session.commit()
+
+
+class TestRollups():
+    def test_split_by_day(self):
+        parts = list(split_by_day(datetime(2026, 3, 14, 23, 0), datetime(2026, 3, 15, 1, 30)))
+        assert parts == [(date(2026, 3, 14), 3600.0), (DAY, 5400.0)]
+
+    def test_transitions_update_host_and_group_rows(self, session):
+        transition(session, "UP", 0)
+        transition(session, "DOWN", 10)
+        transition(session, "UP", 10, 30)
+
+        assert len(session.exec(select(HostTransition)).all()) == 3
+        for row in (session.get(HostAvailability, {"host_id": 1, "day": DAY}),
+                    session.get(GroupAvailability, {"group_id": 1, "day": DAY})):
+            assert row.up_seconds == 10 * 3600
+            assert row.down_seconds == 1800
+            assert row.outages == 1
+            assert row.repairs == 1
+            assert row.repair_seconds == 1800
+
+    def test_outage_over_midnight_is_split(self, session):
+        transition(session, "UP", 12, day=14)
+        transition(session, "DOWN", 23, day=14)
+        transition(session, "UP", 1, day=15)
+
+        before = session.get(HostAvailability, {"host_id": 1, "day": date(2026, 3, 14)})
+        after = session.get(HostAvailability, {"host_id": 1, "day": DAY})
+        assert (before.down_seconds, before.outages, before.repairs) == (3600, 1, 0)
+        assert (after.down_seconds, after.outages, after.repairs) == (3600, 0, 1)
+        assert after.repair_seconds == 7200
+
+    def test_running_totals_include_earlier_days(self, session):
+        """A host closing an old interval updates the group's later rows too"""
+        transition(session, "UP", 0, day=10, host_id=2)
+        transition(session, "UP", 0, day=14)
+        transition(session, "DOWN", 12, day=14)            # group rows for day 14
+        transition(session, "DOWN", 0, day=15, host_id=2)  # adds days 10-14 for host 2
+
+        rows = session.exec(select(GroupAvailability).order_by(GroupAvailability.day)).all()
+        running = 0
+        for row in rows:
+            running += row.up_seconds
+            assert row.total_up_seconds == running
+        assert running == 5 * 86400 + 12 * 3600
+
+
+class TestQueries():
+    def test_open_interval_is_counted_up_to_now(self, session):
+        transition(session, "UP", 0)
+        transition(session, "DOWN", 18)
+
+        summary = host_availability(session, 1, DAY, DAY, now=datetime(2026, 3, 15, 20, 0))
+        assert summary["up_seconds"] == 18 * 3600
+        assert summary["down_seconds"] == 2 * 3600
+        assert summary["uptime_percent"] == 90.0
+        assert summary["outages"] == 1
+        assert summary["mttr_seconds"] is None  # still down
+        assert [d["day"] for d in summary["days"]] == [DAY]
+
+    def test_range_before_first_transition_is_empty(self, session):
+        transition(session, "UP", 0)
+
+        summary = host_availability(session, 1, date(2026, 3, 1), date(2026, 3, 10), now=datetime(2026, 3, 16))
+        assert summary["uptime_percent"] is None
+        assert summary["days"] == []
+
+    def test_group_and_all_hosts_match_single_host(self, session):
+        transition(session, "UP", 0)
+        transition(session, "DOWN", 6)
+        transition(session, "UP", 12)
+        now = datetime(2026, 3, 16)
+
+        host = host_availability(session, 1, DAY, DAY, now=now)
+        group = group_availability(session, 1, DAY, DAY, now=now)
+        all_hosts = hosts_availability(session, DAY, DAY, now=now)
+        assert host["uptime_percent"] == group["uptime_percent"] == all_hosts[1]["uptime_percent"] == 75.0
+        assert host["mttr_seconds"] == all_hosts[1]["mttr_seconds"] == 6 * 3600
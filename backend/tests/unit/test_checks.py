@@ -0,0 +1,254 @@
+"""Unit tests for the service check runner and its check types"""
+import asyncio
+import shutil
+import ssl
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api.v1.hosts import delete_host_check, read_host_checks, router as hosts_router
+from app.db.models import Host, HostCheck, User, UserRole
+from app.db.session import get_read_session
+from app.services.checks import CHECK_TYPES, CheckRunner, check_type, validate_check
+
+
+async def _http_server(status: int = 200):
+    """Minimal keep-alive HTTP server -> (server, port, connections accepted)"""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(f"HTTP/1.1 {status} X\r\nContent-Length: 2\r\n\r\nok".encode())
+            await writer.drain()
+
+    async def serve(reader, writer):
+        try:
+            await handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1], connections
+
+
+class TestValidateCheck():
+    def test_configs(self):
+        assert validate_check("tcp", {"ports": [22, 5432]}) == {"ports": [22, 5432]}
+        assert validate_check("http", {"expect_status": 204})["expect_status"] == [204]
+        for kind, config in (
+            ("tcp", {}),
+            ("tcp", {"ports": [70000]}),
+            ("http", {"url": "ftp://x"}),
+            ("dns", {}),
+            ("command", {"command": " "}),
+            ("icmp", {"timeout": 0}),
+            ("http", {"max_latency_ms": 0}),
+            ("http", {"max_latency_ms": "500"}),
+            ("smtp", {}),
+        ):
+            with pytest.raises(ValueError):
+                validate_check(kind, config)
+
+
+class TestCheckTypes():
+    @pytest.mark.asyncio
+    async def test_tcp_all_or_any_port(self):
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        open_port = server.sockets[0].getsockname()[1]
+        closed = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        closed_port = closed.sockets[0].getsockname()[1]
+        closed.close()
+        await closed.wait_closed()
+        runner = CheckRunner()
+        try:
+            assert (await runner.run("tcp", "127.0.0.1", {"ports": [open_port]})).ok
+            both = {"ports": [open_port, closed_port]}
+            result = await runner.run("tcp", "127.0.0.1", both)
+            assert not result.ok and str(closed_port) in result.detail
+            assert (await runner.run("tcp", "127.0.0.1", {**both, "require": "any"})).ok
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_http_status_and_connection_reuse(self):
+        server, port, connections = await _http_server(status=503)
+        runner = CheckRunner()
+        url = f"http://{{ip}}:{port}/health"
+        try:
+            result = await runner.run("http", "127.0.0.1", {"url": url})
+            assert not result.ok and "HTTP 503" in result.detail
+            for _ in range(5):
+                assert (await runner.run("http", "127.0.0.1", {"url": url, "expect_status": [503]})).ok
+            assert len(connections) == 1  # one keep-alive connection for all six checks
+        finally:
+            await runner.close()
+            server.close()
+            await server.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_http_retries_connection_closed_by_server(self):
+        async def handle(reader, writer):
+            # One chunked response per connection, then an idle close without a Connection header
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n2\r\nok\r\n0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        runner = CheckRunner()
+        try:
+            for _ in range(3):
+                result = await runner.run("http", "127.0.0.1", {"url": f"http://{{ip}}:{port}/"})
+                assert result.ok, result.detail
+                await asyncio.sleep(0.01)
+        finally:
+            await runner.close()
+            server.close()
+            await server.wait_closed()
+
+    @pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl needed for the test certificate")
+    @pytest.mark.asyncio
+    async def test_https_by_name_connects_to_the_resolved_address(self, tmp_path):
+        name = "monitored.test"  # not in DNS - only the resolved address gets the host reached
+        cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", f"/CN={name}",
+             "-addext", f"subjectAltName=DNS:{name}", "-keyout", str(key), "-out", str(cert)],
+            check=True, capture_output=True
+        )
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert, key)
+        server_names, hosts = [], []
+        server_context.sni_callback = lambda sock, server_name, context: server_names.append(server_name)
+
+        async def handle(reader, writer):
+            head = await reader.readuntil(b"\r\n\r\n")
+            hosts.extend(line[6:] for line in head.decode().split("\r\n") if line.startswith("Host: "))
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=server_context)
+        port = server.sockets[0].getsockname()[1]
+        runner = CheckRunner()
+        runner.tls_context(verify=True).load_verify_locations(cert)  # trust the test certificate
+        try:
+            result = await runner.run("http", name, {"url": f"https://{{ip}}:{port}/"}, address="127.0.0.1")
+            assert result.ok, result.detail  # the certificate was checked against the name
+            assert server_names == [name] and hosts == [f"{name}:{port}"]
+            script = f"import sys; sys.exit(sys.argv[1] != '{name}')"
+            config = {"command": f'{sys.executable} -c "{script}" {{ip}}'}
+            command = await runner.run("command", name, config, address="127.0.0.1")
+            assert command.ok, command.detail  # commands get the name too
+        finally:
+            await runner.close()
+            server.close()
+            await server.wait_closed()
+
+    @pytest.mark.asyncio
+    async def test_dns(self):
+        runner = CheckRunner()
+        assert (await runner.run("dns", "127.0.0.1", {"name": "localhost"})).ok
+        assert not (await runner.run("dns", "127.0.0.1", {"name": "does-not-exist.invalid"})).ok
+
+    @pytest.mark.asyncio
+    async def test_command_exit_code_and_timeout(self):
+        runner = CheckRunner()
+        python = sys.executable
+        assert (await runner.run("command", "127.0.0.1", {"command": f"{python} -c pass"})).ok
+        failed = await runner.run("command", "127.0.0.1", {"command": f"{python} -c 'import sys; sys.exit(2)'"})
+        assert not failed.ok and failed.detail == "exit code 2"
+        slow = await runner.run("command", "127.0.0.1", {"command": f"{python} -c 'import time; time.sleep(5)'", "timeout": 0.2})
+        assert slow.result == "timeout"
+        assert slow.seconds < 2
+
+
+class TestCheckRunner():
+    @pytest.mark.asyncio
+    async def test_pool_limits_each_type(self):
+        running = {"now": 0, "max": 0}
+
+        @check_type("test_slow")
+        async def slow(runner, ip, config, timeout):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return True, ""
+
+        try:
+            runner = CheckRunner({"test_slow": 3})
+            results = await asyncio.gather(*(runner.run("test_slow", "10.0.0.1", {}) for _ in range(12)))
+            assert all(result.ok for result in results)
+            assert running["max"] == 3
+        finally:
+            del CHECK_TYPES["test_slow"]
+
+    @pytest.mark.asyncio
+    async def test_host_is_up_only_when_every_check_passes(self):
+        @check_type("test_pass")
+        async def passes(runner, ip, config, timeout):
+            return True, ""
+
+        @check_type("test_hang")
+        async def hangs(runner, ip, config, timeout):
+            await asyncio.sleep(10)
+
+        try:
+            runner = CheckRunner()
+            assert (await runner.check_host("10.0.0.1", [("test_pass", {})]))[:2] == (True, "up")
+            alive, result, results = await runner.check_host(
+                "10.0.0.1", [("test_pass", {}), ("test_hang", {"timeout": 0.05})]
+            )
+            assert (alive, result) == (False, "timeout")
+            assert [r.ok for r in results] == [True, False]
+        finally:
+            del CHECK_TYPES["test_pass"], CHECK_TYPES["test_hang"]
+
+
+class TestHostChecksEndpoint():
+    def test_login_required_and_commands_shown_to_admins_only(self, engine):
+        with Session(engine) as session:
+            session.add(Host(id=1, name="router", ip="10.0.0.1"))
+            session.add(HostCheck(host_id=1, type="command", config='{"command": "check --password s3cret {ip}"}'))
+            session.add(HostCheck(host_id=1, type="tcp", config='{"ports": [22]}'))
+            session.commit()
+
+            admin = User(id=1, username="admin", hashed_password="", role=UserRole.ADMIN)
+            viewer = User(id=2, username="viewer", hashed_password="", role=UserRole.VIEWER)
+            configs = [check["config"] for check in read_host_checks(1, session=session, current_user=admin)]
+            assert configs == [{"command": "check --password s3cret {ip}"}, {"ports": [22]}]
+            configs = [check["config"] for check in read_host_checks(1, session=session, current_user=viewer)]
+            assert configs == [{}, {"ports": [22]}]
+
+        def read_session():
+            with Session(engine) as session:
+                yield session
+
+        app = FastAPI()
+        app.include_router(hosts_router, prefix="/hosts")
+        app.dependency_overrides[get_read_session] = read_session
+        assert TestClient(app).get("/hosts/1/checks").status_code in (401, 403)
+
+    def test_only_admins_remove_command_checks(self, engine):
+        with Session(engine) as session:
+            session.add(Host(id=1, name="router", ip="10.0.0.1"))
+            session.add(HostCheck(id=1, host_id=1, type="command", config='{"command": "true"}'))
+            session.add(HostCheck(id=2, host_id=1, type="tcp", config='{"ports": [22]}'))
+            session.commit()
+
+            admin = User(id=1, username="admin", hashed_password="", role=UserRole.ADMIN)
+            user = User(id=2, username="user", hashed_password="", role=UserRole.USER)
+            with pytest.raises(HTTPException) as exc:
+                delete_host_check(1, 1, session=session, current_user=user)
+            assert exc.value.status_code == 403
+            delete_host_check(1, 2, session=session, current_user=user)
+            delete_host_check(1, 1, session=session, current_user=admin)
+            assert session.get(HostCheck, 1) is None and session.get(HostCheck, 2) is None
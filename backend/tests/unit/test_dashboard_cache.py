@@ -0,0 +1,137 @@
+"""Unit tests for the dashboard cache: counters, invalidation and the cross-worker path"""
+import asyncio
+import json
+
+import pytest
+from sqlmodel import Session
+
+from app.db.models import Alert, Host, HostGroup
+from app.services.dashboard_cache import DashboardCache
+from app.ws.bus import EventBus, fcntl
+
+
+@pytest.fixture
+def session(session):
+    session.add(HostGroup(id=1, name="core"))
+    session.add(HostGroup(id=2, name="edge"))
+    session.add(Host(id=1, name="router", ip="10.0.0.1", group_id=1, status="UP"))
+    session.add(Host(id=2, name="switch", ip="10.0.0.2", group_id=1, status="DOWN"))
+    session.add(Host(id=3, name="ap", ip="10.0.0.3", group_id=2))
+    session.add(Alert(id=1, host_id=2, severity="CRITICAL", message="Host is DOWN"))
+    session.commit()
+    return session
+
+
+def _groups(cache: DashboardCache, session: Session) -> dict:
+    snapshot = json.loads(cache.snapshot(session))
+    return {group["id"]: (group["host_count"], group["up"], group["down"], group["unknown"]) for group in snapshot["groups"]}
+
+
+class TestDashboardCache():
+    def test_loaded_counts(self, session):
+        cache = DashboardCache()
+        assert _groups(cache, session) == {1: (2, 1, 1, 0), 2: (1, 0, 0, 1)}
+
+    def test_payload_reused_until_something_changes(self, session):
+        cache = DashboardCache()
+        first = cache.snapshot(session)
+        assert cache.snapshot(session) is first
+        cache.set_host_status(1, "DOWN")
+        assert cache.snapshot(session) is not first
+
+    def test_status_change_moves_the_host_between_counters(self, session):
+        cache = DashboardCache()
+        cache.snapshot(session)
+        cache.set_host_status(2, "UP")
+        cache.set_host_status(3, "UNREACHABLE")
+        snapshot = json.loads(cache.snapshot(session))
+        assert _groups(cache, session) == {1: (2, 2, 0, 0), 2: (1, 0, 0, 0)}
+        assert {group["id"]: group["unreachable"] for group in snapshot["groups"]} == {1: 0, 2: 1}
+
+    def test_upsert_and_remove(self, session):
+        cache = DashboardCache()
+        cache.snapshot(session)
+        cache.upsert_host(Host(id=4, name="new", ip="10.0.0.4", group_id=2, status="UP"))
+        cache.upsert_host(Host(id=1, name="router", ip="10.0.0.1", group_id=2, status="UP"))  # moved group
+        assert _groups(cache, session) == {1: (1, 0, 1, 0), 2: (3, 2, 0, 1)}
+        cache.remove_host(4)
+        cache.remove_group(2)
+        snapshot = json.loads(cache.snapshot(session))
+        assert [group["id"] for group in snapshot["groups"]] == [1]
+        assert {host["id"]: host["group_id"] for host in snapshot["hosts"]} == {1: None, 2: 1, 3: None}
+
+    def test_group_update_keeps_counters_and_copies_fields(self, session):
+        cache = DashboardCache()
+        cache.snapshot(session)
+        cache.upsert_group(HostGroup(id=1, name="backbone", description="renamed", parent_id=3))
+        group = next(group for group in json.loads(cache.snapshot(session))["groups"] if group["id"] == 1)
+        assert (group["name"], group["description"], group["parent_id"]) == ("backbone", "renamed", 3)
+        assert _groups(cache, session)[1] == (2, 1, 1, 0)
+
+    def test_alerts_reloaded_after_invalidation(self, session):
+        cache = DashboardCache()
+        assert len(json.loads(cache.snapshot(session))["alerts"]) == 1
+        session.add(Alert(host_id=1, severity="INFO", message="Host is UP"))
+        session.commit()
+        assert len(json.loads(cache.snapshot(session))["alerts"]) == 1  # not read again yet
+        cache.invalidate_alerts()
+        alerts = json.loads(cache.snapshot(session))["alerts"]
+        assert [alert["message"] for alert in alerts] == ["Host is UP", "Host is DOWN"]
+        assert alerts[0]["host"]["name"] == "router"
+
+    def test_clear_reloads_from_the_db(self, session):
+        cache = DashboardCache()
+        cache.snapshot(session)
+        session.add(Host(id=4, name="other", ip="10.0.0.4", group_id=2, status="UP"))
+        session.commit()
+        assert _groups(cache, session)[2] == (1, 0, 0, 1)
+        cache.clear()
+        assert _groups(cache, session)[2] == (2, 1, 0, 1)
+
+
+@pytest.mark.skipif(fcntl is None, reason="unix sockets required")
+@pytest.mark.asyncio
+class TestDashboardCacheAcrossWorkers():
+    async def test_changes_reach_the_other_worker(self, session, tmp_path):
+        """Wired like app.main: on_change -> bus.notify("dashboard"), bus.on("dashboard") -> apply_remote"""
+        caches, buses = [], []
+        for _ in range(2):
+            cache, bus = DashboardCache(), EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+            cache.on_change = lambda change, bus=bus: bus.notify("dashboard", change)
+            bus.on("dashboard", cache.apply_remote)
+            await bus.start()
+            caches.append(cache)
+            buses.append(bus)
+        hub, follower = caches
+        try:
+            await asyncio.sleep(0.05)  # let the hub accept the follower
+            for cache in caches:
+                cache.snapshot(session)
+
+            hub.set_host_status(2, "UP")  # applied in place
+            await asyncio.sleep(0.1)
+            assert _groups(follower, session)[1] == (2, 2, 0, 0)
+
+            # Not in the DB: the follower only sees these through the delta, not a reload
+            hub.upsert_host(Host(id=4, name="new", ip="10.0.0.4", group_id=2, status="DOWN"))
+            hub.upsert_group(HostGroup(id=3, name="dmz", parent_id=1))
+            await asyncio.sleep(0.1)
+            assert _groups(follower, session)[2] == (2, 0, 1, 1)
+            snapshot = json.loads(follower.snapshot(session))
+            assert {group["id"]: group["parent_id"] for group in snapshot["groups"]} == {1: None, 2: None, 3: 1}
+            assert json.loads(follower.snapshot(session))["hosts"] == json.loads(hub.snapshot(session))["hosts"]
+
+            hub.remove_host(4)
+            hub.remove_group(3)
+            await asyncio.sleep(0.1)
+            assert _groups(follower, session) == {1: (2, 2, 0, 0), 2: (1, 0, 0, 1)}
+
+            session.add(Host(id=4, name="new", ip="10.0.0.4", group_id=2, status="DOWN"))
+            session.add(Alert(host_id=4, severity="CRITICAL", message="Host is DOWN"))
+            session.commit()
+            follower.invalidate_alerts()
+            await asyncio.sleep(0.1)
+            assert len(json.loads(hub.snapshot(session))["alerts"]) == 2
+        finally:
+            for bus in reversed(buses):
+                await bus.stop()
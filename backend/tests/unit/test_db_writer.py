@@ -0,0 +1,87 @@
+"""Unit tests for the single DB writer (savepoint per job, group commit)"""
+import threading
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db.models import Host
+from app.db.writer import DBWriter
+
+
+def add_host(name):
+    def job(session):
+        host = Host(name=name, ip="10.0.0.1")
+        session.add(host)
+        session.flush()
+        return host.id
+    return job
+
+
+def failing_job(session):
+    session.add(Host(name="broken", ip="10.0.0.2"))
+    session.flush()
+    raise ValueError("job failed")
+
+
+class TestDBWriter():
+    def test_job_result_is_returned_after_commit(self, engine):
+        writer = DBWriter(engine)
+        try:
+            host_id = writer.call(add_host("router"))
+        finally:
+            writer.stop()
+
+        with Session(engine) as session:
+            assert session.get(Host, host_id).name == "router"
+
+    def test_queued_jobs_share_one_commit(self, engine):
+        """Jobs waiting while the writer is busy are committed together"""
+        writer = DBWriter(engine)
+        running, gate = threading.Event(), threading.Event()
+        try:
+            first = writer.submit(lambda session: running.set() or gate.wait(5))
+            running.wait(5)
+            futures = [writer.submit(add_host(f"host-{i}")) for i in range(20)]
+            gate.set()
+            first.result(5)
+            for future in futures:
+                future.result(5)
+        finally:
+            writer.stop()
+
+        assert writer.jobs == 21
+        assert writer.commits == 2
+        with Session(engine) as session:
+            assert len(session.exec(select(Host)).all()) == 20
+
+    def test_failing_job_only_rolls_back_itself(self, engine):
+        writer = DBWriter(engine)
+        gate = threading.Event()
+        try:
+            writer.submit(lambda session: gate.wait(5))
+            ok_before = writer.submit(add_host("before"))
+            failed = writer.submit(failing_job)
+            ok_after = writer.submit(add_host("after"))
+            gate.set()
+
+            with pytest.raises(ValueError):
+                failed.result(5)
+            ok_before.result(5)
+            ok_after.result(5)
+        finally:
+            writer.stop()
+
+        with Session(engine) as session:
+            names = {host.name for host in session.exec(select(Host)).all()}
+        assert names == {"before", "after"}
+        assert writer.failed == 1
+
+    @pytest.mark.asyncio
+    async def test_run_from_event_loop(self, engine):
+        writer = DBWriter(engine)
+        try:
+            host_id = await writer.run(add_host("async"))
+        finally:
+            writer.stop()
+
+        assert host_id is not None
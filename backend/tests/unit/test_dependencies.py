@@ -0,0 +1,44 @@
+"""Unit tests for host dependencies in the ping loop (parents probed first, loops cut)"""
+from app.db.models import Host
+from app.services.ping_service import dependency_levels, dependency_parents
+
+
+def _hosts(*specs):
+    # (id, parent_id, group_id)
+    return [Host(id=host_id, name=f"h{host_id}", ip=f"10.0.0.{host_id}", parent_id=parent_id, group_id=group_id)
+            for host_id, parent_id, group_id in specs]
+
+
+class TestDependencyParents():
+    def test_own_parent_overrides_the_group_gateway(self):
+        hosts = _hosts((1, None, None), (2, None, None), (3, 2, 7), (4, None, 7))
+        assert dependency_parents(hosts, {7: 1}) == {3: 2, 4: 1}
+
+    def test_gateway_does_not_depend_on_itself(self):
+        hosts = _hosts((1, None, 7), (2, None, 7))
+        assert dependency_parents(hosts, {7: 1}) == {2: 1}
+
+    def test_unmonitored_parent_is_ignored(self):
+        hosts = _hosts((1, 99, None), (2, None, 7))
+        assert dependency_parents(hosts, {7: 98}) == {}
+
+
+def _levels(hosts, parents):
+    return [[host.id for host in level] for level in dependency_levels(hosts, parents)]
+
+
+class TestDependencyLevels():
+    def test_parents_come_before_dependents(self):
+        hosts = _hosts((1, 2, None), (2, 3, None), (3, None, None), (4, None, None), (5, 3, None))
+        parents = dependency_parents(hosts, {})
+        assert _levels(hosts, parents) == [[3, 4], [2, 5], [1]]  # load order kept within a level
+
+    def test_dependency_loop_is_cut(self):
+        hosts = _hosts((1, 2, None), (2, 1, None), (3, 2, None))
+        parents = dependency_parents(hosts, {})
+        levels = _levels(hosts, parents)
+        assert len(parents) == 2  # one link of the loop removed
+        assert sorted(sum(levels, [])) == [1, 2, 3]
+        depth = {host_id: i for i, level in enumerate(levels) for host_id in level}
+        for child, parent in parents.items():
+            assert depth[parent] < depth[child]
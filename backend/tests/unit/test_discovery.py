@@ -0,0 +1,107 @@
+"""Unit tests for subnet discovery (address ranges, probes, rate limit, host insertion, the job)"""
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+from sqlmodel import select
+
+from app.db.models import Host, HostGroup, HostTransition
+from app.services import discovery
+from app.services.discovery import RateLimiter, address_count, candidates, insert_hosts, parse_networks, probe
+
+
+class FakeContext:
+    def __init__(self, params):
+        self.params = params
+        self.job = type("FakeJob", (), {"id": 1})()
+        self.reports = []
+
+    async def progress(self, done, total=None):
+        self.reports.append((done, total))
+
+
+class TestAddresses():
+    def test_overlapping_ranges_are_merged(self):
+        networks = parse_networks(["10.0.0.0/24", "10.0.0.128/25", "10.0.1.0/30"])
+        assert [str(n) for n in networks] == ["10.0.0.0/24", "10.0.1.0/30"]
+        assert address_count(networks) == 254 + 2  # no network / broadcast addresses
+        assert sum(1 for _ in candidates(networks)) == 256
+
+    def test_invalid_range_raises(self):
+        with pytest.raises(ValueError):
+            parse_networks(["10.0.0.300/24"])
+
+
+class TestProbes():
+    @pytest.mark.asyncio
+    async def test_open_and_refused_ports_mean_alive(self):
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            assert await probe("127.0.0.1", [port], timeout=1, icmp=False)
+        finally:
+            server.close()
+            await server.wait_closed()
+        assert await probe("127.0.0.1", [port], timeout=1, icmp=False)  # closed now: RST is an answer too
+
+    @pytest.mark.asyncio
+    async def test_rate_limiter_spaces_acquisitions(self):
+        limiter = RateLimiter(rate=200)
+        started = time.monotonic()
+        for _ in range(21):
+            await limiter.acquire()
+        assert time.monotonic() - started >= 0.09  # 20 intervals of 5 ms
+
+
+class TestInsertHosts():
+    def test_new_addresses_become_up_hosts_in_the_group(self, session):
+        group = HostGroup(name="lab")
+        session.add_all([group, Host(name="known", ip="10.0.0.1")])
+        session.commit()
+
+        now = datetime(2026, 1, 1)
+        hosts = insert_hosts(session, ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.3"], group.id, now)
+        session.commit()
+
+        assert [host.ip for host in hosts] == ["10.0.0.2", "10.0.0.3"]
+        assert all(host.status == "UP" and host.status_since == now and host.group_id == group.id for host in hosts)
+        assert len(session.exec(select(HostTransition)).all()) == 2
+
+    def test_deleted_group_is_not_used(self, session):
+        group = HostGroup(name="gone", deleted_at=datetime.utcnow())
+        session.add(group)
+        session.commit()
+
+        hosts = insert_hosts(session, ["10.0.0.9"], group.id, datetime.utcnow())
+        assert hosts[0].group_id is None
+
+
+class TestDiscoveryJob():
+    @pytest.mark.asyncio
+    async def test_sweep_skips_known_and_adds_responsive(self, monkeypatch):
+        added = []
+
+        async def fake_probe(ip, ports, timeout, icmp=True):
+            return ip.endswith((".1", ".5", ".9"))
+
+        async def fake_add_hosts(ips, group_id):
+            added.extend(ips)
+            return len(ips)
+
+        async def fake_known_ips():
+            return {"10.0.0.1"}
+
+        monkeypatch.setattr(discovery, "probe", fake_probe)
+        monkeypatch.setattr(discovery, "_add_hosts", fake_add_hosts)
+        monkeypatch.setattr(discovery, "_known_ips", fake_known_ips)
+
+        ctx = FakeContext({"cidrs": ["10.0.0.0/28"], "rate": 5000})
+        result = await discovery.discover_hosts(ctx)
+
+        assert sorted(added) == ["10.0.0.5", "10.0.0.9"]
+        assert result["addresses"] == 14
+        assert result["skipped_known"] == 1
+        assert result["probed"] == 13
+        assert result["added"] == 2
+        assert ctx.reports[-1] == (14, 14)
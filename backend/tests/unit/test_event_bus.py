@@ -0,0 +1,107 @@
+"""Unit tests for the cross-worker event bus (hub election, sequencing, failover)"""
+import asyncio
+
+import pytest
+
+from app.ws.bus import EventBus, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="unix sockets required")
+
+
+def numbering_handler(received):
+    """Mimics _deliver in app.ws.alerts: number unnumbered events, keep the rest"""
+    state = {"seq": 0}
+
+    def handler(event):
+        if "seq" not in event:
+            state["seq"] += 1
+            event["seq"] = state["seq"]
+        received.append(event)
+    return handler
+
+
+@pytest.mark.asyncio
+class TestEventBus():
+    async def test_first_worker_becomes_hub_and_runs_services(self, tmp_path):
+        """Only the hub runs the leader callback"""
+        leaders = []
+
+        async def on_leader():
+            leaders.append(True)
+
+        hub = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        follower = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        await hub.start(on_leader=on_leader)
+        await follower.start(on_leader=on_leader)
+        try:
+            assert hub.is_hub
+            assert not follower.is_hub
+            assert leaders == [True]
+        finally:
+            await follower.stop()
+            await hub.stop()
+
+    async def test_events_are_numbered_once_and_reach_every_worker(self, tmp_path):
+        """Events published by any worker arrive everywhere with the hub's seq"""
+        hub_events, follower_events = [], []
+        hub = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        follower = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        hub.on_event(numbering_handler(hub_events))
+        follower.on_event(numbering_handler(follower_events))
+        await hub.start()
+        await follower.start()
+        try:
+            await asyncio.sleep(0.05)  # let the hub accept the follower
+            hub.publish_event({"message": "from hub"})
+            follower.publish_event({"message": "from follower"})
+            await asyncio.sleep(0.1)
+
+            assert [(e["seq"], e["message"]) for e in hub_events] == [(1, "from hub"), (2, "from follower")]
+            assert [(e["seq"], e["message"]) for e in follower_events] == [(1, "from hub"), (2, "from follower")]
+        finally:
+            await follower.stop()
+            await hub.stop()
+
+    async def test_notifications_skip_the_sender(self, tmp_path):
+        """Cache notifications go to the other workers only"""
+        hub_seen, follower_seen = [], []
+        hub = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        follower = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        hub.on("user", hub_seen.append)
+        follower.on("user", follower_seen.append)
+        await hub.start()
+        await follower.start()
+        try:
+            await asyncio.sleep(0.05)
+            follower.notify("user", {"user_id": 1})
+            hub.notify("user", {"user_id": 2})
+            await asyncio.sleep(0.1)
+
+            assert hub_seen == [{"user_id": 1}]
+            assert follower_seen == [{"user_id": 2}]
+        finally:
+            await follower.stop()
+            await hub.stop()
+
+    async def test_follower_takes_over_when_hub_stops(self, tmp_path):
+        """A follower becomes hub (and runs the services) when the hub goes away"""
+        leaders = []
+
+        async def on_leader():
+            leaders.append(True)
+
+        hub = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        follower = EventBus(tmp_path / "bus.sock", tmp_path / "bus.lock")
+        await hub.start(on_leader=on_leader)
+        await follower.start(on_leader=on_leader)
+        try:
+            await hub.stop()
+            for _ in range(80):
+                if follower.is_hub:
+                    break
+                await asyncio.sleep(0.1)
+
+            assert follower.is_hub
+            assert leaders == [True, True]
+        finally:
+            await follower.stop()
@@ -0,0 +1,63 @@
+"""Unit tests for event sequence numbers and replay"""
+from sqlmodel import select
+
+from app.db.models import StreamEvent
+from app.ws.stream import EventStream
+
+
+class TestEventStream():
+    def test_record_assigns_increasing_seq(self):
+        stream = EventStream()
+
+        first = stream.record({"host_id": 1})
+        second = stream.record({"host_id": 2})
+
+        assert (first["seq"], second["seq"]) == (1, 2)
+        assert stream.last_seq == 2
+
+    def test_since_returns_only_missed_events(self):
+        stream = EventStream()
+        for host_id in range(5):
+            stream.record({"host_id": host_id})
+
+        assert [e["seq"] for e in stream.since(3)] == [4, 5]
+        assert stream.since(5) == []
+
+    def test_large_gap_requires_resync(self):
+        stream = EventStream(max_replay=2)
+        for host_id in range(5):
+            stream.record({"host_id": host_id})
+
+        assert stream.since(1) is None
+
+    def test_gap_older_than_buffer_is_read_from_db(self, session):
+        stream = EventStream(buffer_size=2)
+        for host_id in range(5):
+            stream.record({"host_id": host_id})
+        stream.save(session)
+        session.commit()
+
+        assert stream.since(1) is None  # not in memory any more
+        assert [e["seq"] for e in stream.since(1, session)] == [2, 3, 4, 5]
+
+    def test_save_prunes_rows_replay_cannot_reach(self, session):
+        stream = EventStream(max_replay=2)
+        for host_id in range(5):
+            stream.record({"host_id": host_id})
+        stream.save(session)
+        session.commit()
+
+        assert session.exec(select(StreamEvent.seq).order_by(StreamEvent.seq)).all() == [4, 5]
+
+    def test_load_continues_numbering(self, session):
+        stream = EventStream()
+        stream.record({"host_id": 1})
+        stream.save(session)
+        session.commit()
+
+        restarted = EventStream()
+        restarted.load(session)
+
+        assert restarted.record({"host_id": 2})["seq"] == 2
+        assert [e["seq"] for e in restarted.since(0)] == [1, 2]
+        assert session.get(StreamEvent, 1).host_id == 1
@@ -0,0 +1,71 @@
+"""Unit tests for the ping-cycle flight recorder"""
+import asyncio
+import json
+
+import pytest
+
+from app.services.flight_recorder import FlightRecorder
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    return FlightRecorder(cycles=3, threshold=0, directory=tmp_path, dump_interval=0, max_dumps=2)
+
+
+async def run_cycle(recorder, hosts=2):
+    cycle = recorder.start_cycle()
+    with cycle.phase("load"):
+        pass
+    with cycle.phase("probe"):
+        await asyncio.sleep(0.02)  # probes run side by side
+        for host_id in range(hosts):
+            cycle.probe(host_id, f"10.0.0.{host_id}", 0.05 * (host_id + 1), "up")
+    cycle.hosts = hosts
+    return await recorder.finish(cycle)
+
+
+@pytest.mark.asyncio
+class TestFlightRecorder():
+    async def test_slow_cycle_is_dumped_with_previous_cycles(self, recorder):
+        recorder.threshold = 100
+        await run_cycle(recorder)
+        recorder.threshold = 0
+        path = await run_cycle(recorder)
+
+        data = json.loads(path.read_text())
+        slow = data["slow_cycle"]
+        assert slow["hosts"] == 2
+        assert set(slow["phases"]) == {"load", "probe"}
+        assert 0.02 <= slow["phases"]["probe"] < 0.1  # wall time, not the sum of the overlapping probes
+        assert [probe["seconds"] for probe in slow["probes"]] == [0.1, 0.05]  # per host, slowest first
+        assert len(data["previous_cycles"]) == 1
+
+    async def test_fast_cycle_is_not_dumped(self, recorder, tmp_path):
+        recorder.threshold = 100
+        assert await run_cycle(recorder) is None
+        assert list(tmp_path.iterdir()) == []
+
+    async def test_only_the_last_cycles_are_kept(self, recorder):
+        recorder.threshold = 100
+        for _ in range(5):
+            await run_cycle(recorder)
+        assert len(recorder.cycles) == 3
+
+    async def test_dumps_are_rate_limited(self, recorder):
+        recorder.dump_interval = 60
+        assert await run_cycle(recorder) is not None
+        assert await run_cycle(recorder) is None
+
+    async def test_only_the_slowest_and_failed_probes_are_kept(self, recorder):
+        recorder.probes_kept = 2
+        cycle = recorder.start_cycle()
+        for host_id in range(10):
+            cycle.probe(host_id, f"10.0.0.{host_id}", host_id / 100, "down" if host_id in (1, 2, 3) else "up")
+        data = cycle.to_dict()
+        assert [probe["host_id"] for probe in data["probes"]] == [9, 8]
+        assert [probe["host_id"] for probe in data["failed_probes"]] == [3, 2]
+        assert data["results"] == {"up": {"probes": 7, "seconds": 0.39}, "down": {"probes": 3, "seconds": 0.06}}
+
+    async def test_old_dumps_are_pruned(self, recorder):
+        paths = [await run_cycle(recorder) for _ in range(4)]
+        assert recorder.dumps() == paths[:1:-1]
@@ -0,0 +1,52 @@
+"""Unit tests for the host group endpoints"""
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.hostgroups import (
+    HostGroupCreate, HostGroupUpdate, create_hostgroup, delete_hostgroup, read_hostgroups_summary, update_hostgroup
+)
+from app.db.models import Host, HostGroup, User, UserRole
+
+ADMIN = User(id=1, username="admin", hashed_password="", role=UserRole.ADMIN)
+
+
+class TestHostGroupsSummary():
+    def test_counts_per_group(self, session):
+        session.add(HostGroup(id=1, name="core"))
+        session.add(HostGroup(id=2, name="empty"))
+        session.add(HostGroup(id=3, name="gone", deleted_at=datetime.utcnow()))
+        for host_id, group_id, status in (
+            (1, 1, "UP"), (2, 1, "UP"), (3, 1, "DOWN"), (4, 1, "unknown"), (5, 1, "UNREACHABLE"),
+            (6, None, "DOWN"), (7, 3, "UP"),
+        ):
+            session.add(Host(id=host_id, name=f"h{host_id}", ip=f"10.0.0.{host_id}", group_id=group_id, status=status))
+        session.add(Host(id=8, name="h8", ip="10.0.0.8", group_id=1, status="DOWN", deleted_at=datetime.utcnow()))
+        session.commit()
+
+        summary = {group["name"]: group for group in read_hostgroups_summary(session=session, current_user=None)}
+        assert set(summary) == {"core", "empty"}  # deleted groups are left out
+        assert summary["core"] == {
+            "id": 1, "name": "core", "host_count": 5, "up": 2, "down": 1, "unreachable": 1, "unknown": 1
+        }  # the deleted host is not counted
+        assert summary["empty"] == {
+            "id": 2, "name": "empty", "host_count": 0, "up": 0, "down": 0, "unreachable": 0, "unknown": 0
+        }
+
+
+class TestHostGroupNames():
+    def test_name_of_a_deleted_group_can_be_reused(self, session):
+        first = create_hostgroup(HostGroupCreate(name="core"), session=session, current_user=ADMIN)
+        with pytest.raises(HTTPException) as duplicate:
+            create_hostgroup(HostGroupCreate(name="core"), session=session, current_user=ADMIN)
+        assert duplicate.value.status_code == 400
+
+        delete_hostgroup(first["id"], session=session, current_user=ADMIN)
+        second = create_hostgroup(HostGroupCreate(name="core"), session=session, current_user=ADMIN)
+        assert second["id"] != first["id"]
+
+        other = create_hostgroup(HostGroupCreate(name="edge"), session=session, current_user=ADMIN)
+        delete_hostgroup(other["id"], session=session, current_user=ADMIN)
+        renamed = update_hostgroup(second["id"], HostGroupUpdate(name="edge"), session=session, current_user=ADMIN)
+        assert renamed["name"] == "edge"
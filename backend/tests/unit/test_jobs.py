@@ -0,0 +1,43 @@
+"""Unit tests for the background job runner (job rows, handlers, restart recovery)"""
+from sqlmodel import select
+
+from app.db.models import Job, JobStatus
+from app.services.jobs import JobContext, JobRunner, job_dict, job_runner
+import app.services.deletion  # noqa: F401 - registers the delete handlers
+
+
+class TestJobs():
+    def test_create_adds_pending_job_to_callers_transaction(self, session):
+        job = JobRunner.create(session, "delete_host", target_id=7, params={"batch": 10}, created_by="admin")
+        session.commit()
+        session.refresh(job)
+
+        data = job_dict(job)
+        assert data["status"] == JobStatus.PENDING
+        assert data["target_id"] == 7
+        assert data["params"] == {"batch": 10}
+        assert data["progress"] == 0
+        assert data["result"] is None
+
+    def test_context_decodes_params(self):
+        assert JobContext(Job(kind="x", params='{"cidr": "10.0.0.0/24"}')).params == {"cidr": "10.0.0.0/24"}
+        assert JobContext(Job(kind="x")).params == {}
+
+    def test_interrupted_jobs_are_queued_again(self, session):
+        session.add_all([
+            Job(kind="a", status=JobStatus.RUNNING),
+            Job(kind="b", status=JobStatus.DONE),
+        ])
+        session.commit()
+
+        JobRunner._requeue_interrupted(session)
+        session.commit()
+
+        statuses = {job.kind: job.status for job in session.exec(select(Job)).all()}
+        assert statuses == {"a": JobStatus.PENDING, "b": JobStatus.DONE}
+
+    def test_delete_handlers_are_registered(self):
+        assert {"delete_host", "delete_hostgroup"} <= set(job_runner._handlers)
+
+    def test_wake_local_without_runner_is_a_no_op(self):
+        JobRunner().wake_local()
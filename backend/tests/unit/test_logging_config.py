@@ -0,0 +1,74 @@
+"""Unit tests for the queue-based logging pipeline"""
+import json
+import logging
+import queue
+import time
+
+from app.utils.logging_config import JsonFormatter, NonBlockingQueueHandler, RateLimitFilter, parse_levels, parse_limits
+
+
+def make_record(msg="hello %s", args=("world",), level=logging.INFO, lineno=10, name="app.test"):
+    return logging.LogRecord(name, level, "/app/test.py", lineno, msg, args, None)
+
+
+class TestNonBlockingQueueHandler():
+    def test_message_is_rendered_before_enqueueing(self):
+        log_queue = queue.Queue()
+        args = ["world"]
+        NonBlockingQueueHandler(log_queue).handle(make_record(args=(args,)))
+        args.append("changed later")
+
+        record = log_queue.get_nowait()
+        assert record.getMessage() == "hello ['world']"
+        assert record.args is None
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        log_queue = queue.Queue(1)
+        handler = NonBlockingQueueHandler(log_queue)
+        started = time.perf_counter()
+        for _ in range(5):
+            handler.handle(make_record())
+        assert time.perf_counter() - started < 0.5
+        assert log_queue.qsize() == 1
+
+
+class TestRateLimitFilter():
+    def test_call_site_is_limited_per_interval(self):
+        rate_filter = RateLimitFilter({"app": 2}, interval=60)
+        passed = [rate_filter.filter(make_record()) for _ in range(5)]
+        assert passed == [True, True, False, False, False]
+        assert rate_filter.filter(make_record(lineno=11))  # another call site has its own budget
+
+    def test_only_listed_loggers_are_limited(self):
+        rate_filter = RateLimitFilter({"app.test": 1, "app.test.quiet": 0}, interval=60)
+        assert [rate_filter.filter(make_record(name="app.test.child")) for _ in range(2)] == [True, False]
+        for name in ("uvicorn.access", "app.api.v1.hosts", "app.test.quiet"):
+            assert all(rate_filter.filter(make_record(name=name, lineno=20)) for _ in range(5))
+
+    def test_warnings_are_never_limited(self):
+        rate_filter = RateLimitFilter({"app": 1}, interval=60)
+        assert all(rate_filter.filter(make_record(level=logging.WARNING)) for _ in range(5))
+
+    def test_next_window_reports_suppressed_count(self):
+        rate_filter = RateLimitFilter({"app": 1}, interval=0.05)
+        for _ in range(4):
+            rate_filter.filter(make_record())
+        time.sleep(0.06)
+        record = make_record()
+        assert rate_filter.filter(record)
+        assert record.getMessage() == "hello world (3 similar messages suppressed)"
+
+
+class TestLoggingConfig():
+    def test_json_formatter(self):
+        data = json.loads(JsonFormatter().format(make_record()))
+        assert data["message"] == "hello world"
+        assert data["level"] == "INFO"
+        assert data["logger"] == "app.test"
+
+    def test_parse_levels_skips_bad_entries(self):
+        levels = parse_levels("app.services.ping_service=debug, sqlalchemy=WARNING,broken,x=NOPE")
+        assert levels == {"app.services.ping_service": logging.DEBUG, "sqlalchemy": logging.WARNING}
+
+    def test_parse_limits_skips_bad_entries(self):
+        assert parse_limits("app.services.checks=20, x=lots,broken") == {"app.services.checks": 20}
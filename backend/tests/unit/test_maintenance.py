@@ -0,0 +1,79 @@
+"""Unit tests for maintenance windows: recurrence expansion and the interval index"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.models import Host, HostGroup, MaintenanceWindow
+from app.services.maintenance import MaintenanceIndex, merge, occurrences
+
+NOW = datetime(2026, 3, 15, 12, 0)
+
+
+@pytest.fixture
+def session(session):
+    session.add(HostGroup(id=1, name="core"))
+    session.add(Host(id=1, name="router", ip="10.0.0.1", group_id=1))
+    session.add(Host(id=2, name="switch", ip="10.0.0.2"))
+    session.commit()
+    return session
+
+
+def window(**fields) -> MaintenanceWindow:
+    return MaintenanceWindow(**{"starts_at": datetime(2026, 3, 1, 2), "ends_at": datetime(2026, 3, 1, 4), **fields})
+
+
+class TestOccurrences():
+    def test_one_off(self):
+        assert list(occurrences(window(), datetime(2026, 3, 1), datetime(2026, 3, 2))) == [
+            (datetime(2026, 3, 1, 2), datetime(2026, 3, 1, 4))
+        ]
+        assert list(occurrences(window(), NOW, NOW + timedelta(days=7))) == []
+
+    def test_daily_starts_at_the_first_occurrence_not_over(self):
+        spans = list(occurrences(window(recurrence="daily"), datetime(2026, 3, 15, 3), datetime(2026, 3, 17)))
+        assert spans == [
+            (datetime(2026, 3, 15, 2), datetime(2026, 3, 15, 4)),  # in progress
+            (datetime(2026, 3, 16, 2), datetime(2026, 3, 16, 4)),
+        ]
+
+    def test_until_ends_the_series(self):
+        recurring = window(recurrence="weekly", until=datetime(2026, 3, 20))
+        starts = [start for start, _ in occurrences(recurring, datetime(2026, 3, 1), datetime(2026, 4, 1))]
+        assert starts == [datetime(2026, 3, 1, 2), datetime(2026, 3, 8, 2), datetime(2026, 3, 15, 2)]
+
+    def test_merge_joins_overlapping_spans(self):
+        t = lambda hour: datetime(2026, 3, 15, hour)
+        assert merge([(t(5), t(6)), (t(1), t(3)), (t(2), t(4)), (t(4), t(5))]) == ([t(1)], [t(6)])
+        assert merge([(t(1), t(2)), (t(3), t(4))]) == ([t(1), t(3)], [t(2), t(4)])
+
+
+class TestMaintenanceIndex():
+    def test_host_and_group_windows(self, session):
+        session.add(MaintenanceWindow(host_id=2, starts_at=NOW - timedelta(hours=1), ends_at=NOW + timedelta(hours=1)))
+        session.add(MaintenanceWindow(
+            group_id=1, starts_at=datetime(2026, 3, 1, 2), ends_at=datetime(2026, 3, 1, 4), recurrence="daily"
+        ))
+        session.commit()
+        index = MaintenanceIndex()
+        index.load(session, now=NOW)
+        index.set_hosts([session.get(Host, 1), session.get(Host, 2)])
+
+        assert index.active_until(2, at=NOW) == NOW + timedelta(hours=1)
+        assert index.active_until(2, at=NOW + timedelta(hours=1)) is None  # end is exclusive
+        assert index.active_until(1, at=NOW) is None
+        assert index.active_until(1, at=datetime(2026, 3, 16, 3)) == datetime(2026, 3, 16, 4)  # via its group
+        assert index.active_until(1, group_id=1, at=datetime(2026, 3, 17, 2)) == datetime(2026, 3, 17, 4)
+
+    def test_reload_when_invalidated_or_horizon_runs_out(self, session):
+        index = MaintenanceIndex(horizon=timedelta(days=7), refresh=timedelta(days=1))
+        assert index.needs_reload(NOW)
+        index.load(session, now=NOW)
+        assert not index.needs_reload(NOW)
+        assert index.needs_reload(NOW + timedelta(days=6, hours=1))
+
+        session.add(MaintenanceWindow(host_id=1, starts_at=NOW, ends_at=NOW + timedelta(hours=2)))
+        session.commit()
+        index.invalidate_local()
+        assert index.needs_reload(NOW)
+        index.load(session, now=NOW)
+        assert index.active_until(1, at=NOW + timedelta(hours=1)) == NOW + timedelta(hours=2)
@@ -0,0 +1,73 @@
+"""Unit tests for the metrics registry and the Prometheus text output"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.metrics import MetricsRegistry, MetricsMiddleware, metrics
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+class TestMetricsRegistry():
+    def test_counter_with_labels(self, registry):
+        probes = registry.counter("probes_total", "Probes", ("result",))
+        probes.labels("up").inc()
+        probes.labels("up").inc(2)
+        probes.labels("down").inc()
+
+        text = registry.render()
+        assert "# TYPE probes_total counter" in text
+        assert 'probes_total{result="up"} 3' in text
+        assert 'probes_total{result="down"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            latency.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 2' in text  # le is inclusive
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert "latency_seconds_count 4" in text
+        assert "latency_seconds_sum 3.65" in text
+
+    def test_gauge_function_is_read_at_scrape_time(self, registry):
+        queue = []
+        registry.gauge("queue_depth", "Queue", function=lambda: len(queue))
+        queue.extend([1, 2])
+        assert "queue_depth 2" in registry.render()
+
+    def test_label_values_are_escaped(self, registry):
+        registry.counter("paths_total", "Paths", ("path",)).labels('a"b\\c').inc()
+        assert 'paths_total{path="a\\"b\\\\c"} 1' in registry.render()
+
+    def test_wrong_label_count_is_rejected(self, registry):
+        counter = registry.counter("x_total", "X", ("a", "b"))
+        with pytest.raises(ValueError):
+            counter.labels("only-one")
+
+    def test_registering_twice_returns_the_same_metric(self, registry):
+        assert registry.counter("same_total", "Same") is registry.counter("same_total", "Same")
+
+
+class TestMetricsMiddleware():
+    def test_requests_are_labelled_with_the_route_template(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/things/{thing_id}")
+        def read_thing(thing_id: int):
+            return {"id": thing_id}
+
+        client = TestClient(app)
+        client.get("/things/1")
+        client.get("/things/2")
+        client.get("/missing")
+
+        text = metrics.render()
+        assert 'http_request_duration_seconds_count{method="GET",route="/things/{thing_id}",status="200"} 2' in text
+        assert 'route="unmatched",status="404"' in text
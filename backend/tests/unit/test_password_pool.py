@@ -0,0 +1,47 @@
+"""Unit tests for the bcrypt process pool: admission control and recovery from a dead worker"""
+import asyncio
+import os
+import signal
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.auth import _password_job
+from app.utils.jwt_utils import verify_password
+from app.utils.password_pool import PasswordPool, PasswordPoolBusy
+
+
+@pytest.mark.asyncio
+class TestPasswordPool():
+    async def test_jobs_over_the_limit_are_rejected(self):
+        pool = PasswordPool(workers=1, max_pending=1)
+        try:
+            hashed, rejected = await asyncio.gather(pool.hash("secret"), pool.hash("other"), return_exceptions=True)
+            assert verify_password("secret", hashed)
+            assert isinstance(rejected, PasswordPoolBusy)
+            assert (pool.rejected, pool.pending) == (1, 0)
+        finally:
+            pool.shutdown()
+
+    async def test_busy_pool_answers_503(self):
+        async def busy():
+            raise PasswordPoolBusy("full")
+
+        with pytest.raises(HTTPException) as error:
+            await _password_job(busy)
+        assert error.value.status_code == 503
+        assert error.value.headers == {"Retry-After": "1"}
+
+    @pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+    async def test_new_workers_after_one_dies(self):
+        pool = PasswordPool(workers=1)
+        try:
+            await pool.hash("secret")
+            for process in list(pool._executor._processes.values()):
+                os.kill(process.pid, signal.SIGKILL)  # like the OOM killer
+            await asyncio.sleep(0.2)
+
+            assert await pool.verify("secret", await pool.hash("secret"))
+            assert pool.restarts == 1
+        finally:
+            pool.shutdown()
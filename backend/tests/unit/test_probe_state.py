@@ -0,0 +1,39 @@
+"""Unit tests for the probe state snapshot kept across restarts"""
+import json
+import time
+
+import pytest
+
+from app.services import ping_service
+from app.services.ping_service import load_probe_state, save_probe_state
+
+
+@pytest.fixture(autouse=True)
+def failure_counts():
+    ping_service.failure_counts.clear()
+    yield ping_service.failure_counts
+    ping_service.failure_counts.clear()
+
+
+class TestProbeState():
+    def test_failure_counts_survive_a_restart(self, tmp_path, failure_counts):
+        path = tmp_path / "probe_state.json"
+        failure_counts.update({1: 2, 2: 0, 3: 5})
+        save_probe_state(path)
+        failure_counts.clear()
+
+        assert load_probe_state(path) == 2
+        assert failure_counts == {1: 2, 3: 5}  # hosts without failures are not stored
+        assert not path.exists()  # restored once only
+
+    def test_old_snapshot_is_ignored(self, tmp_path, failure_counts):
+        path = tmp_path / "probe_state.json"
+        path.write_text(json.dumps({"saved_at": time.time() - 3600, "failure_counts": {"1": 2}}))
+        assert load_probe_state(path) == 0
+        assert failure_counts == {}
+
+    def test_missing_or_corrupt_snapshot_is_ignored(self, tmp_path):
+        path = tmp_path / "probe_state.json"
+        assert load_probe_state(path) == 0
+        path.write_text("{not json")
+        assert load_probe_state(path) == 0
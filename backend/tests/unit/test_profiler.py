@@ -0,0 +1,53 @@
+"""Unit tests for the sampling profiler"""
+import threading
+import time
+
+import pytest
+
+from app.utils.profiler import SamplingProfiler, ProfilerBusy
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler():
+    def test_busy_thread_shows_up_in_collapsed_stacks(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+        worker.start()
+        try:
+            output = SamplingProfiler().profile(0.3, interval=0.005)
+        finally:
+            stop.set()
+            worker.join()
+
+        lines = [line for line in output.splitlines() if line.startswith("busy-worker;")]
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert "busy_loop (test_profiler.py:" in stack
+
+    def test_waiting_threads_are_dropped_unless_requested(self):
+        stop = threading.Event()
+        waiter = threading.Thread(target=stop.wait, name="idle-waiter")
+        waiter.start()
+        try:
+            profiler = SamplingProfiler()
+            assert "idle-waiter;" not in profiler.profile(0.05)
+            assert "idle-waiter;" in profiler.profile(0.05, include_idle=True)
+        finally:
+            stop.set()
+            waiter.join()
+
+    def test_concurrent_profile_is_rejected(self):
+        profiler = SamplingProfiler()
+        started = threading.Thread(target=profiler.profile, args=(0.3,))
+        started.start()
+        time.sleep(0.05)
+        try:
+            with pytest.raises(ProfilerBusy):
+                profiler.profile(0.1)
+        finally:
+            started.join()
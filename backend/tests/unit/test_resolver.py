@@ -0,0 +1,144 @@
+"""Unit tests for the DNS cache: TTLs, negative caching, prefetch and serving stale answers"""
+import asyncio
+import socket
+import struct
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.services.resolver import A, AAAA, CNAME, DNS_STALE_MAX, DnsCache, parse_response
+
+NAME = "www.example.test"
+
+
+def _response(request: bytes, rcode: int = 0, records=(), soa_minimum=None) -> bytes:
+    """Answer to a query: records are (type, ttl, rdata); an SOA in the authority section for negative answers"""
+    question = request[12:]
+    body = b""
+    for rtype, ttl, rdata in records:
+        body += struct.pack("!HHHIH", 0xC00C, rtype, 1, ttl, len(rdata)) + rdata
+    if soa_minimum is not None:
+        soa = b"\0\0" + struct.pack("!IIIII", 1, 3600, 600, 86400, soa_minimum)
+        body += struct.pack("!HHHIH", 0xC00C, 6, 1, 900, len(soa)) + soa
+    header = struct.pack(
+        "!HHHHHH", int.from_bytes(request[:2], "big"), 0x8180 | rcode, 1, len(records), int(soa_minimum is not None), 0
+    )
+    return header + question + body
+
+
+class _DnsServer(asyncio.DatagramProtocol):
+    """Answers from `zone` (name -> [(ip, ttl)]); NXDOMAIN for other names, nothing at all while `silent`"""
+
+    def __init__(self):
+        self.zone = {}
+        self.queries = []
+        self.silent = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        labels, offset = [], 12
+        while data[offset]:
+            labels.append(data[offset + 1:offset + 1 + data[offset]].decode())
+            offset += data[offset] + 1
+        name, qtype = ".".join(labels), struct.unpack_from("!H", data, offset + 1)[0]
+        self.queries.append((name, qtype))
+        if self.silent:
+            return
+        if name not in self.zone:
+            self.transport.sendto(_response(data, rcode=3, soa_minimum=45), addr)
+        elif qtype == A:
+            records = [(A, ttl, socket.inet_aton(ip)) for ip, ttl in self.zone[name]]
+            self.transport.sendto(_response(data, records=records), addr)
+        else:
+            self.transport.sendto(_response(data, soa_minimum=45), addr)
+
+
+@asynccontextmanager
+async def _dns():
+    """Fake nameserver and a cache using it -> (server, cache, clock); clock[0] is the cache's time"""
+    transport, server = await asyncio.get_running_loop().create_datagram_endpoint(
+        _DnsServer, local_addr=("127.0.0.1", 0)
+    )
+    clock = [1000.0]
+    cache = DnsCache([transport.get_extra_info("sockname")], hosts_names=set(), timeout=0.2, clock=lambda: clock[0])
+    try:
+        yield server, cache, clock
+    finally:
+        transport.close()
+
+
+class TestParseResponse():
+    def test_cname_chain_expires_with_its_shortest_link(self):
+        request = struct.pack("!HHHHHH", 7, 0x0100, 1, 0, 0, 0) + b"\x03www\x04test\x00" + struct.pack("!HH", A, 1)
+        records = [(CNAME, 50, b"\x03cdn\xc0\x10"), (A, 300, socket.inet_aton("10.1.2.3")), (A, 300, socket.inet_aton("10.1.2.4"))]
+        assert parse_response(_response(request, records=records), 7, A) == (0, ["10.1.2.3", "10.1.2.4"], 50)
+        assert parse_response(_response(request, rcode=3, soa_minimum=45), 7, AAAA) == (3, [], 45)
+
+
+class TestDnsCache():
+    @pytest.mark.asyncio
+    async def test_answer_cached_for_its_ttl(self):
+        async with _dns() as (server, cache, clock):
+            server.zone[NAME] = [("10.1.2.3", 120)]
+            await cache.prepare([NAME, "10.0.0.9", "10.0.0.9"])
+            assert cache.address(NAME) == "10.1.2.3"
+            assert cache.address("10.0.0.9") == "10.0.0.9"  # literals are never looked up
+            clock[0] += 100
+            await cache.prepare([NAME, "10.0.0.9"])
+            assert cache.address(NAME) == "10.1.2.3"
+            assert server.queries == [(NAME, A)]
+
+    @pytest.mark.asyncio
+    async def test_negative_answer_cached_for_the_soa_minimum(self):
+        async with _dns() as (server, cache, clock):
+            await cache.prepare(["gone.example.test"])
+            assert cache.address("gone.example.test") is None
+            assert "no such name" in cache.error("gone.example.test")
+            clock[0] += 44
+            await cache.prepare(["gone.example.test"])
+            assert len(server.queries) == 1
+            clock[0] += 1
+            await cache.prepare(["gone.example.test"])  # expired: asked again in the background
+            await cache.resolve("gone.example.test")
+            assert len(server.queries) == 2
+            assert cache.stats()["negative_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_prefetch_before_expiry_keeps_serving_the_old_answer(self):
+        async with _dns() as (server, cache, clock):
+            server.zone[NAME] = [("10.1.2.3", 120)]
+            await cache.prepare([NAME], ahead=16)
+            server.zone[NAME] = [("10.1.2.4", 120)]
+            clock[0] += 110
+            await cache.prepare([NAME], ahead=16)
+            assert cache.address(NAME) == "10.1.2.3"  # refresh still in flight
+            await cache.resolve(NAME)  # joins the prefetch instead of querying again
+            assert cache.address(NAME) == "10.1.2.4"
+            assert len(server.queries) == 2 and cache.stats()["prefetches"] == 1
+
+    @pytest.mark.asyncio
+    async def test_last_answer_served_stale_while_the_resolver_fails(self):
+        async with _dns() as (server, cache, clock):
+            server.zone[NAME] = [("10.1.2.3", 60)]
+            await cache.prepare([NAME])
+            server.silent = True
+            clock[0] += 61
+            await cache.resolve(NAME)
+            assert cache.address(NAME) == "10.1.2.3"
+            assert cache.stats()["stale_hits"] == 1
+            clock[0] += DNS_STALE_MAX
+            await cache.resolve(NAME)
+            assert cache.address(NAME) is None
+            assert "no answer" in cache.error(NAME)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_share_one_query(self):
+        async with _dns() as (server, cache, clock):
+            server.zone[NAME] = [("10.1.2.3", 300)]
+            entries = await asyncio.gather(*(cache.resolve(NAME) for _ in range(5)))
+            assert {entry.addresses for entry in entries} == {("10.1.2.3",)}
+            assert len(server.queries) == 1
+            await cache.prepare([])
+            assert cache.stats()["size"] == 0  # names no host uses any more are dropped
@@ -0,0 +1,145 @@
+"""Unit tests for change versions, tombstones, GET /sync and the host list ETag"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.api.v1.hosts import router as hosts_router
+from app.api.v1.sync import router as sync_router
+from app.db.models import Alert, Host, Tombstone, User, UserRole
+from app.db.session import get_read_session
+from app.db.versioning import entity_version, prune_tombstones
+from app.utils.role_decorator import get_current_user
+
+
+@pytest.fixture
+def client(engine):
+    def read_session():
+        with Session(engine) as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(hosts_router, prefix="/hosts")
+    app.include_router(sync_router, prefix="/sync")
+    app.dependency_overrides[get_read_session] = read_session
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, username="admin", hashed_password="", role=UserRole.ADMIN)
+    return TestClient(app)
+
+
+class TestVersioningHook():
+    def test_versions_increase_and_deletes_leave_tombstones(self, engine):
+        with Session(engine) as session:
+            router, switch = Host(name="router", ip="10.0.0.1"), Host(name="switch", ip="10.0.0.2")
+            session.add_all([router, switch])
+            session.commit()
+            first = [router.version, switch.version]
+            assert 0 < first[0] < first[1]
+
+            router.status = "DOWN"
+            session.add(router)
+            session.commit()
+            assert router.version > first[1]
+
+            alert = Alert(host_id=switch.id, severity="INFO", message="Host is UP")
+            session.add(alert)
+            session.commit()
+            assert alert.version > router.version
+
+            alert_id, alert_version = alert.id, alert.version
+            session.delete(alert)
+            session.commit()
+            tombstone = session.exec(select(Tombstone)).one()
+            assert (tombstone.entity, tombstone.entity_id) == ("alert", alert_id)
+            assert tombstone.version > alert_version
+
+    def test_unchanged_rows_keep_their_version(self, engine):
+        with Session(engine) as session:
+            host = Host(name="router", ip="10.0.0.1")
+            session.add(host)
+            session.commit()
+            version = host.version
+            host.name = "router"
+            session.add(host)
+            session.commit()
+            assert host.version == version
+
+
+class TestSyncEndpoint():
+    def test_paging_returns_changes_and_tombstones(self, engine, client):
+        with Session(engine) as session:
+            hosts = [Host(name=f"h{i}", ip=f"10.0.0.{i}") for i in range(1, 4)]
+            session.add_all(hosts)
+            session.commit()
+            session.add(Alert(host_id=hosts[0].id, severity="CRITICAL", message="Host is DOWN"))
+            session.delete(hosts[2])
+            session.commit()
+
+        first = client.get("/sync/", params={"since": 0, "limit": 2}).json()
+        assert [host["name"] for host in first["hosts"]] == ["h1", "h2"]
+        assert first["has_more"]
+
+        second = client.get("/sync/", params={"since": first["version"], "limit": 2}).json()
+        assert [alert["message"] for alert in second["alerts"]] == ["Host is DOWN"]
+        assert second["deleted"]["hosts"] == [3]
+        assert second["hosts"] == []  # h3 is gone - only its tombstone is left
+        assert second["version"] > first["version"]
+
+        last = client.get("/sync/", params={"since": second["version"]}).json()
+        assert last == {
+            "version": second["version"], "has_more": False, "hosts": [], "alerts": [],
+            "deleted": {"hosts": [], "alerts": []}
+        }
+
+
+class TestTombstoneRetention():
+    def test_clients_behind_pruned_deletions_must_resync(self, engine, client):
+        with Session(engine) as session:
+            old, recent, kept = (Host(name=name, ip=f"10.0.0.{i}") for i, name in enumerate(("old", "recent", "kept"), 1))
+            session.add_all([old, recent, kept])
+            session.commit()
+            seen = kept.version
+            session.delete(old)
+            session.commit()
+            session.delete(recent)
+            session.commit()
+            first, second = session.exec(select(Tombstone).order_by(Tombstone.version)).all()
+            first.deleted_at = datetime.utcnow() - timedelta(days=40)
+            session.add(first)
+            session.commit()
+            floor, recent_id = first.version, second.entity_id
+            etag_version = entity_version(session, Host)
+
+            assert prune_tombstones(session, datetime.utcnow() - timedelta(days=30)) == 1
+            session.commit()
+            assert session.exec(select(Tombstone.entity_id)).all() == [recent_id]
+            assert entity_version(session, Host) == etag_version
+
+        assert client.get("/sync/", params={"since": seen}).status_code == 410
+        assert client.get("/sync/", params={"since": floor}).json()["deleted"]["hosts"] == [recent_id]
+        full = client.get("/sync/", params={"since": 0}).json()
+        assert [host["name"] for host in full["hosts"]] == ["kept"]
+
+
+class TestHostListETag():
+    def test_not_modified_until_a_host_changes(self, engine, client):
+        with Session(engine) as session:
+            session.add(Host(name="router", ip="10.0.0.1"))
+            session.commit()
+
+        response = client.get("/hosts/")
+        etag = response.headers["etag"]
+        assert response.status_code == 200 and len(response.json()) == 1
+        cached = client.get("/hosts/", headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert cached.status_code == 304 and cached.headers["etag"] == etag
+
+        with Session(engine) as session:
+            host = session.exec(select(Host)).one()
+            host.status = "UP"
+            session.add(host)
+            session.commit()
+
+        changed = client.get("/hosts/", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
@@ -0,0 +1,64 @@
+"""Unit tests for the authenticated-user cache"""
+import time
+
+from app.db.models import User, UserRole
+from app.utils.user_cache import UserCache
+
+
+def make_user(user_id=1, role=UserRole.USER):
+    return User(id=user_id, username=f"user{user_id}", hashed_password="x", role=role)
+
+
+class TestUserCache():
+    def test_miss_then_hit(self):
+        cache = UserCache()
+
+        assert cache.get("token") is None
+        cache.put("token", make_user())
+        cached = cache.get("token")
+
+        assert cached.username == "user1"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    def test_entry_expires_with_token(self):
+        cache = UserCache(ttl=60)
+
+        cache.put("token", make_user(), token_exp=time.time() - 1)
+
+        assert cache.get("token") is None
+
+    def test_invalidate_user_drops_all_tokens(self):
+        cache = UserCache()
+        cache.put("token-a", make_user(1))
+        cache.put("token-b", make_user(1))
+        cache.put("token-c", make_user(2))
+
+        cache.invalidate_user(1)
+
+        assert cache.get("token-a") is None
+        assert cache.get("token-b") is None
+        assert cache.get("token-c") is not None
+
+    def test_lru_eviction_keeps_size_bounded(self):
+        cache = UserCache(max_size=2)
+        cache.put("token-1", make_user(1))
+        cache.put("token-2", make_user(2))
+        cache.get("token-1")  # token-2 is now least recently used
+
+        cache.put("token-3", make_user(3))
+
+        assert cache.get("token-2") is None
+        assert cache.get("token-1") is not None
+        assert cache.stats()["size"] == 2
+        assert cache.stats()["evictions"] == 1
+
+    def test_cached_principal_is_a_copy(self):
+        cache = UserCache()
+        user = make_user(role=UserRole.ADMIN)
+
+        cache.put("token", user)
+        user.role = UserRole.VIEWER
+
+        assert cache.get("token").role == UserRole.ADMIN
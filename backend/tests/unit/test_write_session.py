@@ -0,0 +1,66 @@
+"""Unit tests for WriteSession: reads through the read pool, the writer connection only once it writes"""
+import pytest
+from sqlalchemy import event
+from sqlmodel import SQLModel, create_engine, delete, select
+
+from app.db.models import Host
+from app.db.session import WriteSession
+
+
+@pytest.fixture
+def engines(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    # Like app.db.session: one writer connection taking the lock up front, query_only readers
+    writer = create_engine(url, pool_size=1, max_overflow=0, pool_timeout=0.1)
+    reader = create_engine(url)
+
+    @event.listens_for(writer, "connect")
+    def writer_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(writer, "begin")
+    def writer_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(reader, "connect")
+    def reader_connect(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA query_only=1")
+
+    SQLModel.metadata.create_all(writer)
+    with WriteSession(writer, reader) as session:
+        session.add(Host(id=1, name="router", ip="10.0.0.1"))
+        session.commit()
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+class TestWriteSession():
+    def test_reads_do_not_wait_for_the_writer(self, engines):
+        writer, reader = engines
+        with writer.connect() as busy, busy.begin():  # another request holds the write lock
+            with WriteSession(writer, reader) as session:
+                assert session.get(Host, 1).name == "router"
+                assert session.get(Host, 2) is None  # a 404 lookup
+
+    def test_writer_held_from_the_first_flush_until_commit(self, engines):
+        writer, reader = engines
+        with WriteSession(writer, reader) as session:
+            host = session.get(Host, 1)
+            assert writer.pool.checkedout() == 0
+            host.status = "UP"
+            session.add(host)
+            session.flush()
+            assert writer.pool.checkedout() == 1
+            session.commit()
+            assert writer.pool.checkedout() == 0
+            session.refresh(host)  # read again through the read pool, with the committed change
+            assert host.status == "UP" and writer.pool.checkedout() == 0
+
+    def test_bulk_statements_go_to_the_writer(self, engines):
+        writer, reader = engines
+        with WriteSession(writer, reader) as session:
+            session.exec(delete(Host).where(Host.id == 1))
+            session.commit()
+            assert session.exec(select(Host)).all() == []
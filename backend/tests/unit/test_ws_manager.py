@@ -0,0 +1,200 @@
+"""Unit tests for websocket fan-out (per-client queues, slow-consumer handling, subscriptions)"""
+import asyncio
+import json
+
+import pytest
+
+from app.ws.alerts import ConnectionManager, RESYNC_MESSAGE
+
+
+class FakeWebSocket:
+    def __init__(self, stalled=False):
+        self.sent = []
+        self.closed = False
+        self.stalled = stalled
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.stalled:
+            await asyncio.Event().wait()  # never completes
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+class TestConnectionManager():
+    async def test_broadcast_reaches_all_clients(self):
+        manager = ConnectionManager(batch_window=0)
+        ws1, ws2 = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(ws1)
+        await manager.connect(ws2)
+
+        manager.broadcast({"message": "hello"})
+        await asyncio.sleep(0.01)
+
+        assert ws1.sent == ['{"message": "hello"}']
+        assert ws2.sent == ['{"message": "hello"}']
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
+
+    async def test_stalled_client_does_not_block_others(self):
+        manager = ConnectionManager(queue_size=2, max_overflows=1, batch_window=0)
+        slow, fast = FakeWebSocket(stalled=True), FakeWebSocket()
+        await manager.connect(slow)
+        await manager.connect(fast)
+
+        for i in range(4):
+            manager.broadcast({"message": f"msg {i}"})
+            await asyncio.sleep(0.001)
+
+        assert [json.loads(m)["message"] for m in fast.sent] == ["msg 0", "msg 1", "msg 2", "msg 3"]
+        # slow client overflowed: backlog replaced by a resync marker
+        assert list(manager.clients[slow].queue._queue) == [RESYNC_MESSAGE, '{"message": "msg 3"}']
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
+
+    async def test_slow_client_is_evicted(self):
+        manager = ConnectionManager(queue_size=1, max_overflows=1, batch_window=0)
+        slow = FakeWebSocket(stalled=True)
+        await manager.connect(slow)
+
+        for i in range(5):
+            manager.broadcast({"message": f"msg {i}"})
+        await asyncio.sleep(0.01)
+
+        assert slow not in manager.clients
+        assert slow.closed
+        assert manager.evicted == 1
+
+
+def event(host_id, group_id, severity):
+    return {"type": "host_status", "host_id": host_id, "group_id": group_id, "severity": severity}
+
+
+@pytest.mark.asyncio
+class TestSubscriptions():
+    async def test_routes_only_matching_events(self):
+        manager = ConnectionManager(batch_window=0)
+        everyone, by_host, by_group, critical = (FakeWebSocket() for _ in range(4))
+        for ws in (everyone, by_host, by_group, critical):
+            await manager.connect(ws)
+        manager.subscribe(by_host, hosts=[1])
+        manager.subscribe(by_group, groups=[10], severities=["critical"])
+        manager.subscribe(critical, severities=["CRITICAL"])
+
+        assert manager._route(event(1, 10, "INFO")) == {manager.clients[everyone], manager.clients[by_host]}
+        assert manager._route(event(2, 10, "CRITICAL")) == {
+            manager.clients[everyone], manager.clients[by_group], manager.clients[critical]
+        }
+        assert manager._route(event(3, None, "INFO")) == {manager.clients[everyone]}
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
+
+    async def test_unsubscribe_and_disconnect_clean_the_index(self):
+        manager = ConnectionManager(batch_window=0)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+        manager.subscribe(ws, hosts=[1], groups=[2])
+
+        manager.subscribe(ws)
+        assert manager._by_host == {} and manager._by_group == {}
+        assert manager.clients[ws] in manager._everything
+
+        manager.disconnect(ws)
+        assert manager._everything == set()
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+class TestBatching():
+    async def test_events_batched_and_coalesced_per_host(self):
+        manager = ConnectionManager(batch_window=0.01)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+
+        manager.broadcast({"host_id": 1, "status": "DOWN"})
+        manager.broadcast({"host_id": 2, "status": "DOWN"})
+        manager.broadcast({"host_id": 1, "status": "UP"})
+        await asyncio.sleep(0.05)
+
+        assert len(ws.sent) == 1
+        assert json.loads(ws.sent[0]) == [{"host_id": 2, "status": "DOWN"}, {"host_id": 1, "status": "UP"}]
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
+
+    async def test_batch_is_filtered_per_client(self):
+        manager = ConnectionManager(batch_window=0.01)
+        ws1, ws2 = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(ws1)
+        await manager.connect(ws2)
+        manager.subscribe(ws2, hosts=[2])
+        await asyncio.sleep(0.01)
+        ws2.sent.clear()  # subscription ack
+
+        manager.broadcast(event(1, None, "INFO"))
+        manager.broadcast(event(2, None, "INFO"))
+        await asyncio.sleep(0.05)
+
+        assert [e["host_id"] for e in json.loads(ws1.sent[0])] == [1, 2]
+        assert [e["host_id"] for e in json.loads(ws2.sent[0])] == [2]
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+class TestResume():
+    async def test_live_events_held_until_the_replay_is_sent(self):
+        manager = ConnectionManager(batch_window=0)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+        manager.hold(ws)
+
+        manager.broadcast({"seq": 3, "host_id": 1})  # already in the replay
+        manager.broadcast({"seq": 4, "host_id": 2})
+        await asyncio.sleep(0.01)
+        assert ws.sent == []
+
+        manager.replay(ws, [{"seq": 2, "host_id": 1}, {"seq": 3, "host_id": 1}])
+        manager.broadcast({"seq": 5, "host_id": 1})
+        await asyncio.sleep(0.01)
+
+        frames = [json.loads(message) for message in ws.sent]
+        assert [[e["seq"] for e in frame] if isinstance(frame, list) else frame["seq"] for frame in frames] == [
+            [2, 3], [4], 5
+        ]
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
+
+    async def test_batched_events_in_the_replay_are_not_sent_again(self):
+        manager = ConnectionManager(batch_window=0.01)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+
+        manager.broadcast({"seq": 7, "host_id": 1})
+        manager.broadcast({"seq": 8, "host_id": 2})
+        manager.hold(ws)
+        manager.replay(ws, [{"seq": 7, "host_id": 1}])
+        await asyncio.sleep(0.05)
+
+        assert [[e["seq"] for e in json.loads(message)] for message in ws.sent] == [[7], [8]]
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
+
+    async def test_failed_lookup_still_releases_the_client(self):
+        manager = ConnectionManager(batch_window=0)
+        ws = FakeWebSocket()
+        await manager.connect(ws)
+        manager.hold(ws)
+        manager.broadcast({"seq": 9, "host_id": 1})
+
+        manager.replay(ws, None)
+        await asyncio.sleep(0.01)
+
+        assert ws.sent[0] == RESYNC_MESSAGE
+        assert json.loads(ws.sent[1]) == [{"seq": 9, "host_id": 1}]
+        manager.disconnect_all()
+        await asyncio.sleep(0.01)
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { hostsAPI, alertsAPI, authAPI, hostgroupsAPI } from '../services/api'
+import { hostsAPI, authAPI, hostgroupsAPI, dashboardAPI } from '../services/api'
 import HostList from '../components/HostList'
 import AlertList from '../components/AlertList'
 import AddHostModal from '../components/AddHostModal'
@@ -20,35 +20,62 @@ function Dashboard({ user, onLogout }) {
 
   useEffect(() => {
     loadData()
-    const ws = new WebSocket('ws://localhost:8000/ws/alerts')
-    
-    ws.onmessage = (event) => {
-      const msg = event.data
-      console.log('WebSocket alert:', msg)
-      setNotifications(prev => [...prev, { id: Date.now(), msg }])
-      
-      // Force refresh data after WebSocket message
-      setTimeout(() => {
-        loadData()
-      }, 500)
-      
-      // Auto-remove notification after 5 seconds
-      setTimeout(() => setNotifications(prev => prev.slice(1)), 5000)
+    let ws
+    let lastSeq = null
+    let closed = false
+
+    const connect = () => {
+      // After a reconnect the server replays only what we missed since lastSeq
+      const query = lastSeq !== null ? `?last_seq=${lastSeq}` : ''
+      ws = new WebSocket(`ws://localhost:8000/ws/alerts${query}`)
+
+      ws.onmessage = (event) => {
+        const data = JSON.parse(event.data)
+        // Server dropped our backlog (we fell behind) - reload full state
+        if (data.type === 'resync') {
+          loadData()
+          return
+        }
+        // Events arrive batched as an array frame
+        const batch = Array.isArray(data) ? data : [data]
+        batch.forEach(e => {
+          if (e.seq) lastSeq = Math.max(lastSeq ?? 0, e.seq)
+        })
+        const events = batch.filter(e => e.type === 'host_status')
+        if (events.length === 0) return
+        console.log('WebSocket alerts:', events)
+        setNotifications(prev => [
+          ...prev,
+          ...events.map((e, i) => ({ id: `${Date.now()}-${i}`, msg: `${e.host_name}: ${e.message}` }))
+        ])
+        
+        // Force refresh data after WebSocket message
+        setTimeout(() => {
+          loadData()
+        }, 500)
+        
+        // Auto-remove notifications after 5 seconds
+        setTimeout(() => setNotifications(prev => prev.slice(events.length)), 5000)
+      }
+
+      ws.onclose = () => {
+        if (!closed) setTimeout(connect, 2000)
+      }
+    }
+
+    connect()
+    return () => {
+      closed = true
+      ws.close()
     }
-    
-    return () => ws.close()
   }, [])
 
   const loadData = async () => {
     try {
-      const [hostsRes, alertsRes, groupsRes] = await Promise.all([
-        hostsAPI.getAll(),
-        alertsAPI.getAll(),
-        hostgroupsAPI.getAll()
-      ])
-      setHosts(hostsRes.data)
-      setAlerts(alertsRes.data)
-      setGroups(groupsRes.data)
+      const res = await dashboardAPI.snapshot()
+      setHosts(res.data.hosts)
+      setAlerts(res.data.alerts)
+      setGroups(res.data.groups)
     } catch (err) {
       console.error('Load error:', err)
     } finally {
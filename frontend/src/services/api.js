@@ -37,4 +37,8 @@ export const hostgroupsAPI = {
   delete: (id) => api.delete(`/hostgroups/${id}`)
 };
 
+export const dashboardAPI = {
+  snapshot: () => api.get('/dashboard/snapshot')
+};
+
 export default api;